@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+'''
+Compare the memory held by l_bp.breakpoint objects against the previous
+representation, where every breakpoint carried an instance dict and the
+padded, normalized PRPOS/PREND curves as lists of Python floats.
+
+usage: python benchmarks/breakpoint_memory.py [-n 100000] [-w 100] [-f 20]
+'''
+import argparse
+import random
+import sys
+import time
+
+import svtools.l_bp as l_bp
+
+class list_breakpoint:
+    '''
+    Stand-in for the previous breakpoint class with the same attributes
+    '''
+    def __init__(self, b):
+        self.l = b.l
+        self.sv_type = b.sv_type
+        self.chr_l = b.chr_l
+        self.chr_r = b.chr_r
+        self.strands = b.strands
+        self.start_l = b.start_l
+        self.end_l = b.end_l
+        self.start_r = b.start_r
+        self.end_r = b.end_r
+        self.p_l = b.p_l
+        self.p_r = b.p_r
+
+def make_line(i, width):
+    pos = 1000 + i * 50
+    half = width / 2
+    p = ','.join('%.6g' % random.random() for _ in range(width))
+    return '\t'.join(['1', str(pos), str(i), 'N', '<DEL>', '.', '.',
+        'SVTYPE=DEL;END=%d;STRANDS=+-:4;CIPOS=%d,%d;CIEND=%d,%d;PRPOS=%s;PREND=%s' %
+        (pos + 5000, -half, width - half - 1, -half, width - half - 1, p, p)]) + '\n'
+
+def deep_size(obj):
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+        fields = obj.__dict__.values()
+    else:
+        fields = [getattr(obj, f) for f in obj.__slots__]
+    for v in fields:
+        if v is obj.l:
+            # the raw line is shared by both representations
+            continue
+        size += sys.getsizeof(v)
+        if isinstance(v, list):
+            size += sum(sys.getsizeof(x) for x in v)
+    return size
+
+def main():
+    parser = argparse.ArgumentParser(description='breakpoint memory benchmark')
+    parser.add_argument('-n', type=int, default=100000, help='number of breakpoints')
+    parser.add_argument('-w', type=int, default=100, help='width of each probability curve')
+    parser.add_argument('-f', type=int, default=20, help='fixed slop')
+    args = parser.parse_args()
+    random.seed(0)
+
+    lines = [make_line(i, args.w) for i in range(args.n)]
+
+    t0 = time.time()
+    current = [l_bp.breakpoint(l, fixed_slop=args.f) for l in lines]
+    t1 = time.time()
+    previous = [list_breakpoint(b) for b in current]
+
+    current_bytes = sum(deep_size(b) for b in current)
+    previous_bytes = sum(deep_size(b) for b in previous)
+
+    print 'breakpoints:\t%d (curve width %d, slop %d)' % (args.n, args.w, args.f)
+    print 'construction:\t%.2fs' % (t1 - t0)
+    print 'list-backed:\t%.1f MB (%d bytes each)' % (previous_bytes / 1e6, previous_bytes / args.n)
+    print 'array-backed:\t%.1f MB (%d bytes each)' % (current_bytes / 1e6, current_bytes / args.n)
+    print 'reduction:\t%.1fx' % (float(previous_bytes) / current_bytes)
+
+if __name__ == '__main__':
+    sys.exit(main())
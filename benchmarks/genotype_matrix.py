@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+'''
+Compare reading GT and CN for every sample of wide VCF lines through a
+Genotype per sample against the columnar GenotypeMatrix.
+
+usage: python benchmarks/genotype_matrix.py [-s 10000] [-n 50]
+'''
+import argparse
+import random
+import sys
+import time
+
+from svtools.vcf.file import Vcf
+from svtools.vcf.variant import Variant
+
+def make_vcf(samples):
+    vcf = Vcf()
+    vcf.add_header([
+        '##fileformat=VCFv4.2',
+        '##INFO=<ID=SVTYPE,Number=1,Type=String,Description="Type of structural variant">',
+        '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">',
+        '##FORMAT=<ID=SQ,Number=1,Type=Float,Description="Phred-scaled probability that this site is variant">',
+        '##FORMAT=<ID=CN,Number=1,Type=Float,Description="Copy number">',
+        '#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\t' + '\t'.join('S%05d' % i for i in range(samples))])
+    return vcf
+
+def make_line(i, samples):
+    gts = [random.choice(['0/0', '0/0', '0/1', '1/1', './.']) for _ in range(samples)]
+    columns = ['%s:%.2f:%.2f' % (gt, random.random() * 100, random.random() * 3) for gt in gts]
+    return '\t'.join(['1', str(1000 * i), str(i), 'N', '<DEL>', '.', '.', 'SVTYPE=DEL', 'GT:SQ:CN'] + columns)
+
+def per_sample(vcf, lines):
+    total = 0.0
+    for l in lines:
+        var = Variant(l.split('\t'), vcf)
+        for gt in var.genotypes():
+            if gt.get_format('GT') not in ('./.', '0/0'):
+                total += float(gt.get_format('CN'))
+    return total
+
+def columnar(vcf, lines):
+    total = 0.0
+    for l in lines:
+        m = Variant(l.split('\t'), vcf).genotype_matrix()
+        gt = m.strings('GT')
+        total += float(m['CN'][(gt != './.') & (gt != '0/0')].astype(float).sum())
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description='GenotypeMatrix benchmark')
+    parser.add_argument('-s', '--samples', type=int, default=10000, help='number of samples')
+    parser.add_argument('-n', '--lines', type=int, default=50, help='number of VCF lines')
+    args = parser.parse_args()
+    random.seed(0)
+
+    vcf = make_vcf(args.samples)
+    lines = [make_line(i, args.samples) for i in range(args.lines)]
+    print 'lines:\t%d with %d samples' % (args.lines, args.samples)
+
+    t0 = time.time()
+    a = per_sample(vcf, lines)
+    t1 = time.time()
+    b = columnar(vcf, lines)
+    t2 = time.time()
+    # CN is held as float32 in the matrix
+    assert abs(a - b) / max(a, 1) < 1e-5
+    print 'Genotype objects:\t%.2fs' % (t1 - t0)
+    print 'GenotypeMatrix:\t%.2fs' % (t2 - t1)
+    print 'speedup:\t%.1fx' % ((t1 - t0) / (t2 - t1))
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+'''
+Stress test the search for the largest intersecting sets of breakpoints in
+lmerge with synthetic dense clusters, the kind of pile up seen around
+centromeres and segmental duplications.
+
+usage: python benchmarks/lmerge_clusters.py [-c 20] [-d 300] [--quadratic]
+'''
+import argparse
+import heapq
+import random
+import sys
+import time
+from collections import namedtuple
+
+from svtools.l_sweep import largest_intersecting_sets
+
+BP = namedtuple('BP', ['start_l', 'end_l', 'start_r', 'end_r'])
+
+def quadratic_sweep(BP):
+    '''
+    The sweep lmerge.merge used before l_sweep
+    '''
+    BP_i = range(len(BP))
+    C = []
+    while len(BP_i) > 0:
+        h_l = []
+        max_c = []
+        max_c_len = 0
+        for i in BP_i:
+            while (len(h_l) > 0) and (h_l[0][0] < BP[i].start_l):
+                heapq.heappop(h_l)
+            heapq.heappush(h_l, (BP[i].end_l, i))
+            h_r = []
+            h_l_i = [x[1] for x in h_l]
+            h_l_i.sort(key=lambda x:BP[x].start_r)
+            for j in h_l_i:
+                while (len(h_r) > 0) and (h_r[0][0] < BP[j].start_r):
+                    heapq.heappop(h_r)
+                heapq.heappush(h_r, (BP[j].end_r, j))
+                if max_c_len < len(h_r):
+                    max_c_len = len(h_r)
+                    max_c = [y[1] for y in h_r]
+        C.append(max_c)
+        for c in max_c:
+            BP_i.remove(c)
+    return C
+
+def dense_clusters(clusters, depth, spread, width):
+    '''
+    clusters piles of depth breakpoints, chained together on the left so
+    that lmerge hands them to merge as a single set
+    '''
+    bps = []
+    for c in range(clusters):
+        centre_l = 10000 + c * spread
+        for i in range(depth):
+            start_l = random.randint(centre_l - spread, centre_l + spread)
+            start_r = random.randint(0, 50 * spread)
+            bps.append(BP(start_l, start_l + random.randint(1, width),
+                start_r, start_r + random.randint(1, width)))
+    bps.sort(key=lambda x: x.start_l)
+    return bps
+
+def main():
+    parser = argparse.ArgumentParser(description='lmerge clustering stress test')
+    parser.add_argument('-c', type=int, default=20, help='number of dense clusters')
+    parser.add_argument('-d', type=int, default=300, help='breakpoints per cluster')
+    parser.add_argument('-s', type=int, default=200, help='spread of each cluster')
+    parser.add_argument('-w', type=int, default=400, help='maximum interval width')
+    parser.add_argument('--quadratic', action='store_true', help='also time the previous sweep')
+    args = parser.parse_args()
+    random.seed(0)
+
+    bps = dense_clusters(args.c, args.d, args.s, args.w)
+    print 'breakpoints:\t%d (%d clusters of %d)' % (len(bps), args.c, args.d)
+
+    t0 = time.time()
+    C = largest_intersecting_sets(bps)
+    t1 = time.time()
+    print 'sets:\t%d (largest %d)' % (len(C), max(len(c) for c in C))
+    print 'sweep:\t%.2fs' % (t1 - t0)
+
+    if args.quadratic:
+        t0 = time.time()
+        old_C = quadratic_sweep(bps)
+        t1 = time.time()
+        print 'quadratic sweep:\t%.2fs' % (t1 - t0)
+        print 'identical:\t%s' % (old_C == C)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+'''
+Compare lsort spill runs written as plain text lines, the previous format,
+against the framed, zlib compressed runs of lsort.TempRun. Reports the bytes
+written to the temp directory and the time to write the runs and merge them
+back.
+
+usage: python benchmarks/lsort_spill.py [-n 50000] [-r 8] [-t /tmp]
+'''
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import svtools.lsort as lsort
+
+def make_line(i):
+    pos = random.randint(1, 50000000)
+    width = random.randint(20, 200)
+    half = width / 2
+    p = ','.join('%g' % random.random() for _ in range(width))
+    return '\t'.join([random.choice(['1', '2', '10', 'X']), str(pos), str(i), 'N', '<DEL>', '%.2f' % random.random(), '.',
+        'SVTYPE=DEL;SVLEN=-%d;END=%d;STRANDS=+-:4;IMPRECISE;CIPOS=%d,%d;CIEND=%d,%d;CIPOS95=-5,5;CIEND95=-5,5;SU=4;PE=4;SR=0;PRPOS=%s;PREND=%s;SNAME=S%03d' %
+        (5000, pos + 5000, -half, width - half - 1, -half, width - half - 1, p, p, i % 500),
+        'GT:SU:PE:SR', '0/1:4:4:0']) + '\n'
+
+def plain_runs(tempdir, runs):
+    paths = []
+    for i, run in enumerate(runs):
+        path = os.path.join(tempdir, 'plain%06i' % i)
+        with open(path, 'w', 64*1024) as f:
+            f.writelines(r.obj for r in run)
+        paths.append(path)
+    return paths
+
+def merge_plain(paths):
+    # the keys have to be parsed out of the lines again
+    files = [open(path) for path in paths]
+    keyed = [(lsort.keyed(l) for l in f) for f in files]
+    count = sum(1 for _ in lsort.merge(*keyed))
+    for f in files:
+        f.close()
+    return count
+
+def framed_runs(tempdir, runs):
+    return [lsort.TempRun(os.path.join(tempdir, 'framed%06i' % i), run) for i, run in enumerate(runs)]
+
+def merge_framed(runs):
+    return sum(1 for _ in lsort.merge(*runs))
+
+def main():
+    parser = argparse.ArgumentParser(description='lsort spill run benchmark')
+    parser.add_argument('-n', type=int, default=50000, help='number of records')
+    parser.add_argument('-r', type=int, default=8, help='number of runs')
+    parser.add_argument('-t', '--tempdir', default=tempfile.gettempdir(), help='where to write the runs')
+    args = parser.parse_args()
+    random.seed(0)
+
+    records = [lsort.keyed(make_line(i)) for i in range(args.n)]
+    runs = [sorted(records[i::args.r], key=lambda r: r.key) for i in range(args.r)]
+    line_bytes = sum(len(r.obj) for r in records)
+    print 'records:\t%d in %d runs (%.1f MB of text)' % (args.n, args.r, line_bytes / 1e6)
+
+    tempdir = tempfile.mkdtemp(dir=args.tempdir)
+    try:
+        t0 = time.time()
+        paths = plain_runs(tempdir, runs)
+        t1 = time.time()
+        count = merge_plain(paths)
+        t2 = time.time()
+        plain_bytes = sum(os.path.getsize(p) for p in paths)
+        print 'plain text:\t%.1f MB written, write %.2fs, merge %.2fs' % (plain_bytes / 1e6, t1 - t0, t2 - t1)
+
+        t0 = time.time()
+        temp_runs = framed_runs(tempdir, runs)
+        t1 = time.time()
+        assert merge_framed(temp_runs) == count
+        t2 = time.time()
+        framed_bytes = sum(os.path.getsize(r.path) for r in temp_runs)
+        print 'framed zlib:\t%.1f MB written, write %.2fs, merge %.2fs' % (framed_bytes / 1e6, t1 - t0, t2 - t1)
+        print 'bytes written:\t%.1fx fewer' % (float(plain_bytes) / framed_bytes)
+    finally:
+        shutil.rmtree(tempdir)
+
+if __name__ == '__main__':
+    sys.exit(main())
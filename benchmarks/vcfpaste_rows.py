@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+'''
+Compare the time to paste a row of sample columns with the previous
+vcfpaste engine, which read a line of every input and grew the output row
+by list concatenation one input at a time, against the row-block engine
+of Vcfpaste.write_variants. Reports the cost per row and per row and
+sample for increasing numbers of samples; the block engine's cost per
+sample should stay flat.
+
+usage: python benchmarks/vcfpaste_rows.py [-r 500] [-s 10,100,1000,4000]
+'''
+import argparse
+import random
+import sys
+import time
+from cStringIO import StringIO
+
+import svtools.vcfpaste as vcfpaste
+
+def make_lines(rows, fields):
+    lines = []
+    for i in xrange(rows):
+        lines.append('\t'.join(['1', str(1000 + i * 50), str(i), 'N', '<DEL>', '%.2f' % random.uniform(0, 100), '.',
+            'SVTYPE=DEL;END=%d' % (6000 + i * 50), 'GT:SU:PE:SR:GQ:SQ:GL:DP:RO:AO:QR:QA:RS:AS:ASC:RP:AP:AB',
+            ':'.join([random.choice(['0/0', '0/1', '1/1'])] + fields)]) + '\n')
+    return lines
+
+def previous_write_variants(vcf_files, output_handle):
+    while 1:
+        master_line = vcf_files[0].readline()
+        if not master_line:
+            break
+        master_v = master_line.rstrip().split('\t', vcfpaste.MAX_SPLIT)
+        out_v = master_v[:8]
+        qual = 0
+        if out_v[5] != '.':
+            qual = float(out_v[5])
+        format = None
+        for vcf in vcf_files[1:]:
+            line = vcf.readline()
+            line_v = line.rstrip().split('\t', vcfpaste.MAX_SPLIT)
+            if format is None:
+                format = line_v[8]
+                out_v.append(format)
+            if line_v[5] != '.':
+                qual += float(line_v[5])
+            out_v = out_v + line_v[9:]
+        out_v[5] = qual
+        output_handle.write('\t'.join(map(str, out_v)) + '\n')
+
+def block_write_variants(vcf_files, output_handle):
+    paster = vcfpaste.Vcfpaste(None, sum_quals=True)
+    paster.vcf_files = vcf_files
+    paster.write_variants(output_handle)
+
+def run(write_variants, text, num_samples):
+    # the master is the first sample, as without -m
+    vcf_files = [StringIO(text) for _ in xrange(num_samples + 1)]
+    output_handle = StringIO()
+    t0 = time.time()
+    write_variants(vcf_files, output_handle)
+    return time.time() - t0, output_handle.getvalue()
+
+def main():
+    parser = argparse.ArgumentParser(description='vcfpaste row benchmark')
+    parser.add_argument('-r', '--rows', type=int, default=500, help='number of records')
+    parser.add_argument('-s', '--samples', default='10,100,1000,4000', help='comma separated numbers of samples')
+    args = parser.parse_args()
+    random.seed(0)
+
+    fields = ['4', '4', '0', '120', '134.5', '-0,-3,-17', '12', '8', '4', '8', '4', '0', '4', '0', '0', '4', '0.5']
+    text = ''.join(make_lines(args.rows, fields))
+    print 'samples\tprevious us/row\tus/row/sample\tblock us/row\tus/row/sample\tspeedup'
+    for n in [int(s) for s in args.samples.split(',')]:
+        previous, previous_out = run(previous_write_variants, text, n)
+        block, block_out = run(block_write_variants, text, n)
+        assert previous_out == block_out
+        print '%d\t%.1f\t%.3f\t%.1f\t%.3f\t%.1fx' % (n,
+                1e6 * previous / args.rows, 1e6 * previous / args.rows / n,
+                1e6 * block / args.rows, 1e6 * block / args.rows / n,
+                previous / block)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,12 @@
 import argparse, sys
 from svtools.vcf.file import Vcf
 from svtools.vcf.variant import Variant
+from svtools.vcf.genotype_matrix import GenotypeMatrix
+import numpy as np
 import svtools.utils as su
+from svtools.record_pipeline import RecordPipeline
+from svtools.record_view import RecordView
+import svtools.svb as svb
 
 class UpdateInfo(object):
     def __init__(self, vcf_stream):
@@ -17,81 +22,125 @@ class UpdateInfo(object):
             gt = gt_string.split('|')
         return map(int, gt)
 
-    def execute(self, output_handle=sys.stdout):
-        in_header = True
+    @staticmethod
+    def sample_order(sample_list):
+        '''
+        The order SQ has always been summed in, that of a dict keyed by
+        sample name. Keeping it keeps MSQ identical to the last digit.
+        '''
+        return np.array(dict((s, i) for i, s in enumerate(sample_list)).values(), dtype=np.int64)
+
+    @staticmethod
+    def count_alleles(var, num_alt, sample_order):
+        '''
+        Count the alleles of the called genotypes of a variant, along with
+        the number of samples carrying a non-reference allele and the sum
+        of their SQ, working on whole columns of genotypes at once
+        '''
+        genotypes = var.genotype_matrix()
+        gt = genotypes.gt()[sample_order]
+        # genotypes with a missing allele aren't counted
+        is_called = ~(gt == GenotypeMatrix.MISSING).any(axis=1)
+        called = gt[is_called]
+        # haploid genotypes among diploid ones are padded out
+        present = called != GenotypeMatrix.NO_ALLELE
+        called_alleles = called[present]
+        allele_sums = np.where(present, called, 0).sum(axis=1, dtype=np.int64)
+        if (called_alleles > num_alt).any():
+            sys.stderr.write('\nError: GT allele out of range for the ALT alleles of variant ID ' + var.var_id + '\n')
+            sys.exit(1)
+        alleles = np.bincount(called_alleles.astype(np.int64), minlength=num_alt + 1)
+
+        # iterate the number of non-reference samples
+        non_ref = allele_sums > 0
+        num_samp = int(np.count_nonzero(non_ref))
+        sum_sq = 0.0
+        if num_samp > 0 and 'SQ' in var.format_dict:
+            sq = genotypes.values('SQ', np.float64)[sample_order][is_called][non_ref]
+            # left to right, like the running sum this used to be
+            sum_sq = float(np.add.accumulate(sq)[-1])
+        return alleles, num_samp, sum_sq
+
+    def update_line(self, line):
+        '''
+        Add AF, NSAMP and MSQ to a VCF line and return the updated record
+        '''
+        return self.update_variant(Variant(RecordView.from_line(line), self.vcf))
+
+    def update_record(self, record):
+        '''
+        Add AF, NSAMP and MSQ to an SVB record and return the updated record
+        '''
+        return self.update_variant(svb.decode_variant(record, self.vcf))
+
+    def update_variant(self, var):
+        '''
+        Add AF, NSAMP and MSQ to a Variant and return it as a VCF line, or
+        as an SVB record when writing SVB
+        '''
+        # extract genotypes from VCF
+        num_alt = len(var.alt.split(','))
+        alleles, num_samp, sum_sq = self.count_alleles(var, num_alt, self.order)
+
+        allele_sum = float(alleles.sum())
+        allele_freq = ['.'] * len(alleles)
+
+        # populate AF
+        if allele_sum > 0:
+            allele_freq = alleles / allele_sum
+            var.info['AF'] = ','.join(map(str, ['%.4g' % a for a in allele_freq[1:]]))
+        else:
+            var.info['AF'] = ','.join(map(str, allele_freq[1:]))
+
+        # populate NSAMP
+        var.info['NSAMP'] = num_samp
+        if num_samp > 0:
+            msq = '%0.2f' % (sum_sq / num_samp)
+        else:
+            msq = '.'
+        var.info['MSQ'] = msq
+
+        # after all samples have been processed, write
+        if self.binary_output:
+            return svb.Writer.frame(svb.encode_variant(var, self.vcf))
+        return var.get_var_string(use_cached_gt_string=True) + '\n'
+
+    def execute(self, output_handle=sys.stdout, threads=1, binary_output=False):
         header = []
-        vcf = Vcf()
+        self.vcf = Vcf()
+        self.binary_output = binary_output
         vcf_out = output_handle
 
-        # read input VCF
-        for line in self.vcf_stream:
-            if in_header:
+        if isinstance(self.vcf_stream, svb.Reader):
+            self.vcf = self.vcf_stream.vcf
+            lines = self.vcf_stream.records()
+            update = self.update_record
+        else:
+            # read input VCF header
+            lines = iter(self.vcf_stream)
+            update = self.update_line
+            for line in lines:
                 if line.startswith('##'):
-                    header.append(line) 
-                    continue
+                    header.append(line)
                 elif line.startswith('#CHROM'):
                     v = line.rstrip().split('\t')
                     header.append('\t'.join(v))
-
-                    in_header = False
-                    vcf.add_header(header)
-                    
-                    vcf.add_info('AF', 'A', 'Float', 'Allele Frequency, for each ALT allele, in the same order as listed')
-                    vcf.add_info('NSAMP', '1', 'Integer', 'Number of samples with non-reference genotypes')
-                    vcf.add_info('MSQ', '1', 'Float', 'Mean sample quality of positively genotyped samples')
-
-                    # write header
-                    vcf_out.write(vcf.get_header() + '\n')
-                    #vcf_out.write('\t' + '\t'.join(v[8:]) + '\n')
-                continue
-
-            v = line.rstrip().split('\t')
-            var = Variant(v, vcf)
-
-            # extract genotypes from VCF
-            num_alt = len(var.alt.split(','))
-            alleles = [0] * (num_alt + 1)
-            num_samp = 0
-            sum_sq = 0.0
-
-            for gt in var.genotypes():
-                gt_string = gt.get_format('GT')
-
-                if '.' not in gt_string:
-                    indexes = self.numeric_alleles(gt_string)
-
-                    for i in indexes:
-                        alleles[i] += 1
-
-                    # iterate the number of non-reference samples
-                    if sum(indexes) > 0:
-                        num_samp += 1
-                        try:
-                            sum_sq += float(gt.get_format('SQ'))
-                        except KeyError:
-                            pass
-
-            allele_sum = float(sum(alleles))
-            allele_freq = ['.'] * len(alleles)
-
-            # populate AF
-            if allele_sum > 0:
-                for i in xrange(len(alleles)):
-                    allele_freq[i] = alleles[i] / allele_sum
-                var.info['AF'] = ','.join(map(str, ['%.4g' % a for a in allele_freq[1:]]))
-            else:
-                var.info['AF'] = ','.join(map(str, allele_freq[1:]))
-            
-            # populate NSAMP
-            var.info['NSAMP'] = num_samp
-            if num_samp > 0:
-                msq = '%0.2f' % (sum_sq / num_samp)
-            else:
-                msq = '.'
-            var.info['MSQ'] = msq
-
-            # after all samples have been processed, write
-            vcf_out.write(var.get_var_string(use_cached_gt_string=True) + '\n')
+                    self.vcf.add_header(header)
+                    break
+
+        self.order = self.sample_order(self.vcf.sample_list)
+        self.vcf.add_info('AF', 'A', 'Float', 'Allele Frequency, for each ALT allele, in the same order as listed')
+        self.vcf.add_info('NSAMP', '1', 'Integer', 'Number of samples with non-reference genotypes')
+        self.vcf.add_info('MSQ', '1', 'Float', 'Mean sample quality of positively genotyped samples')
+
+        # write header
+        if binary_output:
+            svb.Writer(vcf_out, svb.KIND_VCF, self.vcf.get_header())
+        else:
+            vcf_out.write(self.vcf.get_header() + '\n')
+
+        # the rest of the lines are records, each updated on its own
+        RecordPipeline(update, threads).run(lines, vcf_out)
         vcf_out.close()
 
 def description():
@@ -103,6 +152,9 @@ def epilog():
 
 def add_arguments_to_parser(parser):
     parser.add_argument(metavar='<VCF>', dest='input_vcf', nargs='?', default=None, help='VCF input')
+    parser.add_argument('-t', '--threads', metavar='<INT>', type=int, default=1, help='number of processes used to annotate records in parallel [1]')
+    parser.add_argument('--region', metavar='<CHR:START-END>', default=None, help='only read the records overlapping a region of a bgzipped, indexed VCF (see svtools index)')
+    su.add_output_format_argument(parser, 'vcf', svb=True)
     parser.set_defaults(entry_point=run_from_args)
 
 def command_parser():
@@ -111,9 +163,10 @@ def command_parser():
     return parser
 
 def run_from_args(args):
-    with su.InputStream(args.input_vcf) as input_stream:
+    output_format = getattr(args, 'output_format', None)
+    with svb.open_input(args.input_vcf, getattr(args, 'region', None)) as input_stream, su.OutputStream(sys.stdout, output_format) as output_handle:
         updater = UpdateInfo(input_stream)
-        updater.execute()
+        updater.execute(output_handle, threads=getattr(args, 'threads', 1), binary_output=output_format == 'svb')
 
 if __name__ == '__main__':
     parser = command_parser()
@@ -1,12 +1,19 @@
 import re
 import sys
+from svtools.contigs import DEFAULT_CONTIGS
+from svtools.record_view import split_columns
 
 class Bedpe(object):
     def __init__(self, bed_list):
+        # the columns after info2, kept as text until they're asked for
+        bed_list, self.misc_text = split_columns(bed_list, 20)
+        self._misc = None
         self.c1 = bed_list[0]
+        self.c1_id = DEFAULT_CONTIGS.id(self.c1)
         self.s1 = int(bed_list[1])
         self.e1 = int(bed_list[2])
         self.c2 = bed_list[3]
+        self.c2_id = DEFAULT_CONTIGS.id(self.c2)
         self.s2 = int(bed_list[4])
         self.e2 = int(bed_list[5])
         self.name = bed_list[6]
@@ -24,7 +31,6 @@ class Bedpe(object):
         self.malformedFlag = 0
         self.info1 = bed_list[18]
         self.info2 = bed_list[19]
-        self.misc = bed_list[20:]
         self.check_malformed()
 
         # FIXME This is only really needed for varlookup. Something more general would be helpful
@@ -39,6 +45,15 @@ class Bedpe(object):
         if self.svtype != bed_list[10]:
             sys.stderr.write("SVTYPE at Column 11({0})) and SVTYPE in INFO Column({1}) don't match at variant ID {3}\n".format(str(bed_list[10]), str(self.svtype), self.name))
 
+    @property
+    def misc(self):
+        '''
+        The columns after info2 as a list
+        '''
+        if self._misc is None:
+            self._misc = [] if self.misc_text is None else self.misc_text.split('\t')
+        return self._misc
+
     @staticmethod
     def parse_score(score):
         if score.isdigit():
@@ -92,7 +107,7 @@ class Bedpe(object):
         '''
         A string representation of the line represented by this object
         '''
-        return '\t'.join([
+        fields = [
             self.c1,
             str(self.s1),
             str(self.e1),
@@ -112,7 +127,10 @@ class Bedpe(object):
             self.orig_ref2,
             self.orig_alt2,
             self.info1,
-            self.info2] + 
-            self.misc
-            )
+            self.info2]
+        if self._misc is not None:
+            fields += self._misc
+        elif self.misc_text is not None:
+            fields.append(self.misc_text)
+        return '\t'.join(fields)
 
@@ -1,7 +1,8 @@
 import sys
 import argparse
 from svtools.bedpe import Bedpe
-import svtools.utils as su
+from svtools.record_view import open_records, views
+from svtools.tabix import open_region
 
 class BedpetoBlockedBedConverter(object):
     '''
@@ -175,14 +176,12 @@ def processBEDPE(bedpe_stream, name, dist, output_handle=sys.stdout):
     #Process the BEDPE file and convert each entry to SAM.
     converter = BedpetoBlockedBedConverter(name, dist)
     output_handle.write(converter.track_name())
-    for line in bedpe_stream:
+    for record in views(bedpe_stream):
         # ignore header
-        if line[0] == "#":
+        if record.startswith('#'):
             continue
-        lineList = line.rstrip().split('\t')
-        if lineList:
-            bedpe = Bedpe(lineList)
-            output_handle.write('\n'.join(converter.convert(bedpe)) + '\n')
+        bedpe = Bedpe(record)
+        output_handle.write('\n'.join(converter.convert(bedpe)) + '\n')
 
 def description():
     return 'convert a BEDPE file to BED12 format for viewing in IGV or the UCSC browser'
@@ -194,6 +193,7 @@ def add_arguments_to_parser(parser):
     parser.add_argument('-b', '--bedpe', metavar='<BEDPE>', default=None, help='BEDPE input file')
     parser.add_argument('-n', '--name', metavar='<STRING>', default='BEDPE', help="The name of the track. Default is 'BEDPE'")
     parser.add_argument('-d', '--maxdist', metavar='<INT>', dest='dist', default=1000000, type=int, help='The minimum distance for drawing intrachromosomal features as if they are interchromosomal (i.e., without a line spanning the two footprints). Default is 1Mb.')
+    parser.add_argument('--region', metavar='<CHR:START-END>', default=None, help='only read the records overlapping a region of a bgzipped, indexed BEDPE (see svtools index)')
     parser.set_defaults(entry_point=run_from_args)
 
 def command_parser():
@@ -202,7 +202,7 @@ def command_parser():
     return parser
 
 def run_from_args(args):
-    with su.InputStream(args.bedpe) as stream:
+    with open_region(args.bedpe, getattr(args, 'region', None), open_records) as stream:
         processBEDPE(stream, args.name, args.dist)
 
 if __name__ == "__main__":
@@ -1,46 +1,85 @@
 import argparse, sys
+from functools import partial
+from itertools import chain
 from svtools.bedpe import Bedpe
 from svtools.vcf.file import Vcf
 from svtools.bedpetovcfconverter import BedpeToVcfConverter
 import svtools.utils as su
+import svtools.svb as svb
+from svtools.record_pipeline import RecordPipeline
 
 
+def bedpe_from_line(line):
+    return Bedpe(line.rstrip().split('\t'))
+
+def vcf_lines(converter, line, decode=bedpe_from_line):
+    '''
+    Convert a BEDPE line, or an SVB record read by decode, to the text of
+    its VCF line(s)
+    '''
+    variants = converter.convert(decode(line))
+    return ''.join([v.get_var_string() + '\n' for v in variants])
+
+def vcf_records(converter, vcf, line, decode=bedpe_from_line):
+    '''
+    Convert a BEDPE line, or an SVB record read by decode, to the SVB
+    records of its VCF line(s)
+    '''
+    variants = converter.convert(decode(line))
+    return ''.join([svb.Writer.frame(svb.encode_variant(v, vcf)) for v in variants])
+
 # primary function
-def bedpeToVcf(bedpe_file, vcf_out):
+def bedpeToVcf(bedpe_file, vcf_out, threads=1, binary_output=False):
     myvcf = Vcf()
     converter = BedpeToVcfConverter(myvcf)
-    in_header = True
+    if isinstance(bedpe_file, svb.Reader):
+        # SVB records are decoded straight to Bedpes
+        lines = iter(bedpe_file.header_lines)
+        records = bedpe_file.records()
+        decode = svb.decode_bedpe
+    else:
+        lines = records = iter(bedpe_file)
+        decode = bedpe_from_line
     # parse the bedpe data
     header = list()
-    for line in bedpe_file:
-        if in_header:
-            if line[0:2] == '##':
-                header.append(line)
-                continue
-            elif line[0] == '#' and line[1] != '#':    
-                sample_list_str = line.rstrip().split('\t', 20)[-1]
-                header.append('\t'.join([
-                                    '#CHROM',
-                                    'POS',
-                                    'ID',
-                                    'REF',
-                                    'ALT',
-                                    'QUAL',
-                                    'FILTER',
-                                    'INFO',
-                                    sample_list_str
-                                    ] ))
-                continue
-            else:
-                in_header = False
-                myvcf.add_header(header)
-                myvcf.file_format='VCFv4.2'
-                vcf_out.write(myvcf.get_header() + '\n')
-        # 
-        bedpe = Bedpe(line.rstrip().split('\t'))
-        variants = converter.convert(bedpe)
-        for v in variants:
-            vcf_out.write(v.get_var_string() + '\n')
+    for line in lines:
+        if line[0:2] == '##':
+            header.append(line)
+            continue
+        elif line[0] == '#' and line[1] != '#':    
+            sample_list_str = line.rstrip().split('\t', 20)[-1]
+            header.append('\t'.join([
+                                '#CHROM',
+                                'POS',
+                                'ID',
+                                'REF',
+                                'ALT',
+                                'QUAL',
+                                'FILTER',
+                                'INFO',
+                                sample_list_str
+                                ] ))
+            continue
+        else:
+            records = chain([line], records)
+            break
+
+    # the header is only written if there are records
+    for line in records:
+        myvcf.add_header(header)
+        myvcf.file_format='VCFv4.2'
+        if binary_output:
+            svb.Writer(vcf_out, svb.KIND_VCF, myvcf.get_header())
+        else:
+            vcf_out.write(myvcf.get_header() + '\n')
+        records = chain([line], records)
+        break
+
+    if binary_output:
+        transform = partial(vcf_records, converter, myvcf, decode=decode)
+    else:
+        transform = partial(vcf_lines, converter, decode=decode)
+    RecordPipeline(transform, threads).run(records, vcf_out)
 
     # close the VCF output file
     vcf_out.close()
@@ -51,11 +90,14 @@ def description():
     return 'convert a BEDPE file to VCF'
 
 def epilog():
-    return 'The input BEDPE file can be gzipped if it is specified explicitly.'
+    return 'The input BEDPE file can be gzipped if it is specified explicitly, or SVB from another subcommand.'
 
 def add_arguments_to_parser(parser):
     parser.add_argument('-b', '--bedpe', metavar='<BEDPE>', default=None, help='BEDPE input (default: stdin)')
     parser.add_argument('-o', '--output', metavar='<VCF>', type=argparse.FileType('w'), default=sys.stdout, help='Output VCF to write (default: stdout)')
+    parser.add_argument('-t', '--threads', metavar='<INT>', type=int, default=1, help='number of processes used to convert records in parallel [1]')
+    parser.add_argument('--region', metavar='<CHR:START-END>', default=None, help='only read the records overlapping a region of a bgzipped, indexed BEDPE (see svtools index)')
+    su.add_output_format_argument(parser, 'vcf', svb=True)
     parser.set_defaults(entry_point=run_from_args)
 
 def command_parser():
@@ -64,8 +106,9 @@ def command_parser():
     return parser
 
 def run_from_args(args):
-    with su.InputStream(args.bedpe) as stream:
-        bedpeToVcf(stream, args.output)
+    output_format = getattr(args, 'output_format', None)
+    with svb.open_input(args.bedpe, getattr(args, 'region', None)) as stream, su.OutputStream(args.output, output_format) as output_handle:
+        bedpeToVcf(stream, output_handle, getattr(args, 'threads', 1), output_format == 'svb')
 
 if __name__ == '__main__':
     parser = command_parser()
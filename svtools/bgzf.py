@@ -0,0 +1,263 @@
+'''
+Reading and writing BGZF, the blocked gzip format written by bgzip, and
+reading other compressed files ahead on a pool of threads
+'''
+import struct
+import zlib
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+BGZF_MAGIC = '\x1f\x8b\x08\x04'
+
+# the empty block bgzip ends a file with
+BGZF_EOF = BGZF_MAGIC + '\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00\x1b\x00\x03\x00\x00\x00\x00\x00\x00\x00\x00\x00'
+
+# the most data bgzip puts in a block, so that it fits even if deflate
+# doesn't shrink it
+MAX_BLOCK_DATA = 0xff00
+
+def is_bgzf(header):
+    '''
+    Check whether the first bytes of a file are the header of a BGZF block
+    '''
+    return len(header) >= 18 and header[:4] == BGZF_MAGIC and header[12:14] == 'BC'
+
+def read_block(handle):
+    '''
+    Read the next block from a BGZF file. Returns the deflated data along
+    with the CRC32 and size of the inflated data, or None at the end of the
+    file
+    '''
+    header = handle.read(18)
+    if len(header) == 0:
+        return None
+    if not is_bgzf(header):
+        raise IOError('Invalid BGZF block header')
+    xlen = struct.unpack('<H', header[10:12])[0]
+    bsize = struct.unpack('<H', header[16:18])[0]
+    # the rest of the extra field, the deflated data, the CRC32 and ISIZE
+    rest = handle.read(bsize + 1 - 18)
+    if len(rest) != bsize + 1 - 18:
+        raise IOError('Truncated BGZF block')
+    crc, isize = struct.unpack('<II', rest[-8:])
+    return (rest[xlen - 6:-8], crc, isize)
+
+def inflate_block(block):
+    '''
+    Inflate a block from read_block and check it against its CRC32
+    '''
+    deflated, crc, isize = block
+    # decompressobj releases the GIL while inflating
+    data = zlib.decompressobj(-15).decompress(deflated)
+    if len(data) != isize or (zlib.crc32(data) & 0xffffffff) != crc:
+        raise IOError('BGZF block failed its CRC check')
+    return data
+
+def deflate_block(data, level=6):
+    '''
+    Make a BGZF block holding up to MAX_BLOCK_DATA bytes of data
+    '''
+    c = zlib.compressobj(level, zlib.DEFLATED, -15)
+    deflated = c.compress(data) + c.flush()
+    header = BGZF_MAGIC + '\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00'
+    return header + struct.pack('<H', len(deflated) + 25) + deflated + \
+            struct.pack('<II', zlib.crc32(data) & 0xffffffff, len(data))
+
+class LineReader(object):
+    '''
+    The lines of the chunks of data from a subclass's _chunks
+    '''
+    def _lines(self):
+        partial = []
+        for data in self._chunks():
+            lines = data.split('\n')
+            if len(lines) == 1:
+                # the chunk sits inside a single line
+                partial.append(data)
+                continue
+            partial.append(lines[0])
+            yield ''.join(partial) + '\n'
+            for i in xrange(1, len(lines) - 1):
+                yield lines[i] + '\n'
+            partial = [lines[-1]]
+        tail = ''.join(partial)
+        if tail != '':
+            yield tail
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        return self.lines.next()
+
+    def readline(self):
+        return next(self.lines, '')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class BgzfReader(LineReader):
+    '''
+    Read the lines of a BGZF file. Blocks are inflated by a pool of threads
+    ahead of the lines being parsed. Readers of many files can share a
+    pool, and then should only inflate a few blocks ahead each.
+    '''
+    def __init__(self, file_name, threads=2, pool=None, ahead=None):
+        self.name = file_name
+        self.handle = open(file_name, 'rb')
+        self.own_pool = pool is None
+        self.pool = ThreadPool(threads) if pool is None else pool
+        self.ahead = 4 * threads if ahead is None else ahead
+        self.pending = deque()
+        self.lines = self._lines()
+
+    @property
+    def closed(self):
+        return self.handle.closed
+
+    def _chunks(self):
+        while True:
+            while len(self.pending) < self.ahead:
+                block = read_block(self.handle)
+                if block is None:
+                    break
+                self.pending.append(self.pool.apply_async(inflate_block, (block,)))
+            if len(self.pending) == 0:
+                return
+            yield self.pending.popleft().get()
+
+    def close(self):
+        if self.own_pool:
+            self.pool.terminate()
+            self.pool.join()
+        else:
+            for result in self.pending:
+                result.wait()
+        self.handle.close()
+
+class PrefetchReader(LineReader):
+    '''
+    Read the lines of a file object, which is read a chunk at a time on a
+    pool of threads ahead of the lines being parsed. zlib inflates without
+    holding the GIL, so the pool can inflate gzip files that can't be split
+    into blocks, one chunk of each at a time, while the lines of others are
+    parsed.
+    '''
+    def __init__(self, handle, pool, chunk_size=64*1024, ahead=2):
+        self.handle = handle
+        self.name = getattr(handle, 'name', None)
+        self.pool = pool
+        self.chunk_size = chunk_size
+        self.ahead = ahead
+        self.ready = deque()
+        # the read running on the pool, at most one so chunks come in order
+        self.task = None
+        self.eof = False
+        self.lines = self._lines()
+
+    @property
+    def closed(self):
+        return self.handle.closed
+
+    def _fill(self):
+        while len(self.ready) < self.ahead:
+            data = self.handle.read(self.chunk_size)
+            if data == '':
+                self.eof = True
+                return
+            self.ready.append(data)
+
+    def _chunks(self):
+        while True:
+            if self.task is not None and (len(self.ready) == 0 or self.task.ready()):
+                task, self.task = self.task, None
+                task.get()
+            if self.task is None and not self.eof and len(self.ready) < self.ahead:
+                self.task = self.pool.apply_async(self._fill)
+            if len(self.ready) > 0:
+                yield self.ready.popleft()
+            elif self.task is None:
+                return
+
+    def close(self):
+        if self.task is not None:
+            self.task.wait()
+        self.handle.close()
+
+class BgzfWriter(object):
+    '''
+    Write BGZF to a handle. Full blocks are deflated by a pool of threads
+    while more is written and are written to the handle in order. Closing
+    the writer ends the file with the EOF block but leaves the handle open,
+    like gzip.GzipFile does with a fileobj. Leaving a with block on an
+    exception writes out what was written but no EOF block, so the file
+    doesn't look complete.
+    '''
+    def __init__(self, handle, threads=2, level=6):
+        self.handle = handle
+        self.threads = threads
+        self.level = level
+        self.pool = ThreadPool(threads)
+        self.pending = deque()
+        self.buf = []
+        self.size = 0
+        self.closed = False
+        # used by print
+        self.softspace = 0
+
+    def _deflate(self, data):
+        self.pending.append(self.pool.apply_async(deflate_block, (data, self.level)))
+        while len(self.pending) > 4 * self.threads:
+            self.handle.write(self.pending.popleft().get())
+
+    def write(self, data):
+        self.buf.append(data)
+        self.size += len(data)
+        if self.size >= MAX_BLOCK_DATA:
+            data = ''.join(self.buf)
+            full = len(data) - len(data) % MAX_BLOCK_DATA
+            for i in xrange(0, full, MAX_BLOCK_DATA):
+                self._deflate(data[i:i + MAX_BLOCK_DATA])
+            self.buf = [data[full:]]
+            self.size = len(data) - full
+
+    def writelines(self, lines):
+        for l in lines:
+            self.write(l)
+
+    def flush(self):
+        '''
+        Write everything so far, ending the current block early
+        '''
+        if self.size > 0:
+            self._deflate(''.join(self.buf))
+            self.buf = []
+            self.size = 0
+        while len(self.pending) > 0:
+            self.handle.write(self.pending.popleft().get())
+        self.handle.flush()
+
+    def close(self, eof=True):
+        '''
+        Write everything so far and, with eof, the EOF block
+        '''
+        if self.closed:
+            return
+        try:
+            self.flush()
+            if eof:
+                self.handle.write(BGZF_EOF)
+                self.handle.flush()
+        finally:
+            self.closed = True
+            self.pool.terminate()
+            self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(eof=exc_type is None)
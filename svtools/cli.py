@@ -12,6 +12,8 @@ import svtools.bedpesort
 import svtools.genotype
 import svtools.prune
 import svtools.varlookup
+import svtools.tabix
+import svtools.svb
 
 class SupportAction(argparse.Action):
     def __call__(self, parser, namespace, values, option_string=None):
@@ -65,6 +67,12 @@ def svtools_cli_parser():
     varlookup = subparsers.add_parser('varlookup', help=svtools.varlookup.description())
     svtools.varlookup.add_arguments_to_parser(varlookup)
 
+    index = subparsers.add_parser('index', help=svtools.tabix.description(), epilog=svtools.tabix.epilog())
+    svtools.tabix.add_arguments_to_parser(index)
+
+    svb = subparsers.add_parser('svb', help=svtools.svb.description(), epilog=svtools.svb.epilog())
+    svtools.svb.add_arguments_to_parser(svb)
+
     return parser
 
 def main():
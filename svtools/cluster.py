@@ -1,13 +1,15 @@
+from svtools.contigs import DEFAULT_CONTIGS
+
 class Cluster(object):
     '''
     Stores information about overlapping SV and tracks the "best" one of the group
     '''
     def __init__(self):
         self.elements = [None]
-        self.chrom_a = None
+        self.chrom_a_id = None
         self.min_a = float("inf")
         self.max_a = 0
-        self.chrom_b = None
+        self.chrom_b_id = None
         self.min_b = float("inf")
         self.max_b = 0
         self.size = 0
@@ -16,6 +18,24 @@ class Cluster(object):
         self.sv_event = ''
         self.filter = 0
 
+    @property
+    def chrom_a(self):
+        if self.chrom_a_id is not None:
+            return DEFAULT_CONTIGS.name(self.chrom_a_id)
+
+    @chrom_a.setter
+    def chrom_a(self, name):
+        self.chrom_a_id = DEFAULT_CONTIGS.id(name)
+
+    @property
+    def chrom_b(self):
+        if self.chrom_b_id is not None:
+            return DEFAULT_CONTIGS.name(self.chrom_b_id)
+
+    @chrom_b.setter
+    def chrom_b(self, name):
+        self.chrom_b_id = DEFAULT_CONTIGS.id(name)
+
     def can_add(self, bedpe, max_distance):
         '''
         Check whether a bedpe object is addable to this cluster given the max_distance
@@ -27,12 +47,12 @@ class Cluster(object):
                     self.strand_b != bedpe.o2):
                 return False
 
-            if (self.chrom_a != bedpe.c1 or
+            if (self.chrom_a_id != bedpe.c1_id or
                     self.min_a - max_distance > bedpe.e1 or
                     self.max_a + max_distance < bedpe.s1):
                 return False
 
-            if (self.chrom_b != bedpe.c2 or
+            if (self.chrom_b_id != bedpe.c2_id or
                     self.min_b - max_distance > bedpe.e2 or
                     self.max_b + max_distance < bedpe.s2):
                 return False
@@ -52,10 +72,10 @@ class Cluster(object):
         self.size += 1
         self.sv_event=bedpe.svtype
         self.filter = max(self.filter,bedpe.af)
-        self.chrom_a = bedpe.c1
+        self.chrom_a_id = bedpe.c1_id
         self.min_a = min(self.min_a, bedpe.s1)
         self.max_a = max(self.max_a, bedpe.e1)
-        self.chrom_b = bedpe.c2
+        self.chrom_b_id = bedpe.c2_id
         self.min_b = min(self.min_b, bedpe.s2)
         self.max_b = max(self.max_b, bedpe.e2)
         self.strand_a = bedpe.o1
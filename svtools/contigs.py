@@ -0,0 +1,140 @@
+'''
+A dictionary of contig names shared by the tools. Names map to small
+integers so records on the same chromosome can be matched with integer
+compares, and chromosomes are ordered as listed in ##contig headers or a
+FASTA index, falling back to natural order (chr2 before chr10).
+'''
+import re
+import svtools.utils as su
+
+# file suffixes as matched by GNU sort -V, e.g. '.tar.gz'
+VERSION_SUFFIX = re.compile(r'(?:\.[A-Za-z~][A-Za-z0-9~]*)*$')
+DIGITS = re.compile(r'(\d+)')
+CONTIG_ID = re.compile(r'[<,]ID=([^,>]+)')
+
+def _version_order(c):
+    if c.isalpha():
+        return ord(c)
+    elif c == '~':
+        return -1
+    else:
+        return ord(c) + 256
+
+def _verrev_key(s):
+    # runs of non-digits compare character by character, ended by 0, and
+    # runs of digits compare as numbers
+    parts = DIGITS.split(s)
+    key = []
+    for i in xrange(0, len(parts), 2):
+        key.append(tuple(_version_order(c) for c in parts[i]) + (0,))
+        if i + 1 < len(parts):
+            key.append(int(parts[i + 1]))
+    return tuple(key)
+
+def version_key(s):
+    '''
+    Sort key ordering strings like GNU sort -V, so chromosome 2 comes
+    before 10 and GL000194.1 before GL000195.1
+    '''
+    # the empty string, '.', '..' and other names starting with '.' go first
+    if s == '':
+        return (0,)
+    elif s[0] == '.':
+        if s in ('.', '..'):
+            return (len(s),)
+        rank = 3
+    else:
+        rank = 4
+    cut = VERSION_SUFFIX.sub('', s, 1)
+    return (rank, _verrev_key(cut), _verrev_key(s))
+
+def read_contigs(file_name):
+    '''
+    Contig names, in order, from a FASTA index or from the ##contig lines
+    of a VCF
+    '''
+    contigs = []
+    with su.open_input(file_name) as f:
+        for l in f:
+            if l.startswith('##contig=<'):
+                m = CONTIG_ID.search(l)
+                if m:
+                    contigs.append(m.group(1))
+            elif l.startswith('#CHROM'):
+                # the end of a VCF header
+                break
+            elif l[0] != '#':
+                contigs.append(l.split('\t', 1)[0].rstrip())
+    return contigs
+
+class ContigDictionary(object):
+    '''
+    Map contig names to small integer IDs. The contigs the dictionary is
+    made with take the first IDs and sort in that order. Any other name is
+    given the next free ID when first seen and sorts after them in natural
+    order.
+    '''
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}
+        for name in names:
+            self.id(name)
+        self.ordered = len(self.names)
+        self.keys = {}
+
+    @classmethod
+    def from_header(cls, header):
+        '''
+        Make a dictionary from the ##contig lines of a VCF header
+        '''
+        names = []
+        for l in header:
+            if l.startswith('##contig=<'):
+                m = CONTIG_ID.search(l)
+                if m:
+                    names.append(m.group(1))
+        return cls(names)
+
+    @classmethod
+    def from_file(cls, file_name):
+        '''
+        Make a dictionary from a FASTA index or the header of a VCF
+        '''
+        return cls(read_contigs(file_name))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def id(self, name):
+        try:
+            return self.ids[name]
+        except KeyError:
+            contig_id = len(self.names)
+            self.ids[name] = contig_id
+            self.names.append(name)
+            return contig_id
+
+    def name(self, contig_id):
+        return self.names[contig_id]
+
+    def key(self, name):
+        '''
+        Sort key for a contig name. Keys are plain tuples so they can be
+        marshalled along with the records they order.
+        '''
+        try:
+            return self.keys[name]
+        except KeyError:
+            contig_id = self.ids.get(name)
+            if contig_id is not None and contig_id < self.ordered:
+                key = (0, contig_id)
+            else:
+                key = (1, version_key(name))
+            self.keys[name] = key
+            return key
+
+# used by records read without a header naming their contigs
+DEFAULT_CONTIGS = ContigDictionary()
@@ -1,27 +1,137 @@
 import argparse
+import errno
+import hashlib
+import os
 import sys
+from multiprocessing import Pool
 from subprocess import Popen, PIPE, STDOUT
 from svtools.vcf.file import Vcf
 import svtools.utils as su
 
-def run_cnvnator(cnvnator_path, root, window, coord_list):
-    # Read and run cnvnator
-    p1 = Popen(['cat', coord_list.name], stdout=PIPE)
+class CnvnatorCache(object):
+    '''
+    Copy numbers from earlier CNVnator runs, kept in a directory with a file
+    of regions and their copy number for each root file and window. Root
+    files are told apart by the SHA-1 of their contents, which is only
+    computed again when a root file's size or modification time changes.
+    '''
+    def __init__(self, directory):
+        self.directory = directory
+        self.digests = dict()
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def digest(self, root):
+        stat = os.stat(root)
+        key = '\t'.join([os.path.abspath(root), str(stat.st_size), repr(stat.st_mtime)])
+        if key in self.digests:
+            return self.digests[key]
+        digests_path = os.path.join(self.directory, 'digests')
+        if os.path.exists(digests_path):
+            with open(digests_path) as digests:
+                for line in digests:
+                    fields = line.rstrip('\n').rsplit('\t', 1)
+                    if fields[0] == key and len(fields) == 2:
+                        self.digests[key] = fields[1]
+        if key not in self.digests:
+            sha = hashlib.sha1()
+            with open(root, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), ''):
+                    sha.update(chunk)
+            self.digests[key] = sha.hexdigest()
+            with open(digests_path, 'a') as digests:
+                digests.write(key + '\t' + self.digests[key] + '\n')
+        return self.digests[key]
+
+    def path(self, root, window):
+        return os.path.join(self.directory, '{0}.{1}'.format(self.digest(root), window))
+
+    def load(self, root, window):
+        '''
+        The copy numbers cached for a root file and window by region
+        '''
+        results = dict()
+        path = self.path(root, window)
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    fields = line.rstrip('\n').split('\t')
+                    # a line cut short by an interrupted run has no newline
+                    if len(fields) == 2 and line.endswith('\n'):
+                        results[fields[0]] = fields[1]
+        return results
+
+    def store(self, root, window, results):
+        '''
+        Add a list of regions and their copy numbers to the cache
+        '''
+        with open(self.path(root, window), 'a') as f:
+            f.write(''.join('{0}\t{1}\n'.format(region, cn) for region, cn in results))
+
+def read_coordinates(coord_list):
+    '''
+    The regions in a coordinates file, up to a line containing exit
+    '''
+    regions = []
+    for line in coord_list:
+        region = line.strip()
+        if region == 'exit':
+            break
+        if region != '':
+            regions.append(region)
+    return regions
+
+def genotype(cnvnator_path, root, window, regions):
+    '''
+    Run cnvnator to genotype a list of regions and return the copy number
+    of each as text
+    '''
     cmd = map(str, [cnvnator_path, '-root', root, '-genotype', window])
-    p2 = Popen(cmd, stdin=p1.stdout, stdout=PIPE)
-    # NOTE the below awk command selects only those lines which were genotyped
+    p = Popen(cmd, stdin=PIPE, stdout=PIPE)
+    output = p.communicate(''.join(r + '\n' for r in regions) + 'exit\n')[0]
+    # NOTE only the lines which were genotyped are kept
     # The line beginning 'Assuming' looks to be the program reporting its assuming a male
     # Each line looks like
     # Genotype chr1:1-13000 5173T.root 0.377524 0.368896
     # The first number is the copy number for the requested window
     # The second seems to be the copy number for a fixed window size of 1000
     # See http://wiki.biouml.org/index.php/CNVnator_genotype_output_(file_format)
-    p3 = Popen(['awk', '{ if($1!="Assuming"){print $4} }'], stdin=p2.stdout, stdout=PIPE)
-    cn_list = map(float, p3.communicate()[0].split('\n')[:-1])
+    cn_list = []
+    for line in output.split('\n'):
+        fields = line.split()
+        if len(fields) >= 4 and fields[0] != 'Assuming':
+            cn_list.append(fields[3])
+    if len(cn_list) != len(regions):
+        sys.stderr.write('cnvnator returned {0} copy numbers for {1} regions of {2}\n'.format(len(cn_list), len(regions), root))
+        sys.exit(1)
     return cn_list
 
-def sv_readdepth(vcf_file, sample, root, window, vcf_out, cnvnator_path, coord_list):
-    cn = run_cnvnator(cnvnator_path, root, window, coord_list)
+def copynumbers(cnvnator_path, root, window, regions, cache=None):
+    '''
+    The copy number of each region. With a CnvnatorCache, cnvnator is only
+    run for the regions it doesn't have yet.
+    '''
+    known = cache.load(root, window) if cache is not None else dict()
+    missing = []
+    for region in regions:
+        if region not in known:
+            known[region] = None
+            missing.append(region)
+    if len(missing) > 0:
+        results = zip(missing, genotype(cnvnator_path, root, window, missing))
+        if cache is not None:
+            cache.store(root, window, results)
+        known.update(results)
+    return [float(known[region]) for region in regions]
+
+def run_cnvnator(cnvnator_path, root, window, coord_list, cache=None):
+    return copynumbers(cnvnator_path, root, window, read_coordinates(coord_list), cache)
+
+def sv_readdepth(vcf_file, sample, root, window, vcf_out, cnvnator_path, coord_list, cache=None):
+    cn = run_cnvnator(cnvnator_path, root, window, coord_list, cache)
     write_copynumber(vcf_file, sample, vcf_out, cn)
 
 def write_copynumber(vcf_file, sample, vcf_out, cn_list):
@@ -71,20 +181,78 @@ def write_copynumber(vcf_file, sample, vcf_out, cn_list):
     vcf_out.close()
     return
 
+def read_batch(batch_file):
+    '''
+    The sample, root file and output VCF on each line of a batch file
+    '''
+    entries = []
+    for line in batch_file:
+        if line.strip() == '' or line.startswith('#'):
+            continue
+        fields = line.rstrip('\n').split('\t')
+        if len(fields) != 3:
+            sys.stderr.write('Each line of the batch file must have a sample, a root file and an output VCF separated by tabs\n')
+            sys.exit(1)
+        entries.append(fields)
+    return entries
+
+def annotate_sample(args):
+    '''
+    Pool entry point that annotates one sample of a batch. A sys.exit is
+    handed back to the parent instead of taking the worker down with it.
+    '''
+    input_vcf, sample, root, window, output_vcf, output_format, cnvnator_path, regions, cache_dir = args
+    try:
+        cache = CnvnatorCache(cache_dir) if cache_dir is not None else None
+        cn = copynumbers(cnvnator_path, root, window, regions, cache)
+        if output_vcf.endswith('.gz'):
+            output_format = 'bgzf'
+        with su.InputStream(input_vcf) as stream, open(output_vcf, 'w') as f:
+            with su.OutputStream(f, output_format) as output_handle:
+                write_copynumber(stream, sample, output_handle, cn)
+        return 0
+    except SystemExit as e:
+        return e.code
+
+def run_batch(input_vcf, batch, window, cnvnator_path, coord_list, output_format=None, cache_dir=None, threads=1):
+    '''
+    Annotate each sample of a batch, as a list of sample, root file and
+    output VCF, on a pool of threads processes
+    '''
+    regions = read_coordinates(coord_list)
+    tasks = [(input_vcf, sample, root, window, output_vcf, output_format, cnvnator_path, regions, cache_dir)
+            for sample, root, output_vcf in batch]
+    if threads > 1:
+        pool = Pool(threads)
+        try:
+            codes = pool.map(annotate_sample, tasks, 1)
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        codes = map(annotate_sample, tasks)
+    for code in codes:
+        if code:
+            sys.exit(code)
+
 def description():
     return 'add copynumber information using cnvnator-multi'
 
 def epilog():
-    return '''As this program runs cnvnator-multi you must provide its location and must remember to have the ROOT package installed and properly configured. The input VCF file may be gzipped. If the input VCF file is omitted then the tool reads from stdin. Note that the coordinates file must end with a line containing the word exit.'''
+    return '''As this program runs cnvnator-multi you must provide its location and must remember to have the ROOT package installed and properly configured. The input VCF file may be gzipped. If the input VCF file is omitted then the tool reads from stdin. The coordinates file may end with a line containing the word exit. With --cache the copy numbers of each root file, window and region are kept to be reused by later runs. With --batch many samples are annotated from the same input VCF and coordinates, on -t processes, each to its own VCF.'''
 
 def add_arguments_to_parser(parser):
     parser.add_argument('-c', '--coordinates', metavar='<FILE>', type=argparse.FileType('r'), required=True, default=None, help='file containing coordinate for which to retrieve copynumber (required)')
-    parser.add_argument('-r', '--root', metavar='<FILE>', required=True, help='CNVnator .root histogram file (required)')
+    parser.add_argument('-r', '--root', metavar='<FILE>', default=None, help='CNVnator .root histogram file (required without --batch)')
     parser.add_argument('-w', '--window', metavar='<INT>', required=True, help='CNVnator window size (required)')
-    parser.add_argument('-s', '--sample', metavar='<STRING>', required=True, help='sample to annotate (required)')
+    parser.add_argument('-s', '--sample', metavar='<STRING>', default=None, help='sample to annotate (required without --batch)')
     parser.add_argument('--cnvnator', metavar='<PATH>', required=True, help='path to cnvnator-multi binary (required)')
     parser.add_argument('-v', '--input-vcf', metavar='<VCF>', default=None, help='VCF input')
     parser.add_argument('-o', '--output-vcf', metavar='<PATH>', type=argparse.FileType('w'), default=sys.stdout, help='output VCF to write (default: stdout)')
+    parser.add_argument('--cache', metavar='<DIRECTORY_PATH>', default=None, help='directory to keep CNVnator copy numbers in for later runs')
+    parser.add_argument('-b', '--batch', metavar='<FILE>', type=argparse.FileType('r'), default=None, help='file of samples to annotate instead of -s, one per line with the sample, its root file and the output VCF to write separated by tabs')
+    parser.add_argument('-t', '--threads', metavar='<INT>', type=int, default=1, help='number of processes annotating the samples of a batch in parallel [1]')
+    su.add_output_format_argument(parser, 'vcf')
     parser.set_defaults(entry_point=run_from_args)
 
 def command_parser():
@@ -93,8 +261,21 @@ def command_parser():
     return parser
 
 def run_from_args(args):
-    with su.InputStream(args.input_vcf) as stream:
-        sv_readdepth(stream, args.sample, args.root, args.window, args.output_vcf, args.cnvnator, args.coordinates)
+    cache_dir = getattr(args, 'cache', None)
+    batch = getattr(args, 'batch', None)
+    if batch is not None:
+        if args.input_vcf in (None, '-', 'stdin'):
+            sys.stderr.write('Please specify the input VCF with -v to annotate a batch\n')
+            sys.exit(1)
+        run_batch(args.input_vcf, read_batch(batch), args.window, args.cnvnator, args.coordinates,
+                getattr(args, 'output_format', None), cache_dir, getattr(args, 'threads', 1))
+        return
+    if args.sample is None or args.root is None:
+        sys.stderr.write('Please specify the sample and root file with -s and -r, or a batch with --batch\n')
+        sys.exit(1)
+    cache = CnvnatorCache(cache_dir) if cache_dir is not None else None
+    with su.InputStream(args.input_vcf) as stream, su.OutputStream(args.output_vcf, getattr(args, 'output_format', None)) as output_handle:
+        sv_readdepth(stream, args.sample, args.root, args.window, output_handle, args.cnvnator, args.coordinates, cache)
 
 # initialize the script
 if __name__ == '__main__':
@@ -0,0 +1,202 @@
+'''
+An external merge sort for text records. Records are sorted in memory up to
+a budget, spilled to compressed runs on disk and merged back with a heap.
+'''
+import heapq
+import marshal
+import os
+import re
+import struct
+import zlib
+import tempfile
+from collections import deque, namedtuple
+from multiprocessing import Pool
+from svtools.contigs import DEFAULT_CONTIGS
+
+# a record along with its sort key, which is worked out once when the record
+# is read
+Keyed = namedtuple("Keyed", ["key", "obj"])
+
+class TempRun(object):
+    '''
+    A sorted run of Keyed records spilled to disk. Records are written in
+    frames, each a marshalled list of (key, obj) pairs compressed with zlib
+    at level 1 and prefixed by its compressed size. The merge reads a frame
+    at a time and never parses a record again.
+    '''
+    frame_size = 64*1024
+
+    def __init__(self, path, records):
+        self.path = path
+        with open(path, 'wb') as f:
+            frame = []
+            frame_bytes = 0
+            for r in records:
+                frame.append((r.key, r.obj))
+                frame_bytes += len(r.obj)
+                if frame_bytes >= self.frame_size:
+                    self.write_frame(f, frame)
+                    frame = []
+                    frame_bytes = 0
+            if len(frame) > 0:
+                self.write_frame(f, frame)
+
+    @staticmethod
+    def write_frame(f, frame):
+        data = zlib.compress(marshal.dumps(frame), 1)
+        f.write(struct.pack('<I', len(data)))
+        f.write(data)
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            while True:
+                header = f.read(4)
+                if len(header) == 0:
+                    return
+                size = struct.unpack('<I', header)[0]
+                data = f.read(size)
+                if len(data) != size:
+                    raise IOError('Truncated frame in ' + self.path)
+                for key, obj in marshal.loads(zlib.decompress(data)):
+                    yield Keyed(key, obj)
+
+    def remove(self):
+        os.remove(self.path)
+
+# leading number as read by GNU sort -n
+NUMBER = re.compile(r'\s*(-?\d*(?:\.\d*)?)')
+# fields as split by GNU sort: each starts with the blanks in front of it,
+# which only matter to the version sorted fields
+VCF_FIELDS = re.compile(r'([ \t]*[^ \t]*)[ \t]*([^ \t]*)')
+BEDPE_FIELDS = re.compile(r'([ \t]*[^ \t]*)[ \t]*([^ \t]*)[ \t]*([^ \t]*)'
+        r'([ \t]*[^ \t]*)[ \t]*([^ \t]*)[ \t]*([^ \t]*)')
+
+def numeric_key(field):
+    '''
+    Sort key ordering fields like GNU sort -n. Anything without a leading
+    number counts as 0.
+    '''
+    if field.isdigit():
+        return int(field)
+    number = NUMBER.match(field).group(1)
+    try:
+        return float(number)
+    except ValueError:
+        return 0
+
+class VcfKey(object):
+    '''
+    Sort key for VCF records, the same as sort -k1,1V -k2,2n
+    '''
+    def __init__(self, contigs=DEFAULT_CONTIGS):
+        self.contigs = contigs
+
+    def __call__(self, line):
+        f = VCF_FIELDS.match(line).groups()
+        return (self.contigs.key(f[0]), numeric_key(f[1]))
+
+class BedpeKey(object):
+    '''
+    Sort key for BEDPE records, the same as
+    sort -k1,1V -k2,2n -k3,3n -k4,4V -k5,5n -k6,6n
+    '''
+    def __init__(self, contigs=DEFAULT_CONTIGS):
+        self.contigs = contigs
+
+    def __call__(self, line):
+        f = BEDPE_FIELDS.match(line).groups()
+        return (self.contigs.key(f[0]), numeric_key(f[1]), numeric_key(f[2]),
+                self.contigs.key(f[3]), numeric_key(f[4]), numeric_key(f[5]))
+
+def sort_run(args):
+    '''
+    Pool entry point that sorts a chunk of lines into a TempRun
+    '''
+    lines, record_key, path = args
+    records = [Keyed(record_key(l), l) for l in lines]
+    records.sort()
+    return TempRun(path, records)
+
+class ExternalSort(object):
+    '''
+    Sort the lines of a text file by record_key, breaking ties by comparing
+    whole lines like GNU sort does. Lines starting with '#' are passed
+    through ahead of the records.
+    '''
+    # rough cost of holding a line in memory beyond its text: the string
+    # object, its slot in the chunk and later its key and Keyed record
+    record_overhead = 256
+
+    def __init__(self, record_key, tempdir=None, max_memory=1024**3, threads=1, max_open=256):
+        self.record_key = record_key
+        self.tempdir = tempdir or tempfile.gettempdir()
+        self.max_memory = max_memory
+        self.threads = threads
+        self.max_open = max_open
+        self.runs = []
+        self.pending = deque()
+        self.pool = None
+
+    def temp_path(self):
+        temp_descriptor, path = tempfile.mkstemp(prefix='svtools.sort.', dir=self.tempdir)
+        os.close(temp_descriptor)
+        return path
+
+    def sort(self, input_stream, output_handle):
+        try:
+            if self.threads > 1:
+                self.pool = Pool(self.threads)
+                # each worker and the reader hold a chunk at a time
+                chunk_memory = self.max_memory / (self.threads + 1)
+            else:
+                chunk_memory = self.max_memory
+
+            lines = []
+            lines_bytes = 0
+            for l in input_stream:
+                if l[0] == '#':
+                    output_handle.write(l)
+                    continue
+                if l[-1:] == '\n':
+                    l = l[:-1]
+                lines.append(l)
+                lines_bytes += len(l) + self.record_overhead
+                if lines_bytes > chunk_memory:
+                    self.spill(lines)
+                    lines = []
+                    lines_bytes = 0
+
+            records = [Keyed(self.record_key(l), l) for l in lines]
+            del lines
+            records.sort()
+            while len(self.pending) > 0:
+                self.add_run(self.pending.popleft().get())
+            for r in heapq.merge(*(self.runs + [records])):
+                output_handle.write(r.obj + '\n')
+        finally:
+            if self.pool is not None:
+                self.pool.terminate()
+                self.pool.join()
+                self.pool = None
+            for run in self.runs:
+                run.remove()
+            self.runs = []
+
+    def spill(self, lines):
+        args = (lines, self.record_key, self.temp_path())
+        if self.pool is None:
+            self.add_run(sort_run(args))
+        else:
+            while len(self.pending) >= self.threads:
+                self.add_run(self.pending.popleft().get())
+            self.pending.append(self.pool.apply_async(sort_run, (args,)))
+
+    def add_run(self, run):
+        self.runs.append(run)
+        if len(self.runs) >= self.max_open:
+            # merge what we have so far into a single run to bound the
+            # number of files open at the end
+            merged = TempRun(self.temp_path(), heapq.merge(*self.runs))
+            for run in self.runs:
+                run.remove()
+            self.runs = [merged]
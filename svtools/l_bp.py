@@ -1,4 +1,9 @@
 import re
+import svtools.utils as su
+from svtools.contigs import DEFAULT_CONTIGS
+import numpy as np
+from array import array
+from itertools import chain, islice, repeat
 
 def find_all(a_str, sub):
     start = 0
@@ -12,7 +17,7 @@ def parse_vcf(vcf_file_name, vcf_lines, vcf_headers, add_sname=True):
     header = ''
     samples = ''
 
-    f = open(vcf_file_name, 'r')
+    f = su.open_input(vcf_file_name)
 
     for l in f:
         if l[0] == '#':
@@ -25,44 +30,51 @@ def parse_vcf(vcf_file_name, vcf_lines, vcf_headers, add_sname=True):
                 if l not in vcf_headers:
                     vcf_headers.append(l)
         else:
-            A = l.split('\t')
-            if not 'SECONDARY' in A[7]:
-
-                if add_sname and (samples != ''):
-                    A[7] += ';' + 'SNAME=' + ','.join(samples)
-                    l = '\t'.join(A)
-
-                
-                if 'SVTYPE=BND' in A[7]:
-                    m = re.search(r"(\[|\])(.*)(\[|\])",A[4])
-                    o_chr,o_pos = m.group(2).split(':')
-
-                    if (o_chr == A[0]) and (('--:' in A[7]) != ('++' in A[7])):
-                        neg_s = A[7].find('--:')
-                        pos_s = A[7].find('++:')
-
-                        if neg_s > 0:
-                            neg_e = neg_s + A[7][neg_s:].find(';') 
-                            pre=A[7][:neg_s]
-                            mid=A[7][neg_s:neg_e]
-                            post=A[7][neg_e:]
-                            A[7] = pre + '++:0,' + mid + post
-                        else:
-                            pos_e = pos_s + A[7][pos_s:].find(';') 
-                            pre=A[7][:pos_s]
-                            mid=A[7][pos_s:pos_e]
-                            post=A[7][pos_e:]
-                            A[7] = pre + mid + ',--:0' + post
-
-                        A[7] = 'SVTYPE=INV' + A[7][10:] + ';END=' + o_pos
-                        A[4] = '<INV>'
-                        l = '\t'.join(A)
+            l = prepare_vcf_record(l, samples, add_sname)
+            if l is not None:
                 vcf_lines.append(l)
 
     return samples
 
+def prepare_vcf_record(l, samples, add_sname=True):
+    '''
+    Get a record from a sample's LUMPY VCF ready for sorting: tag it with
+    the sample name and convert same chromosome, single strand BNDs to INVs.
+    Returns None for SECONDARY records.
+    '''
+    A = l.split('\t')
+    if 'SECONDARY' in A[7]:
+        return None
+
+    if add_sname and (samples != ''):
+        A[7] += ';' + 'SNAME=' + ','.join(samples)
+        l = '\t'.join(A)
+
+    if 'SVTYPE=BND' in A[7]:
+        m = re.search(r"(\[|\])(.*)(\[|\])",A[4])
+        o_chr,o_pos = m.group(2).split(':')
+
+        if (o_chr == A[0]) and (('--:' in A[7]) != ('++' in A[7])):
+            neg_s = A[7].find('--:')
+            pos_s = A[7].find('++:')
+
+            if neg_s > 0:
+                neg_e = neg_s + A[7][neg_s:].find(';') 
+                pre=A[7][:neg_s]
+                mid=A[7][neg_s:neg_e]
+                post=A[7][neg_e:]
+                A[7] = pre + '++:0,' + mid + post
+            else:
+                pos_e = pos_s + A[7][pos_s:].find(';') 
+                pre=A[7][:pos_s]
+                mid=A[7][pos_s:pos_e]
+                post=A[7][pos_e:]
+                A[7] = pre + mid + ',--:0' + post
 
-
+            A[7] = 'SVTYPE=INV' + A[7][10:] + ';END=' + o_pos
+            A[4] = '<INV>'
+            l = '\t'.join(A)
+    return l
 
 def parse_vcf_record(vcf_line):
 
@@ -138,8 +150,10 @@ def to_map(s):
 
     return m
 
-def vcf_line_key(l1):
+def vcf_line_key(l1, contigs=DEFAULT_CONTIGS):
     v1 = split_v(l1)[:8]
+    v1[1] = contigs.key(v1[1])
+    v1[2] = contigs.key(v1[2])
     v1[3] = v1[3][:2]
     return v1
 
@@ -189,27 +203,87 @@ def header_line_cmp(l1, l2):
         return 1
     return cmp(order.index(h1),order.index(h2))
 
-class breakpoint:
-    chr_l = ''
-    start_l = 0
-    end_l = 0
-    p_l = []
-
-    chr_r = ''
-    start_r = 0
-    end_r = 0
-    p_r = []
-
-    sv_type = ''
-
-    strands = ''
-    
-    l = ''
+def pad_pdf(p, slop, percent_slop, fixed_slop):
+    '''
+    Work out how a probability curve is padded with slop. Nothing is
+    materialized: returns the number of slop_prob positions before and after
+    the curve, how many leading values of p to drop and the normalizing sum
+    (None if no slop was requested).
+
+    slop is the (possibly negative) distance from the padded start to zero
+    and anything hanging over position zero is chewed off.
+    '''
+    if not ((percent_slop > 0) or (fixed_slop > 0)):
+        return [0, 0, 0, None]
+
+    pad, overhang = slop
+    lead = max(0, pad - overhang)
+    skip = min(len(p), max(0, overhang - pad))
+    trail = pad - max(0, overhang - pad - len(p))
+    # sum in the same order as the padded list would be summed
+    total = sum(chain(repeat(breakpoint.slop_prob, lead), islice(p, skip, None), repeat(breakpoint.slop_prob, trail)))
+    return [lead, trail, skip, total]
+
+def expand_pdf(p, lead, trail, total):
+    '''
+    Materialize a padded, normalized probability curve as a list
+    '''
+    if total is None:
+        return p.tolist()
+    slop_p = breakpoint.slop_prob / total
+    return [slop_p] * lead + [x / total for x in p] + [slop_p] * trail
+
+def expand_pdf_array(p, lead, trail, total):
+    '''
+    Materialize a padded, normalized probability curve as a numpy array
+    '''
+    a = np.frombuffer(p, dtype=np.float64)
+    if total is None:
+        return a.copy()
+    out = np.empty(lead + len(a) + trail)
+    out[:lead] = breakpoint.slop_prob / total
+    out[lead:lead + len(a)] = a / total
+    out[lead + len(a):] = breakpoint.slop_prob / total
+    return out
+
+class breakpoint(object):
+    '''
+    A LUMPY breakpoint with its left and right probability curves.
+
+    There are millions of these in a cohort merge, so the curves are kept as
+    array('d') buffers of the original PRPOS/PREND values and any slop
+    padding is stored as counts. p_l and p_r materialize the padded and
+    normalized curves on demand.
+    '''
+    __slots__ = ['l',
+                 'sv_type',
+                 'chr_l',
+                 'chr_l_id',
+                 'start_l',
+                 'end_l',
+                 '_p_l',
+                 '_lead_l',
+                 '_trail_l',
+                 '_sum_l',
+                 'chr_r',
+                 'chr_r_id',
+                 'start_r',
+                 'end_r',
+                 '_p_r',
+                 '_lead_r',
+                 '_trail_r',
+                 '_sum_r',
+                 'strands']
+
+    slop_prob = 1e-100
 
     def __init__(self, 
                  l,
                  percent_slop=0,
-                 fixed_slop=0):
+                 fixed_slop=0,
+                 contigs=DEFAULT_CONTIGS):
+        # the line is kept for output, so a RecordView is read in full
+        l = str(l)
         self.l = l
 
         [self.sv_type,\
@@ -221,68 +295,62 @@ class breakpoint:
         self.start_r, \
         self.end_r, 
         m] = split_v(l)
-
-        self.p_l = [float(x) for x in m['PRPOS'].split(',')]
-        self.p_r = [float(x) for x in m['PREND'].split(',')]
-
-        slop_prob = 1e-100
-        if ((percent_slop > 0) or (fixed_slop > 0)):
-
-            l_slop = int(max(percent_slop*(self.end_l - self.start_l + 1),fixed_slop))
-            r_slop = int(max(percent_slop*(self.end_r - self.start_r + 1),fixed_slop))
-
-            # pad each interval with slop_prob on each side.
-            self.start_l = self.start_l-l_slop
-            self.end_l = self.end_l+l_slop
-            new_p_l = [slop_prob] * l_slop + self.p_l + [slop_prob] * l_slop
-
-            self.start_r = self.start_r-r_slop
-            self.end_r = self.end_r+r_slop
-            new_p_r = [slop_prob] * r_slop + self.p_r + [slop_prob] * r_slop
-
-            # chew off overhang if self.start_l or self.start_r less than 0
-            if self.start_l < 0:
-                new_p_l = new_p_l[-self.start_l:]
-                self.start_l = 0
-            if self.start_r < 0:
-                new_p_r = new_p_r[-self.start_r:]
-                self.start_r = 0
-
-            # normalize so each probability curve sums to 1.
-            sum_p_l = sum(new_p_l)
-            self.p_l = [float(x)/sum_p_l for x in new_p_l]
-            sum_p_r = sum(new_p_r)
-            self.p_r = [float(x)/sum_p_r for x in new_p_r]
-
-            # old_l = float(self.end_l - self.start_l + 1)
-            
-            # self.start_l = max(0,self.start_l-l_slop)
-            # self.end_l = self.end_l+l_slop
-
-            # new_l = float(self.end_l - self.start_l + 1)
-
-            # new_p_l = []
-            # for i in range(self.end_l-self.start_l+1):
-            #     p = i/new_l
-            #     old_i = int(p*old_l)
-            #     new_p_l.append(self.p_l[old_i])
-            # sum_p_l = sum(new_p_l)
-            # self.p_l = [float(x)/sum_p_l for x in new_p_l]
-
-            # old_r = float(self.end_r - self.start_r + 1)
-
-            # self.start_r = max(0,self.start_r-r_slop)
-            # self.end_r = self.end_r+r_slop
-
-            # new_r = float(self.end_r - self.start_r + 1)
-
-            # new_p_r = []
-            # for i in range(self.end_r-self.start_r+1):
-            #     p = float(i)/new_r
-            #     old_i = int(p*old_r)
-            #     new_p_r.append(self.p_r[old_i])
-            # sum_p_r = max(1,sum(new_p_r))
-            # self.p_r = [float(x)/sum_p_r for x in new_p_r]
+        self.chr_l_id = contigs.id(self.chr_l)
+        self.chr_r_id = contigs.id(self.chr_r)
+
+        p_l = array('d', [float(x) for x in m['PRPOS'].split(',')])
+        p_r = array('d', [float(x) for x in m['PREND'].split(',')])
+
+        l_slop = int(max(percent_slop*(self.end_l - self.start_l + 1),fixed_slop))
+        r_slop = int(max(percent_slop*(self.end_r - self.start_r + 1),fixed_slop))
+        has_slop = (percent_slop > 0) or (fixed_slop > 0)
+        if not has_slop:
+            l_slop = r_slop = 0
+
+        # pad each interval with slop_prob on each side, chewing off any
+        # overhang if the padded start is less than 0
+        self.start_l = self.start_l-l_slop
+        self.end_l = self.end_l+l_slop
+        [self._lead_l, self._trail_l, skip_l, self._sum_l] = \
+                pad_pdf(p_l, [l_slop, max(0, -self.start_l)], percent_slop, fixed_slop)
+        if has_slop:
+            self.start_l = max(0, self.start_l)
+
+        self.start_r = self.start_r-r_slop
+        self.end_r = self.end_r+r_slop
+        [self._lead_r, self._trail_r, skip_r, self._sum_r] = \
+                pad_pdf(p_r, [r_slop, max(0, -self.start_r)], percent_slop, fixed_slop)
+        if has_slop:
+            self.start_r = max(0, self.start_r)
+
+        self._p_l = p_l[skip_l:] if skip_l else p_l
+        self._p_r = p_r[skip_r:] if skip_r else p_r
+
+    @property
+    def p_l(self):
+        '''
+        The left probability curve, padded with slop and normalized
+        '''
+        return expand_pdf(self._p_l, self._lead_l, self._trail_l, self._sum_l)
+
+    @property
+    def p_r(self):
+        '''
+        The right probability curve, padded with slop and normalized
+        '''
+        return expand_pdf(self._p_r, self._lead_r, self._trail_r, self._sum_r)
+
+    def p_l_array(self):
+        '''
+        The left probability curve as a numpy array
+        '''
+        return expand_pdf_array(self._p_l, self._lead_l, self._trail_l, self._sum_l)
+
+    def p_r_array(self):
+        '''
+        The right probability curve as a numpy array
+        '''
+        return expand_pdf_array(self._p_r, self._lead_r, self._trail_r, self._sum_r)
 
     def __str__(self):
         return '\t'.join([str(x) for x in [self.chr_l, \
@@ -319,13 +387,16 @@ class breakpoint:
         self_start_off_r = c_start_r - self.start_r
         b_start_off_r = c_start_r - b.start_r
 
+        self_p_l, b_p_l = self.p_l, b.p_l
+        self_p_r, b_p_r = self.p_r, b.p_r
+
         ovl_l = 0
         for i in range(c_l_len):
-            ovl_l += min(self.p_l[i+self_start_off_l], b.p_l[i+b_start_off_l])
+            ovl_l += min(self_p_l[i+self_start_off_l], b_p_l[i+b_start_off_l])
 
         ovl_r = 0
         for i in range(c_r_len):
-            ovl_r += min(self.p_r[i+self_start_off_r], b.p_r[i+b_start_off_r])
+            ovl_r += min(self_p_r[i+self_start_off_r], b_p_r[i+b_start_off_r])
 
         return ovl_l * ovl_r
 
@@ -382,6 +453,25 @@ def align_intervals(I):
         
     return [start, end, new_I]
 
+def align_intervals_matrix(I):
+    '''
+    Same as align_intervals, but the zero-padded probability curves are
+    returned as the rows of a single 2-D numpy array
+    '''
+    START = 0
+    END = 1
+    P = 2
+
+    start = min(i[START] for i in I)
+    end = max(i[END] for i in I)
+
+    M = np.zeros((len(I), end - start + 1))
+    for row, i in enumerate(I):
+        offset = i[START] - start
+        M[row, offset:offset + len(i[P])] = i[P]
+
+    return [start, end, M]
+
 
 class node:
     b = None
@@ -0,0 +1,231 @@
+'''
+Sweep-line search for the largest sets of breakpoints that intersect on both
+their left and right intervals
+'''
+import heapq
+from bisect import bisect_left, bisect_right
+
+class MaxTree(object):
+    '''
+    Segment tree over a list of values supporting point updates, finding the
+    leftmost maximum and listing the positions holding at least a threshold
+    '''
+    def __init__(self, values, empty):
+        size = 1
+        while size < len(values):
+            size *= 2
+        t = [empty] * (2 * size)
+        t[size:size + len(values)] = values
+        for i in xrange(size - 1, 0, -1):
+            t[i] = max(t[2 * i], t[2 * i + 1])
+        self.size = size
+        self.t = t
+
+    def max(self):
+        return self.t[1]
+
+    def update(self, i, value):
+        t = self.t
+        i += self.size
+        t[i] = value
+        i >>= 1
+        while i:
+            a = t[2 * i]
+            b = t[2 * i + 1]
+            t[i] = a if a > b else b
+            i >>= 1
+
+    def leftmost_max(self):
+        t = self.t
+        i = 1
+        while i < self.size:
+            i *= 2
+            if t[i] != t[i >> 1]:
+                i += 1
+        return i - self.size
+
+    def at_least(self, end, threshold):
+        '''
+        Positions before end holding a value >= threshold
+        '''
+        t = self.t
+        found = []
+        stack = [(1, 0, self.size)]
+        while stack:
+            i, lo, hi = stack.pop()
+            if lo >= end or t[i] < threshold:
+                continue
+            if i >= self.size:
+                found.append(lo)
+                continue
+            mid = (lo + hi) / 2
+            stack.append((2 * i + 1, mid, hi))
+            stack.append((2 * i, lo, mid))
+        return found
+
+class DepthTree(object):
+    '''
+    Segment tree over a set of points supporting adding to a range of points
+    and reading the maximum over all of them
+    '''
+    def __init__(self, n):
+        size = 1
+        while size < n:
+            size *= 2
+        self.size = size
+        self.mx = [0] * (2 * size)
+        self.add_at = [0] * (2 * size)
+
+    def max(self):
+        return self.mx[1]
+
+    def add(self, lo, hi, value):
+        '''
+        Add value to the points lo to hi inclusive
+        '''
+        mx = self.mx
+        add_at = self.add_at
+        l = lo + self.size
+        r = hi + self.size + 1
+        l0 = l
+        r0 = r - 1
+        while l < r:
+            if l & 1:
+                mx[l] += value
+                add_at[l] += value
+                l += 1
+            if r & 1:
+                r -= 1
+                mx[r] += value
+                add_at[r] += value
+            l >>= 1
+            r >>= 1
+        # refresh the ancestors of both ends, which share a path to the root
+        # once they meet
+        l0 >>= 1
+        r0 >>= 1
+        while l0 != r0:
+            a = mx[2 * l0]
+            b = mx[2 * l0 + 1]
+            mx[l0] = (a if a > b else b) + add_at[l0]
+            a = mx[2 * r0]
+            b = mx[2 * r0 + 1]
+            mx[r0] = (a if a > b else b) + add_at[r0]
+            l0 >>= 1
+            r0 >>= 1
+        while l0:
+            a = mx[2 * l0]
+            b = mx[2 * l0 + 1]
+            mx[l0] = (a if a > b else b) + add_at[l0]
+            l0 >>= 1
+
+def largest_intersecting_sets(BP, snapshot_every=128):
+    '''
+    Repeatedly find the largest set of breakpoints that intersect on both
+    sides and remove it. BP must be sorted by start_l.
+
+    Returns lists of indices into BP. The sets, their order and the order of
+    the indices within each set are the same as the original sweep, which
+    rescanned every remaining breakpoint each time a set was removed.
+    '''
+    n = len(BP)
+    start_l = [b.start_l for b in BP]
+    end_l = [b.end_l for b in BP]
+    start_r = [b.start_r for b in BP]
+    end_r = [b.end_r for b in BP]
+
+    # the right intervals as ranges over the distinct start_r values, which
+    # is where the depth of the right intervals can peak
+    points = sorted(set(start_r))
+    r_lo = [bisect_left(points, s) for s in start_r]
+    r_hi = [max(lo, bisect_right(points, e) - 1) for lo, e in zip(r_lo, end_r)]
+
+    alive = [True] * n
+    # removing a set can only shrink the sets found further along, so the
+    # affected entries of best are left as upper bounds until they are needed
+    stale = [False] * n
+    ends = MaxTree(end_l, float('-inf'))
+    depth = DepthTree(len(points))
+    # best[i] is the size of the largest set found when the sweep reaches i
+    best = MaxTree([0] * n, -1)
+
+    def update_best(first, last):
+        active = [(end_l[j], j) for j in ends.at_least(first, start_l[first])]
+        heapq.heapify(active)
+        for e, j in active:
+            depth.add(r_lo[j], r_hi[j], 1)
+        for i in xrange(first, last + 1):
+            if not alive[i]:
+                continue
+            while active and active[0][0] < start_l[i]:
+                e, j = heapq.heappop(active)
+                depth.add(r_lo[j], r_hi[j], -1)
+            heapq.heappush(active, (end_l[i], i))
+            depth.add(r_lo[i], r_hi[i], 1)
+            best.update(i, depth.max())
+            stale[i] = False
+        for e, j in active:
+            depth.add(r_lo[j], r_hi[j], -1)
+
+    # snapshots[k] is the left heap as the sweep reaches k * snapshot_every
+    snapshots = [[]]
+
+    def left_heap(stop):
+        k = min(len(snapshots) - 1, stop / snapshot_every)
+        h_l = list(snapshots[k])
+        for i in xrange(k * snapshot_every, stop + 1):
+            if i % snapshot_every == 0 and i / snapshot_every == len(snapshots):
+                snapshots.append(list(h_l))
+            if not alive[i]:
+                continue
+            while (len(h_l) > 0) and (h_l[0][0] < start_l[i]):
+                heapq.heappop(h_l)
+            heapq.heappush(h_l, (end_l[i], i))
+        return h_l
+
+    def right_sweep(h_l):
+        h_r = []
+        max_c = []
+        max_c_len = 0
+        h_l_i = [x[1] for x in h_l]
+        h_l_i.sort(key=lambda x: start_r[x])
+        for j in h_l_i:
+            while (len(h_r) > 0) and (h_r[0][0] < start_r[j]):
+                heapq.heappop(h_r)
+            heapq.heappush(h_r, (end_r[j], j))
+            if max_c_len < len(h_r):
+                max_c_len = len(h_r)
+                max_c = [y[1] for y in h_r]
+        return max_c
+
+    if n > 0:
+        update_best(0, n - 1)
+
+    C = []
+    remaining = n
+    while remaining > 0:
+        # the first breakpoint whose left heap holds the largest set is
+        # where the original sweep would have found it
+        max_i = best.leftmost_max()
+        if stale[max_i]:
+            last = max_i
+            while last + 1 < n and stale[last + 1]:
+                last += 1
+            update_best(max_i, last)
+            continue
+        max_c = right_sweep(left_heap(max_i))
+        C.append(max_c)
+
+        for c in max_c:
+            alive[c] = False
+            ends.update(c, float('-inf'))
+            best.update(c, -1)
+        remaining -= len(max_c)
+
+        first = min(max_c)
+        del snapshots[first / snapshot_every + 1:]
+        # only breakpoints whose left heap held a removed one are affected
+        last = max(bisect_right(start_l, end_l[c]) - 1 for c in max_c)
+        stale[first + 1:last + 1] = [True] * (last - first)
+
+    return C
@@ -1,8 +1,17 @@
 import svtools.l_bp as l_bp
+import svtools.l_sweep as l_sweep
+import svtools.utils as su
+import svtools.svb as svb
 
 import sys
 import numpy as np
 import argparse
+from itertools import chain, count
+from svtools.record_pipeline import map_in_order
+
+# Merged variants are numbered in file order as they are written out, so the
+# lines are built around this placeholder for the ID
+ID_SLOT = '\0'
 
 def get_p(ls):
     return np.exp(ls)
@@ -33,7 +42,8 @@ def ls_add(x, y):
         return x + np.log(1 + np.exp(y - x))
 
 
-def print_var_line(l):
+def print_var_line(l, output_handle=None):
+    output_handle = output_handle or sys.stdout
     A = l.rstrip().split('\t')
 
     if A[4] == '<INV>' and ('--:0' in A[7] or '++:0' in A[7]):
@@ -147,13 +157,88 @@ def print_var_line(l):
 
         A[7] += ';MATEID=' + A[2] + '_2'
         A[2] += '_1'
-        print '\t'.join(A[:8])
-        print '\t'.join([str(o) for o in O])
+        print >> output_handle, '\t'.join(A[:8])
+        print >> output_handle, '\t'.join([str(o) for o in O])
 
     else:
-        print '\t'.join(A[:8])
-
-def merge(BP, sample_order, v_id, use_product):
+        print >> output_handle, '\t'.join(A[:8])
+
+def serial_sum(a):
+    '''
+    Sum a vector left to right. numpy's sum() uses pairwise summation, which
+    rounds differently from the running sums that lmerge has always used.
+    '''
+    return np.add.accumulate(a)[-1]
+
+def combine_pdfs(a_L, a_R, use_product):
+    '''
+    Combine the aligned probability curves of a cluster (one row per
+    breakpoint) into a single curve for each side. Returns the algorithm
+    actually used along with the two curves.
+    '''
+    p_L = a_L.sum(axis=0)
+    p_R = a_R.sum(axis=0)
+
+    ALG = 'SUM'
+    if use_product:
+        pmax_i_L = np.argmax(p_L)
+        pmax_i_R = np.argmax(p_R)
+
+        # only take the product if every breakpoint supports the peak
+        miss = np.count_nonzero((a_L[:, pmax_i_L] == 0) | (a_R[:, pmax_i_R] == 0))
+        if miss == 0:
+            ALG = 'PROD'
+            with np.errstate(divide='ignore'):
+                ls_p_L = np.log(a_L).sum(axis=0)
+                ls_p_R = np.log(a_R).sum(axis=0)
+
+            # The normalizing constant is folded with ls_add, rather than
+            # np.logaddexp, as PROD curves are printed at full precision.
+            ls_sum_L = reduce(ls_add, ls_p_L, get_ls(0))
+            ls_sum_R = reduce(ls_add, ls_p_R, get_ls(0))
+
+            p_L = np.exp(ls_p_L - ls_sum_L)
+            p_R = np.exp(ls_p_R - ls_sum_R)
+
+    # NOTE both sides are scaled by sum_L. trim_pdf renormalizes each side
+    sum_L = serial_sum(p_L)
+    return [ALG, p_L / sum_L, p_R / sum_L]
+
+def trim_pdf(p):
+    '''
+    Clip the zero probability positions off both ends of a curve and
+    renormalize it. Returns the number of positions clipped from the start
+    along with the new curve.
+    '''
+    nonzero = np.flatnonzero(p)
+    clip_start = nonzero[0]
+    p = p[clip_start:nonzero[-1] + 1]
+    return [int(clip_start), p / serial_sum(p)]
+
+def ci95(p, max_i):
+    '''
+    Grow a window symmetrically around max_i until it holds at least 95% of
+    the probability (or covers the whole curve). Returns the window bounds
+    relative to max_i as a CIPOS95/CIEND95 style string.
+    '''
+    # each window is summed left to right, as the rounding of the sums
+    # decides the bounds near 0.95
+    p = p.tolist()
+    last = len(p) - 1
+    start = end = max_i
+    total = p[max_i]
+    while total < 0.95 and (start > 0 or end < last):
+        start = max(0, start - 1)
+        end = min(last, end + 1)
+        total = sum(p[start:end + 1])
+
+    return str(start - max_i) + ',' + str(end - max_i)
+
+def merge(BP, use_product):
+    '''
+    Merge a set of overlapping breakpoints. Returns the merged variant lines
+    split around ID_SLOT
+    '''
     if len(BP) == 1:
         A = BP[0].l.rstrip().split('\t')
         #tack on id to SNAME
@@ -168,8 +253,7 @@ def merge(BP, sample_order, v_id, use_product):
             A[7]+= ':' + A[2]
 
         # reset the id to be unique in this file
-        v_id += 1
-        A[2] = str(v_id)
+        A[2] = ID_SLOT
 
         #clip out old mate id
         s_start=A[7].find('MATEID=')
@@ -196,162 +280,52 @@ def merge(BP, sample_order, v_id, use_product):
         else:
             A[7] += ';ALG=SUM'
  
-        print_var_line('\t'.join(A))
-        return v_id
+        return ['\t'.join(A).split(ID_SLOT)]
 
     #Sweep the set.  Find the largest intersecting set.  Remove it.  Continue.
-    import heapq
-
     BP.sort(key=lambda x: x.start_l)
 
-    BP_i = range(len(BP))
-    C = []
-
-    while len(BP_i) > 0:
-        h_l = []
-        max_c = []
-        max_c_len = 0
-        for i in BP_i:
-            while (len(h_l) > 0) and (h_l[0][0] < BP[i].start_l):
-                heapq.heappop(h_l)
-
-            heapq.heappush(h_l, (BP[i].end_l, i))
-
-            # at this point everything in h_l intersects on the left
-            # but we need to take into account what is going on on the right 
-            h_r = []
-            h_l_i = [x[1] for x in h_l]
-            h_l_i.sort(key=lambda x:BP[x].start_r)
-            for j in h_l_i:
-                while (len(h_r) > 0) and (h_r[0][0] < BP[j].start_r):
-                    heapq.heappop(h_r)
-
-                heapq.heappush(h_r, (BP[j].end_r, j))
+    C = l_sweep.largest_intersecting_sets(BP)
 
-                if max_c_len < len(h_r):
-                    max_c_len = len(h_r)
-                    max_c = [y[1] for y in h_r]
-
-        C.append(max_c)
-        for c in max_c:
-            BP_i.remove(c)
+    templates = []
 
     for c in C:
         L = []
         R = []
         for b_i in c:
             b = BP[b_i]
-            L.append([b.start_l,b.end_l,b.p_l])
-            R.append([b.start_r,b.end_r,b.p_r])
-
-        [start_R, end_R, a_R] = l_bp.align_intervals(R)
-        [start_L, end_L, a_L] = l_bp.align_intervals(L)
-
-        p_L = [0] * len(a_L[0])
-        p_R = [0] * len(a_R[0])
+            L.append([b.start_l,b.end_l,b.p_l_array()])
+            R.append([b.start_r,b.end_r,b.p_r_array()])
 
-        for c_i in range(len(c)):
-            for i in range(len(a_L[c_i])):
-                p_L[i] += a_L[c_i][i]
-
-            for i in range(len(a_R[c_i])):
-                p_R[i] += a_R[c_i][i]
-
-        ALG = 'SUM'
-        if use_product:
-            pmax_i_L = p_L.index(max(p_L))
-            pmax_i_R = p_R.index(max(p_R))
+        [start_R, end_R, a_R] = l_bp.align_intervals_matrix(R)
+        [start_L, end_L, a_L] = l_bp.align_intervals_matrix(L)
 
-            miss = 0
-            for c_i in range(len(c)):
-                if (a_L[c_i][pmax_i_L] == 0) or (a_R[c_i][pmax_i_R] == 0):
-                    miss += 1
-            if miss == 0:
-                ALG = "PROD"
-                ls_p_L = [get_ls(1)] * len(a_L[0])
-                ls_p_R = [get_ls(1)] * len(a_R[0])
-                for c_i in range(len(c)):
-                    for i in range(len(a_L[c_i])):
-                        ls_p_L[i] = ls_multiply(ls_p_L[i], get_ls(a_L[c_i][i]))
+        [ALG, p_L, p_R] = combine_pdfs(a_L, a_R, use_product)
 
-                    for i in range(len(a_R[c_i])):
-                        ls_p_R[i] = ls_multiply(ls_p_R[i], get_ls(a_R[c_i][i]))
+        [clip_start_L, p_L] = trim_pdf(p_L)
+        [clip_start_R, p_R] = trim_pdf(p_R)
 
-                ls_sum_L = get_ls(0)
-                ls_sum_R = get_ls(0)
-
-                for ls_p in ls_p_L:
-                    ls_sum_L = ls_add(ls_sum_L, ls_p)
-
-                for ls_p in ls_p_R:
-                    ls_sum_R = ls_add(ls_sum_R, ls_p)
-
-                p_L = []
-                for ls_p in ls_p_L:
-                    p_L.append(get_p(ls_divide(ls_p, ls_sum_L)))
-
-                p_R = []
-                for ls_p in ls_p_R:
-                    p_R.append(get_p(ls_divide(ls_p, ls_sum_R)))
-
-        sum_L = sum(p_L)
-        sum_R = sum(p_R)
-        p_L = [x/sum_L for x in p_L]
-        p_R = [x/sum_L for x in p_R]
+        new_start_L = start_L + clip_start_L
+        new_start_R = start_R + clip_start_R
 
-        [clip_start_L, clip_end_L] = l_bp.trim(p_L)
-        [clip_start_R, clip_end_R] = l_bp.trim(p_R)
+        max_i_L = int(np.argmax(p_L))
+        max_i_R = int(np.argmax(p_R))
 
-        new_start_L = start_L + clip_start_L
-        new_end_L = end_L - clip_end_L
+        CIPOS95 = ci95(p_L, max_i_L)
+        CIEND95 = ci95(p_R, max_i_R)
 
-        new_start_R = start_R + clip_start_R
-        new_end_R = end_R - clip_end_R
-
-        p_L = p_L[clip_start_L:len(p_L)-clip_end_L]
-        p_R = p_R[clip_start_R:len(p_R)-clip_end_R]
-
-        s_p_L = sum(p_L)
-        s_p_R = sum(p_R)
-
-        p_L = [x/s_p_L for x in p_L]
-        p_R = [x/s_p_R for x in p_R]
-
-        max_i_L = p_L.index(max(p_L))
-        max_i_R = p_R.index(max(p_R))
-
-        ninefive_i_L_start = max_i_L
-        ninefive_i_L_end = max_i_L
-        ninefive_i_L_total = p_L[max_i_L]
-        updated = 0
-        while (ninefive_i_L_total < 0.95):
-            if (ninefive_i_L_start <= 0) and (ninefive_i_L_end >= (len(p_L)-1)):
-                break
-            ninefive_i_L_start = max(0, ninefive_i_L_start - 1)
-            ninefive_i_L_end = min(len(p_L)-1, ninefive_i_L_end +1)
-            ninefive_i_L_total = sum(p_L[ninefive_i_L_start:ninefive_i_L_end+1])
-        ninefive_i_L_start = ninefive_i_L_start - max_i_L
-        ninefive_i_L_end = ninefive_i_L_end - max_i_L
-
-        ninefive_i_R_start = max_i_R
-        ninefive_i_R_end = max_i_R
-        ninefive_i_R_total = p_R[max_i_R]
-        updated = 0
-        while (ninefive_i_R_total < 0.95):
-            if (ninefive_i_R_start <= 0) and (ninefive_i_R_end >= len(p_R)-1):
-                break
-            ninefive_i_R_start = max(0, ninefive_i_R_start - 1)
-            ninefive_i_R_end = min(len(p_R)-1, ninefive_i_R_end +1)
-            ninefive_i_R_total = sum(p_R[ninefive_i_R_start:ninefive_i_R_end+1])
-        ninefive_i_R_end = ninefive_i_R_end - max_i_R
-        ninefive_i_R_start = ninefive_i_R_start - max_i_R
-        CIPOS95=str(ninefive_i_L_start) + ',' + str(ninefive_i_L_end)
-        CIEND95=str(ninefive_i_R_start) + ',' + str(ninefive_i_R_end)
+        # PROD curves have always been numpy scalars, which str() prints at
+        # full precision. SUM curves were python floats.
+        if ALG == 'PROD':
+            p_L = list(p_L)
+            p_R = list(p_R)
+        else:
+            p_L = p_L.tolist()
+            p_R = p_R.tolist()
 
         CHROM = BP[c[0]].chr_l
         POS = new_start_L + max_i_L
-        v_id += 1
-        ID = str(v_id)
+        ID = ID_SLOT
         REF = 'N'
 
         ALT = ''
@@ -436,7 +410,7 @@ def merge(BP, sample_order, v_id, use_product):
             SVLEN = (new_start_R + max_i_R) - (new_start_L + max_i_L)
 
         # Don't set SVLEN if we have an interchromosomal event. Doesn't make any sense.
-        if BP[c[0]].chr_l != BP[c[0]].chr_r:
+        if BP[c[0]].chr_l_id != BP[c[0]].chr_r_id:
             SVLEN = None
 
         END = new_start_R + max_i_R
@@ -483,46 +457,107 @@ def merge(BP, sample_order, v_id, use_product):
 
         O = [CHROM,POS,ID,REF,ALT,QUAL,FILTER,INFO]
 
-        print_var_line('\t'.join([str(o) for o in O]))
-    return v_id
+        templates.append('\t'.join([str(o) for o in O]).split(ID_SLOT))
+    return templates
 
-def r_cluster(BP_l, sample_order, v_id, use_product):
+def r_cluster(BP_l, use_product):
     # need to resort based on the right side, then extract clusters
     BP_l.sort(key=lambda x: x.start_r)
     BP_l.sort(key=lambda x: x.chr_r)
 
+    templates = []
     BP_r = []
     BP_max_end_r = -1
-    BP_chr_r = ''
+    BP_chr_r = -1
 
     for b in BP_l:
         if (len(BP_r) == 0) or \
            ((b.start_r <= BP_max_end_r) and \
-           (b.chr_r == BP_chr_r)):
+           (b.chr_r_id == BP_chr_r)):
             BP_r.append(b)
             BP_max_end_r = max(BP_max_end_r, b.end_r)
-            BP_chr_r = b.chr_r
+            BP_chr_r = b.chr_r_id
         else:
-            v_id = merge(BP_r, sample_order, v_id, use_product)
+            templates += merge(BP_r, use_product)
             BP_r = [b]
             BP_max_end_r = b.end_r
-            BP_chr_r = b.chr_r
+            BP_chr_r = b.chr_r_id
  
     if len(BP_r) > 0:
-        v_id = merge(BP_r, sample_order, v_id, use_product)
+        templates += merge(BP_r, use_product)
+
+    return templates
+
+def l_cluster(records, percent_slop=0, fixed_slop=0, use_product=False):
+    '''
+    Cluster sorted records on the left breakpoint and merge each cluster.
+    Yields the merged variant lines split around ID_SLOT
+    '''
+    BP_l = []
+    BP_sv_type = ''
+    BP_max_end_l = -1
+    BP_chr_l = -1
 
-    return v_id
+    for l in records:
+      b=l_bp.breakpoint(l, percent_slop=percent_slop, fixed_slop=fixed_slop)
+      if (len(BP_l) == 0) or ((b.start_l <= BP_max_end_l) and (b.chr_l_id == BP_chr_l) and (b.sv_type == BP_sv_type)):
+        BP_l.append(b)
+        BP_max_end_l = max(BP_max_end_l, b.end_l)
+        BP_chr_l = b.chr_l_id
+        BP_sv_type = b.sv_type
+      else:
+        for template in r_cluster(BP_l, use_product):
+          yield template
+        BP_l = [b]
+        BP_max_end_l = b.end_l
+        BP_sv_type = b.sv_type
+        BP_chr_l = b.chr_l_id
 
-def l_cluster_by_line(file_name, percent_slop=0, fixed_slop=0, use_product=False):
-    v_id = 0
+    if len(BP_l) > 0:
+      for template in r_cluster(BP_l, use_product):
+        yield template
+
+def l_cluster_batch(args):
+    '''
+    Pool entry point for l_cluster
+    '''
+    records, percent_slop, fixed_slop, use_product = args
+    return list(l_cluster(records, percent_slop, fixed_slop, use_product))
+
+def shard_records(records, batch_size):
+    '''
+    Group records into batches of at least batch_size records, splitting only
+    where the chromosome or SV type changes as no cluster can span those
+    '''
+    batch = []
+    key = None
+    for l in records:
+        A = l.split('\t', 8)
+        k = (A[0], l_bp.to_map(A[7])['SVTYPE'])
+        if k != key and len(batch) >= batch_size:
+            yield batch
+            batch = []
+        batch.append(l)
+        key = k
+    if len(batch) > 0:
+        yield batch
+
+def write_templates(templates, v_ids, output_handle):
+    for template in templates:
+        print_var_line(str(next(v_ids)).join(template), output_handle)
+
+def l_cluster_by_line(file_name, percent_slop=0, fixed_slop=0, use_product=False, threads=1, batch_size=1000, output_handle=None):
+    output_handle = output_handle or sys.stdout
+    v_ids = count(1)
     vcf_lines = []
     vcf_headers = list()
-    infile=open(file_name, 'r')
+    infile=svb.open_input(file_name)
+    lines = infile.lines() if isinstance(infile, svb.Reader) else iter(infile)
 
     header = ''
     samples = ''
 
-    for l in infile:
+    for l in lines:
       if l[0] == '#':
         if l[1] != '#':
           samples = l.rstrip().split('\t')[9:]
@@ -537,39 +572,18 @@ def l_cluster_by_line(file_name, percent_slop=0, fixed_slop=0, use_product=False
 
     vcf_headers.append("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n")
     
-    sample_order = []
     for header in vcf_headers:
-      if header[:8] == '##SAMPLE':
-        sample_order.append(header.rstrip()[13:-1])
-      print header,
+      print >> output_handle, header,
 
-    BP_l = []
-    BP_sv_type = ''
-    BP_max_end_l = -1
-    BP_chr_l = ''
-
-    b=l_bp.breakpoint(l_bp.parse_vcf_record(l), percent_slop=percent_slop, fixed_slop=fixed_slop)
-    BP_l.append(b)
-    BP_max_end_l = max(BP_max_end_l, b.end_l)
-    BP_chr_l = b.chr_l
-    BP_sv_type = b.sv_type
-
-    for l in infile:
-      b=l_bp.breakpoint(l_bp.parse_vcf_record(l), percent_slop=percent_slop, fixed_slop=fixed_slop)
-      if (len(BP_l) == 0) or ((b.start_l <= BP_max_end_l) and (b.chr_l == BP_chr_l) and (b.sv_type == BP_sv_type)):
-        BP_l.append(b)
-        BP_max_end_l = max(BP_max_end_l, b.end_l)
-        BP_chr_l = b.chr_l
-        BP_sv_type = b.sv_type
-      else:
-        v_id = r_cluster(BP_l, sample_order, v_id, use_product)
-        BP_l = [b]
-        BP_max_end_l = b.end_l
-        BP_sv_type = b.sv_type
-        BP_chr_l = b.chr_l
+    records = (l_bp.parse_vcf_record(x) for x in chain([l], lines))
 
-    if len(BP_l) > 0:
-        v_id = r_cluster(BP_l, sample_order, v_id, use_product)
+    if threads > 1:
+        def write(templates):
+            write_templates(templates, v_ids, output_handle)
+        batches = ((batch, percent_slop, fixed_slop, use_product) for batch in shard_records(records, batch_size))
+        map_in_order(l_cluster_batch, batches, threads, write)
+    else:
+        write_templates(l_cluster(records, percent_slop, fixed_slop, use_product), v_ids, output_handle)
 
     infile.close()                
 
@@ -580,10 +594,12 @@ def epilog():
     return 'Note that if both slop parameters are set then the maximum is used.'
 
 def add_arguments_to_parser(parser):
-    parser.add_argument('-i', '--inFile', metavar='<FILE>', help='a sorted LUMPY output file generated by lsort. Column 7 must have the format sample:variantID')
+    parser.add_argument('-i', '--inFile', metavar='<FILE>', help='a sorted LUMPY output file generated by lsort, plain, gzipped, BGZF or SVB. Column 7 must have the format sample:variantID')
     parser.add_argument('-p', '--percent-slop', metavar='<FLOAT>', type=float, default=0.0, help='increase the the breakpoint confidence interval both up and down stream by a given proportion of the original size')
     parser.add_argument('-f', '--fixed-slop', metavar='<INT>', type=int, default=0, help='increase the the breakpoint confidence interval both up and down stream by a given fixed size')
     parser.add_argument('--product', dest='use_product', action='store_true', default=False, help='calculate breakpoint PDF and position using product')
+    parser.add_argument('-t', '--threads', metavar='<INT>', type=int, default=1, help='number of processes used to merge chromosomes and SV types in parallel [1]')
+    su.add_output_format_argument(parser, 'vcf', svb=True)
     parser.set_defaults(entry_point=run_from_args)
 
 def command_parser():
@@ -592,10 +608,19 @@ def command_parser():
     return parser
 
 def run_from_args(args):
-    l_cluster_by_line(args.inFile,
-            percent_slop=args.percent_slop,
-            fixed_slop=args.fixed_slop,
-            use_product=args.use_product)
+    output_format = getattr(args, 'output_format', None)
+    with su.OutputStream(sys.stdout, output_format) as output_handle:
+        if output_format == 'svb':
+            # the merged records are formatted as text and encoded from it
+            output_handle = svb.LineWriter(output_handle)
+        l_cluster_by_line(args.inFile,
+                percent_slop=args.percent_slop,
+                fixed_slop=args.fixed_slop,
+                use_product=args.use_product,
+                threads=args.threads,
+                output_handle=output_handle)
+        if output_format == 'svb':
+            output_handle.close()
 
 if __name__ == "__main__":
     parser = command_parser()
@@ -1,56 +1,164 @@
 import svtools.l_bp as l_bp
+import svtools.utils as su
+from svtools.external_sort import Keyed, TempRun
+from svtools.contigs import ContigDictionary, DEFAULT_CONTIGS
 
 import sys
 import os
 import heapq
 import argparse
+from operator import itemgetter
 from tempfile import gettempdir
-from collections import namedtuple
 
-Keyed = namedtuple("Keyed", ["key", "obj"])
+def keyed(l, contigs=DEFAULT_CONTIGS):
+   return Keyed(tuple(l_bp.vcf_line_key(l, contigs)), l)
+
+def tagged(run, records):
+   for r in records:
+       yield (r.key, run, r)
+
 def merge(*iterables):
-   keyed_iterables = [(Keyed(l_bp.vcf_line_key(obj), obj) for obj in iterable)
-                        for iterable in iterables]
-   for element in heapq.merge(*keyed_iterables):
-       yield element.obj
+   '''
+   Merge sorted runs of Keyed records. Records with the same key come out in
+   the order of the runs holding them, so the result is a stable sort of the
+   runs laid end to end.
+   '''
+   tagged_iterables = [tagged(run, iterable) for run, iterable in enumerate(iterables)]
+   for element in heapq.merge(*tagged_iterables):
+       yield element[2]
+
+class VcfInput(object):
+    '''
+    One of the LUMPY VCFs being sorted, plain, gzipped or BGZF. Its records,
+    prepared by l_bp.prepare_vcf_record, are streamed from disk each time the
+    object is iterated. The header is picked up on the first pass.
+    '''
+    def __init__(self, file_name, contigs=DEFAULT_CONTIGS):
+        self.file_name = file_name
+        self.contigs = contigs
+        self.headers = []
+        self.samples = ''
+        self.header_read = False
+        # pipes and the like can only be read once
+        self.rereadable = os.path.isfile(file_name)
+
+    def read_header_line(self, l):
+        if l[1] != '#':
+            self.samples = l.rstrip().split('\t')[9:]
+        elif l[:10] != '##fileDate':
+            # ignore fileDate
+            self.headers.append(l)
+
+    def __iter__(self):
+        with su.open_input(self.file_name) as f:
+            for l in f:
+                if l[0] == '#':
+                    if not self.header_read:
+                        self.read_header_line(l)
+                    continue
+                self.header_read = True
+                l = l_bp.prepare_vcf_record(l, self.samples)
+                if l is not None:
+                    yield keyed(l, self.contigs)
+        self.header_read = True
+
+    def is_sorted(self):
+        last_key = None
+        for r in self:
+            if (last_key is not None) and (r.key < last_key):
+                return False
+            last_key = r.key
+        return True
 
 class Lsort(object):
-    def __init__(self, vcf_file_names, tempdir=None, batchsize=200):
+    # rough cost of holding a record in memory beyond the line itself: the
+    # string object, the Keyed record holding it and its sort key
+    record_overhead = 512
+
+    def __init__(self, vcf_file_names, tempdir=None, batchsize=200, max_memory=1024**3, max_open=256, contigs=DEFAULT_CONTIGS):
         if tempdir:
             self.tempdir = tempdir
         else:
             self.tempdir = gettempdir()
         self.batchsize = batchsize
+        self.max_memory = max_memory
+        self.max_open = max_open
         self.vcf_file_names = vcf_file_names
+        self.contigs = contigs
         self.vcf_lines = []
+        self.vcf_lines_bytes = 0
         self.vcf_headers = []
         self.temp_files = []
+        self.temp_file_count = 0
+        # sorted runs, in input order, waiting to be merged. Either temp
+        # files or inputs that were already sorted
+        self.runs = []
 
-    def execute(self):
-        
-        counter = 0
-        for vcf_file_name in self.vcf_file_names:
-            samples = l_bp.parse_vcf(vcf_file_name, self.vcf_lines, self.vcf_headers)
-            for sample in samples:
-                self.vcf_headers.append("##SAMPLE=<ID=" + sample + ">\n")
-            counter += 1
-            if counter > self.batchsize:
-                self.vcf_lines.sort(key=l_bp.vcf_line_key)
-                self.write_temp_file()
-                counter = 0
-        # no need to write the final batch to file
-        self.write_header()
-
-        self.vcf_lines.sort(key=l_bp.vcf_line_key)
-        iterables = self.temp_files + [self.vcf_lines]
-        sys.stdout.writelines(merge(*iterables))
+    def execute(self, output_handle=None):
+        # resolved here so stdout can be swapped after import
+        output_handle = output_handle or sys.stdout
+        try:
+            vcf_inputs = [VcfInput(vcf_file_name, self.contigs) for vcf_file_name in self.vcf_file_names]
+            counter = 0
+            for vcf_input in vcf_inputs:
+                if vcf_input.rereadable and vcf_input.is_sorted():
+                    # no need to hold sorted inputs in memory, they are
+                    # streamed from disk during the merge
+                    self.flush_lines()
+                    self.add_run(vcf_input)
+                    continue
+                for r in vcf_input:
+                    self.vcf_lines.append(r)
+                    self.vcf_lines_bytes += len(r.obj) + self.record_overhead
+                    if self.vcf_lines_bytes > self.max_memory:
+                        self.flush_lines()
+                counter += 1
+                if counter > self.batchsize:
+                    self.flush_lines()
+                    counter = 0
+
+            for vcf_input in vcf_inputs:
+                for l in vcf_input.headers:
+                    if l not in self.vcf_headers:
+                        self.vcf_headers.append(l)
+                for sample in vcf_input.samples:
+                    self.vcf_headers.append("##SAMPLE=<ID=" + sample + ">\n")
+            self.write_header(output_handle)
+
+            # no need to write the final batch to file
+            self.vcf_lines.sort(key=itemgetter(0))
+            output_handle.writelines(r.obj for r in merge(*(self.runs + [self.vcf_lines])))
+        finally:
+            self.close_tempfiles()
+
+    def flush_lines(self):
+        if len(self.vcf_lines) > 0:
+            self.vcf_lines.sort(key=itemgetter(0))
+            self.add_run(self.write_temp_file(self.vcf_lines))
+            #vcf_line array
+            self.vcf_lines = []
+            self.vcf_lines_bytes = 0
+
+    def add_run(self, run):
+        self.runs.append(run)
+        if len(self.runs) >= self.max_open:
+            # merge what we have so far into a single run to bound the
+            # number of files open at the end
+            merged = self.write_temp_file(merge(*self.runs))
+            for run in self.runs:
+                if run in self.temp_files:
+                    self.remove_tempfile(run)
+            self.runs = [merged]
 
     def close_tempfiles(self):
-        for tmp in self.temp_files:
-            tmp.close()
-            os.remove(tmp.name)
+        for tmp in list(self.temp_files):
+            self.remove_tempfile(tmp)
 
-    def write_header(self):
+    def remove_tempfile(self, tmp):
+        tmp.remove()
+        self.temp_files.remove(tmp)
+
+    def write_header(self, output_handle):
         self.vcf_headers.append("##INFO=<ID=SNAME,Number=.,Type=String," + \
             "Description=\"Source sample name\">\n")
         self.vcf_headers.append("##INFO=<ID=ALG,Number=1,Type=String," + \
@@ -58,29 +166,28 @@ class Lsort(object):
         self.vcf_headers.append("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\t" + \
             "VARIOUS\n")
         self.vcf_headers.sort(cmp=l_bp.header_line_cmp)
-        sys.stdout.writelines(self.vcf_headers)
-
-    def write_temp_file(self):
-        temp_outfile = open(os.path.join(self.tempdir,'%06i'%len(self.temp_files)),'w+b',64*1024)
-        temp_outfile.writelines(self.vcf_lines)
-        temp_outfile.flush()
-        temp_outfile.seek(0)
-        self.temp_files.append(temp_outfile)
+        output_handle.writelines(self.vcf_headers)
 
-        #vcf_line array
-        self.vcf_lines = []
+    def write_temp_file(self, records):
+        temp_run = TempRun(os.path.join(self.tempdir,'%06i'%self.temp_file_count), records)
+        self.temp_file_count += 1
+        self.temp_files.append(temp_run)
+        return temp_run
 
 def description():
     return 'sort N LUMPY VCF files into a single file'
 
 def epilog():
-    return '''Specify -t to override where temporary files are placed. Use -b to control the amount of memory required. 
-    This will vary depending on the number of lines in your input files.'''
+    return '''Specify -t to override where temporary files are placed. Use -m to control the amount of memory used to
+    sort records from unsorted input files. Inputs that are already sorted are streamed from disk.'''
 
 def add_arguments_to_parser(parser):
-    parser.add_argument('vcf_files', metavar='<VCF>', nargs='+', help='VCF files to combine and sort')
+    parser.add_argument('vcf_files', metavar='<VCF>', nargs='+', help='VCF files to combine and sort, plain, gzipped or BGZF')
     parser.add_argument('-t', '--tempdir', metavar='<DIRECTORY_PATH>', default=gettempdir(), help='temporary directory')
     parser.add_argument('-b', '--batchsize', metavar='<INT>', type=int, default=200, help='number of files to sort in batch')
+    parser.add_argument('-c', '--contigs', metavar='<FILE>', help='FASTA index or VCF with ##contig lines giving the chromosome order (default: natural order)')
+    parser.add_argument('-m', '--max-memory', metavar='<BYTES>', type=int, default=1024**3, help='approximate memory in bytes used to sort records before spilling them to a temporary file [1073741824]')
+    su.add_output_format_argument(parser, 'vcf')
     parser.set_defaults(entry_point=run_from_args)
 
 def command_parser():
@@ -89,8 +196,12 @@ def command_parser():
     return parser
 
 def run_from_args(args):
-    sorter = Lsort(args.vcf_files, tempdir=args.tempdir, batchsize=args.batchsize)
-    sorter.execute()
+    contigs = DEFAULT_CONTIGS
+    if args.contigs:
+        contigs = ContigDictionary.from_file(args.contigs)
+    sorter = Lsort(args.vcf_files, tempdir=args.tempdir, batchsize=args.batchsize, max_memory=args.max_memory, contigs=contigs)
+    with su.OutputStream(sys.stdout, getattr(args, 'output_format', None)) as output_handle:
+        sorter.execute(output_handle)
 
 if __name__ == "__main__":
     parser = command_parser()
@@ -1,6 +1,8 @@
 import argparse, sys
 from svtools.bedpe import Bedpe
 from svtools.cluster import Cluster
+from svtools.record_view import open_records, views
+from svtools.tabix import open_region
 import svtools.utils as su
 
 class Pruner(object):
@@ -25,13 +27,13 @@ class Pruner(object):
         eval_param = self.eval_param
 
         in_header = True
-        for line in in_file:
-            if line.startswith('#') and in_header:
-                bedpe_out.write(line)
+        for record in views(in_file):
+            if record.startswith('#') and in_header:
+                bedpe_out.write(record.line())
                 continue
             in_header = False
             self.bedpe_lines += 1
-            bedpe = Bedpe(line.rstrip().split('\t'))
+            bedpe = Bedpe(record)
             if bedpe.af is None:
                 sys.stderr.write('No allele frequency for variant found. This tool requires allele frequency information to function. Please add with svtools afreq and rerun\n')
                 sys.exit(1)
@@ -85,7 +87,7 @@ class Pruner(object):
         for cluster in self.cluster_list:
             # cluster is beyond updatable window:
             if (bedpe is None or 
-                    cluster.chrom_a != bedpe.c1 or 
+                    cluster.chrom_a_id != bedpe.c1_id or 
                     cluster.min_a - max_distance > bedpe.e1 or 
                     cluster.max_a + max_distance < bedpe.s1):
                 
@@ -114,6 +116,8 @@ def add_arguments_to_parser(parser):
     parser.add_argument('-s', '--is-sorted', action='store_true', help='specify if an input file is sorted. Sort with svtools bedpesort. (default=False)')
     parser.add_argument('input', nargs='?', metavar='<BEDPE>', default=None, help='BEDPE file to read. If \'-\' or absent then defaults to stdin.')
     parser.add_argument('-o', '--output', metavar='<BEDPE>', type=argparse.FileType('w'), default=sys.stdout, help='output bedpe to write (default: stdout)')
+    parser.add_argument('--region', metavar='<CHR:START-END>', default=None, help='only read the records overlapping a region of a bgzipped, indexed BEDPE (see svtools index)')
+    su.add_output_format_argument(parser, 'bedpe')
     parser.set_defaults(entry_point=run_from_args)
 
 def command_parser():
@@ -122,9 +126,9 @@ def command_parser():
     return parser
 
 def run_from_args(args):
-    with su.InputStream(args.input) as stream:
+    with open_region(args.input, getattr(args, 'region', None), open_records) as stream, su.OutputStream(args.output, getattr(args, 'output_format', None)) as output_handle:
         pruner = Pruner(args.max_distance, args.eval_param)
-        pruner.cluster_bedpe(stream, args.output, args.is_sorted)
+        pruner.cluster_bedpe(stream, output_handle, args.is_sorted)
 
 if __name__ == '__main__':
     parser = command_parser()
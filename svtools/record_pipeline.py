@@ -0,0 +1,104 @@
+'''
+Runs a per-record transform over the lines of a file on several processes.
+Lines are grouped into blocks, blocks are transformed by a process pool and
+the output is written back in input order.
+'''
+import sys
+import threading
+from multiprocessing import Pool
+
+# the transform of a worker process, set when the worker starts
+_transform = None
+
+def _set_transform(transform):
+    global _transform
+    _transform = transform
+
+def transform_block(block):
+    '''
+    Pool entry point that transforms a block of lines. A sys.exit from the
+    transform is handed back to the parent instead of taking the worker down
+    with it, which would leave the pool waiting on the block forever.
+    '''
+    try:
+        return 0, ''.join([_transform(l) for l in block])
+    except SystemExit as e:
+        return e.code, None
+
+def blocks(lines, block_bytes):
+    '''
+    Group lines into blocks of at least block_bytes characters
+    '''
+    block = []
+    size = 0
+    for l in lines:
+        block.append(l)
+        size += len(l)
+        if size >= block_bytes:
+            yield block
+            block = []
+            size = 0
+    if len(block) > 0:
+        yield block
+
+def map_in_order(function, items, threads, consume, initializer=None, initargs=()):
+    '''
+    Apply function to every item on a pool of threads processes and call
+    consume with the results in input order. The pool's task thread reads
+    ahead of consume by a bounded number of items. An error from a worker
+    or from consume stops the pool before it is raised.
+    '''
+    # keep a bounded number of items in flight so the whole input isn't
+    # read ahead of consume
+    in_flight = threading.Semaphore(threads * 4)
+    stopped = threading.Event()
+    def bounded_items():
+        for item in items:
+            in_flight.acquire()
+            if stopped.is_set():
+                return
+            yield item
+
+    pool = Pool(threads, initializer, initargs)
+    try:
+        for result in pool.imap(function, bounded_items()):
+            in_flight.release()
+            consume(result)
+        pool.close()
+    except:
+        # let the task thread out of bounded_items so the pool can stop
+        stopped.set()
+        in_flight.release()
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+class RecordPipeline(object):
+    '''
+    Applies transform, a function taking an input line and returning the
+    text to write for it, to every line. With more than one thread the
+    pool's task thread reads ahead and hands blocks to the workers, while
+    the calling thread writes the transformed blocks in order. The
+    transform is inherited by the workers when they are forked, so it
+    doesn't need to be picklable, but it must not rely on state carried
+    from one line to the next.
+    '''
+    def __init__(self, transform, threads=1, block_bytes=1024*1024):
+        self.transform = transform
+        self.threads = threads
+        self.block_bytes = block_bytes
+
+    def run(self, lines, output_handle):
+        if self.threads <= 1:
+            for l in lines:
+                output_handle.write(self.transform(l))
+            return
+
+        def write(result):
+            code, text = result
+            if text is None:
+                sys.exit(code)
+            output_handle.write(text)
+        map_in_order(transform_block, blocks(lines, self.block_bytes), self.threads, write,
+                initializer=_set_transform, initargs=(self.transform,))
@@ -0,0 +1,149 @@
+'''
+Tab separated records read as views over a buffer instead of split lists.
+Uncompressed files are memory-mapped and lines are only copied out of the
+map and split when their fields are indexed.
+'''
+import mmap
+import os
+import svtools.utils as su
+
+class RecordView(object):
+    '''
+    A line of a tab separated buffer held as offsets. Indexing a view gives
+    its fields like indexing line.rstrip().split('\\t') would, but the line
+    is only split as far as the highest field asked for. The rest of it is
+    kept as one string, so the sample columns of a wide VCF or BEDPE line
+    are never split if they are only written back out.
+    '''
+    __slots__ = ['buf', 'start', 'next', 'head', 'num_split']
+
+    # fields split off the first time a view is indexed, enough to cover
+    # the fixed columns of a VCF or BEDPE line
+    min_split = 24
+
+    def __init__(self, buf, start, next):
+        '''
+        The line starts at start and the next one at next
+        '''
+        self.buf = buf
+        self.start = start
+        self.next = next
+        self.head = None
+        self.num_split = 0
+
+    @classmethod
+    def from_line(cls, line):
+        return cls(line, 0, len(line))
+
+    def _split(self, n):
+        '''
+        Split at least the first n fields off the line. Unless the whole line
+        has been split, the last item is the rest of it.
+        '''
+        head = self.head
+        if head is None or (n > self.num_split and len(head) > self.num_split):
+            self.num_split = max(n, 2 * self.num_split, self.min_split)
+            head = self.head = str(self).split('\t', self.num_split)
+        return head
+
+    def __getitem__(self, i):
+        if isinstance(i, slice) or i < 0:
+            return str(self).split('\t')[i]
+        return self._split(i + 1)[i]
+
+    def __len__(self):
+        return str(self).count('\t') + 1
+
+    def tail(self, i):
+        '''
+        Fields i onwards as they are in the line, tabs included, or None if
+        the record has no field i
+        '''
+        rest = self._split(i)[i:]
+        if len(rest) == 0:
+            return None
+        return '\t'.join(rest)
+
+    def startswith(self, prefix):
+        return self.buf[self.start:min(self.start + len(prefix), self.next)] == prefix
+
+    def line(self):
+        '''
+        The line as it was read, newline included
+        '''
+        return self.buf[self.start:self.next]
+
+    def __str__(self):
+        return self.buf[self.start:self.next].rstrip()
+
+def split_columns(fields, n):
+    '''
+    Take the fields of a split line or a RecordView and return a list
+    holding at least the first n of them, along with the fields from n on
+    as they'd be written out, joined by tabs, or None if there are none. A
+    view hands the latter over without splitting them, which is all that's
+    needed for columns that are only written back out, like the samples.
+    '''
+    if isinstance(fields, RecordView):
+        return fields._split(n), fields.tail(n)
+    if len(fields) <= n:
+        return fields, None
+    return fields, '\t'.join(fields[n:])
+
+def views(lines):
+    '''
+    Iterate lines as RecordViews, whether they are strings or views already
+    '''
+    for l in lines:
+        if isinstance(l, RecordView):
+            yield l
+        else:
+            yield RecordView.from_line(l)
+
+class MappedFile(object):
+    '''
+    The lines of an uncompressed file as RecordViews over a read only memory
+    map. Views can't be read once the file is closed.
+    '''
+    def __init__(self, file_name):
+        self.name = file_name
+        self.handle = open(file_name, 'rb')
+        if os.fstat(self.handle.fileno()).st_size > 0:
+            self.buf = mmap.mmap(self.handle.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            # an empty file can't be mapped
+            self.buf = ''
+
+    def __iter__(self):
+        buf = self.buf
+        size = len(buf)
+        pos = 0
+        while pos < size:
+            newline = buf.find('\n', pos)
+            if newline < 0:
+                newline = size - 1
+            yield RecordView(buf, pos, newline + 1)
+            pos = newline + 1
+
+    def close(self):
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+        self.handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def open_records(file_name):
+    '''
+    Open a file for iterating with views. Uncompressed regular files are
+    memory-mapped and anything else is read as lines by svtools.utils.
+    '''
+    if file_name not in (None, '-', 'stdin') and os.path.isfile(file_name):
+        with open(file_name, 'rb') as f:
+            magic = f.read(2)
+        if magic != '\x1f\x8b' and not file_name.endswith('.gz'):
+            return MappedFile(file_name)
+    return su.InputStream(file_name)
@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 
-import argparse, sys, copy, gzip, time, math, re
+import argparse, os, sys, copy, gzip, time, math, re
 import numpy as np
 import pandas as pd
 from scipy import stats
@@ -12,6 +12,7 @@ from svtools.vcf.file import Vcf
 from svtools.vcf.genotype import Genotype
 from svtools.vcf.variant import Variant
 import svtools.utils as su
+import svtools.tabix as tabix
 
 
 CN_rec = namedtuple ('CN_rec', 'var_id sample svtype svlen AF GT CN AB log_len log2r')
@@ -96,7 +97,8 @@ def collapse_bed_records(bed_list):
     bed_list_sorted = sorted(bed_list, key=itemgetter(1))
     collapsed_bed_list = []
     i = 0
-    curr_rec = bed_list_sorted[i]
+    # copied so merging doesn't change the records of the annotations
+    curr_rec = copy.copy(bed_list_sorted[i])
     while i < len(bed_list_sorted):
         # end at last element in list
         if i == len(bed_list_sorted) - 1:
@@ -113,11 +115,34 @@ def collapse_bed_records(bed_list):
         else:
             collapsed_bed_list.append(copy.copy(curr_rec))
             i += 1
-            curr_rec = bed_list_sorted[i]
+            curr_rec = copy.copy(bed_list_sorted[i])
 
     # print 'collapsed:', collapsed_bed_list
     return collapsed_bed_list
 
+class AnnotationIndex(object):
+    '''
+    Annotated elements read from a bgzipped BED by its tabix index instead
+    of loaded into a dict, with the chromosomes of the BED as keys
+    '''
+    def __init__(self, ae_path):
+        self.reader = tabix.Reader(ae_path)
+
+    def __contains__(self, chrom):
+        return chrom in self.reader.contigs
+
+    def features(self, chrom, start, end):
+        '''
+        The features overlapping [start, end), in file order
+        '''
+        features = []
+        for line in self.reader.fetch(chrom, max(start, 0), end):
+            v = line.rstrip().split('\t')
+            if len(v) < 4:
+                continue
+            features.append([int(v[1]), int(v[2])] + v[3:])
+        return features
+
 def annotation_intersect(var, ae_dict, threshold):
     best_frac_overlap = 0
     best_feature = ''
@@ -130,12 +155,16 @@ def annotation_intersect(var, ae_dict, threshold):
     if var.chrom in ae_dict:
         var_start = var.pos
         var_end = int(var.info['END'])
+        if isinstance(ae_dict, AnnotationIndex):
+            features = ae_dict.features(var.chrom, var_start - slop, var_end + slop)
+        else:
+            features = ae_dict[var.chrom]
         i = 0
         while 1:
             # bail if end of dict
-            if i >= len(ae_dict[var.chrom]):
+            if i >= len(features):
                 break
-            feature = ae_dict[var.chrom][i]
+            feature = features[i]
             if feature[0] - slop < var_end:
                 if feature[1] + slop > var_start:
                     try:
@@ -194,24 +223,17 @@ def calc_params(vcf_path):
                 continue
         else:
             v = line.rstrip().split('\t')
-            info = v[7].split(';')
-            svtype = None
-            for x in info:
-                if x.startswith('SVTYPE='):
-                    svtype = x.split('=')[1]
-                    break
-
-            if svtype not in ['DEL', 'DUP'] or v[0]=="X" or v[0]=="Y":
-                continue
-
             var = Variant(v, vcf)
+            if var.info.get('SVTYPE') not in ['DEL', 'DUP'] or v[0]=="X" or v[0]=="Y":
+                continue
     
-            for sample in vcf_samples:
-                sample_genotype = var.genotype(sample)
-                if sample_genotype.get_format('GT') != './.':
-                    log2r = math.log((float(sample_genotype.get_format('CN'))+ epsilon)/2,2)  #to avoid log(0)
+            genotypes = var.genotype_matrix()
+            for sample, gt, cn, ab in zip(vcf_samples, genotypes.strings('GT').tolist(),
+                    genotypes.strings('CN').tolist(), genotypes.strings('AB').tolist()):
+                if gt != './.':
+                    log2r = math.log((float(cn)+ epsilon)/2,2)  #to avoid log(0)
                     tSet.append(CN_rec(var.var_id, sample, var.info['SVTYPE'], abs(float(var.info['SVLEN'])), var.info['AF'],
-                        sample_genotype.get_format('GT'),  sample_genotype.get_format('CN'), sample_genotype.get_format('AB'), math.log(abs(float(var.info['SVLEN']))), log2r))
+                        gt,  cn, ab, math.log(abs(float(var.info['SVLEN']))), log2r))
 
     df=pd.DataFrame(tSet, columns=CN_rec._fields)
     #exclude from training data, DELs and DUPs with CN in the tails of the distribution
@@ -320,15 +342,16 @@ def load_df(var, exclude, sex):
     epsilon=0.1
     test_set = list()
 
-    for s in var.sample_list:
+    genotypes = var.genotype_matrix()
+    for s, gt, cn, ab in zip(var.sample_list, genotypes.strings('GT').tolist(),
+            genotypes.strings('CN').tolist(), genotypes.strings('AB').tolist()):
         if s in exclude:
             continue
-        cn = var.genotype(s).get_format('CN')
         if (var.chrom == 'X' or var.chrom == 'Y') and sex[s] == 1:
             cn=str(float(cn)*2)
         log2r = math.log((float(cn)+epsilon)/2, 2)  # to avoid log(0)
         test_set.append(CN_rec(var.var_id, s, var.info['SVTYPE'], abs(float(var.info['SVLEN'])), var.info['AF'],
-             var.genotype(s).get_format('GT'),  cn , var.genotype(s).get_format('AB'), math.log(abs(float(var.info['SVLEN']))), log2r))
+             gt,  cn , ab, math.log(abs(float(var.info['SVLEN']))), log2r))
 
     test_set = pd.DataFrame(data = test_set, columns=CN_rec._fields)
     return test_set
@@ -437,18 +460,12 @@ def sv_classify(vcf_in, vcf_out, gender_file, exclude_file, ae_dict, f_overlap,
                 vcf_out.write(vcf.get_header() + '\n')
 
         v = line.rstrip().split('\t')
-        info = v[7].split(';')
-        svtype = None
-        for x in info:
-            if x.startswith('SVTYPE='):
-                svtype = x.split('=')[1]
-                break
+        var = Variant(v, vcf)
+        svtype = var.info.get('SVTYPE')
         # bail if not DEL or DUP prior to reclassification
         if svtype not in ['DEL', 'DUP']:
             vcf_out.write(line)
             continue
-        
-        var = Variant(v, vcf)
 
         # check intersection with mobile elements
         if ae_dict is not None and var.info['SVTYPE'] in ['DEL']:
@@ -462,12 +479,9 @@ def sv_classify(vcf_in, vcf_out, gender_file, exclude_file, ae_dict, f_overlap,
                 continue
 
         #count positively genotyped samples
-        num_pos_samps = 0
         num_total_samps=len(var.sample_list)
-
-        for s in var.sample_list:
-            if var.genotype(s).get_format('GT') not in ["./.", "0/0"]:
-                num_pos_samps += 1
+        gts = var.genotype_matrix().strings('GT')
+        num_pos_samps = int(np.count_nonzero((gts != './.') & (gts != '0/0')))
 
         nb_support = False
         ls_support = False
@@ -511,6 +525,8 @@ def sv_classify(vcf_in, vcf_out, gender_file, exclude_file, ae_dict, f_overlap,
 
 
 def get_ae_dict(ae_path):
+    if os.path.exists(tabix.index_name(ae_path)):
+        return AnnotationIndex(ae_path)
     if ae_path.endswith('.gz'):
         ae_bedfile = gzip.open(ae_path, 'rb')
     else:
@@ -566,7 +582,7 @@ def add_arguments_to_parser(parser):
     parser.add_argument('-i', '--input', metavar='<VCF>', dest='vcf_in', type=argparse.FileType('r'), default=None, help='VCF input [stdin]')
     parser.add_argument('-o', '--output', metavar='<VCF>', dest='vcf_out', type=argparse.FileType('w'), default=sys.stdout, help='VCF output [stdout]')
     parser.add_argument('-g', '--gender', metavar='<FILE>', dest='gender', type=argparse.FileType('r'), required=True, default=None, help='tab delimited file of sample genders (male=1, female=2)\nex: SAMPLE_A\t2')
-    parser.add_argument('-a', '--annotation', metavar='<BED>', dest='ae_path', type=str, default=None, help='BED file of annotated elements')
+    parser.add_argument('-a', '--annotation', metavar='<BED>', dest='ae_path', type=str, default=None, help='BED file of annotated elements, read by its index if it is bgzipped and indexed with svtools index')
     parser.add_argument('-f', '--fraction', metavar='<FLOAT>', dest='f_overlap', type=float, default=0.9, help='fraction of reciprocal overlap to apply annotation to variant [0.9]')
     parser.add_argument('-e', '--exclude', metavar='<FILE>', dest='exclude', type=argparse.FileType('r'), required=False, default=None, help='list of samples to exclude from classification algorithms')
     parser.add_argument('-s', '--slope_threshold', metavar='<FLOAT>', dest='slope_threshold', type=float, default=1.0, help='minimum slope absolute value of regression line to classify as DEL or DUP[1.0]')
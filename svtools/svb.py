@@ -0,0 +1,769 @@
+'''
+SVB, a binary record format for passing VCF and BEDPE records between
+svtools subcommands without formatting and parsing them as text.
+
+A file is the magic bytes, a byte giving the kind of records, V for VCF or
+P for BEDPE, and the text header. Each record follows as its length and
+its payload. Numbers are little endian.
+
+VCF records hold POS as an integer and INFO values typed by the header, with
+Integer and Float lists packed as int32 and float64 arrays. The sample
+columns are held one FORMAT field at a time, GT as allele codes and numeric
+fields as packed arrays. Sites-only records have neither FORMAT nor sample
+columns. Values are only packed if they format back to the
+same text, so converting to SVB and back gives the records as they were.
+Fields of a record are only unpacked when they are used, and those that
+aren't changed are written back out as they were read.
+
+BEDPE records hold their coordinates as integers and the rest as text.
+'''
+import argparse
+import os
+import struct
+import sys
+from itertools import chain
+import numpy as np
+import svtools.utils as su
+from svtools.tabix import open_region
+from svtools.bedpe import Bedpe
+from svtools.vcf.file import Vcf
+from svtools.vcf.genotype_matrix import GenotypeMatrix
+from svtools.vcf.variant import Info, Variant
+
+MAGIC = 'SVB\x01'
+KIND_VCF = 'V'
+KIND_BEDPE = 'P'
+
+# kinds of INFO values and sample columns
+STRING = 0
+FLAG = 1
+INTEGER = 2
+FLOAT = 3
+GT = 4
+# layouts of the sample columns, RAW for those that don't all have every
+# FORMAT field, which are kept as text
+RAW = 5
+COLUMNS = 6
+
+MISSING_INTEGER = -2**31
+
+# ways of formatting floats, of which the first that gives back the text
+# of every value of a field is stored along with them
+FLOAT_FORMATS = (str, '%.2f'.__mod__, '%.1f'.__mod__, '%.3f'.__mod__, '%.4f'.__mod__, '%g'.__mod__, repr)
+
+def pack_string(s):
+    return struct.pack('<I', len(s)) + s
+
+def unpack_string(data, pos):
+    n = struct.unpack_from('<I', data, pos)[0]
+    pos += 4
+    return data[pos:pos + n], pos + n
+
+def pack_integers(text):
+    '''
+    Pack a comma separated list of integers, or return None if it doesn't
+    format back to the same text
+    '''
+    try:
+        values = [int(v) for v in text.split(',')]
+    except ValueError:
+        return None
+    if ','.join(map(str, values)) != text or any(v <= MISSING_INTEGER or v >= 2**31 for v in values):
+        return None
+    return struct.pack('<I', len(values)) + np.array(values, dtype='<i4').tostring()
+
+def float_format(values, text):
+    '''
+    The index of the first of FLOAT_FORMATS giving back text from values,
+    with NaN as '.', or None
+    '''
+    for i, f in enumerate(FLOAT_FORMATS):
+        if [('.' if v != v else f(v)) for v in values] == text:
+            return i
+    return None
+
+def pack_floats(text):
+    '''
+    Pack a comma separated list of floats, or return None if it doesn't
+    format back to the same text
+    '''
+    split = text.split(',')
+    try:
+        values = [float(v) for v in split]
+    except ValueError:
+        return None
+    i = float_format(values, split)
+    if i is None:
+        return None
+    return chr(i) + struct.pack('<I', len(values)) + np.array(values, dtype='<f8').tostring()
+
+def encode_info(raw, info_ids):
+    '''
+    Encode an INFO column, typing values by their header lines
+    '''
+    entries = raw.split(';')
+    out = [struct.pack('<I', len(entries))]
+    for entry in entries:
+        key, sep, value = entry.partition('=')
+        out.append(pack_string(key))
+        if sep == '':
+            out.append(chr(FLAG))
+            continue
+        info = info_ids.get(key)
+        packed = None
+        if info is not None and info.type == 'Integer':
+            packed = pack_integers(value)
+            kind = INTEGER
+        elif (info is not None and info.type == 'Float') or value[:1] in '-.0123456789':
+            # lists of probabilities like PRPOS are declared as strings
+            packed = pack_floats(value)
+            kind = FLOAT
+        if packed is None:
+            out.append(chr(STRING) + pack_string(value))
+        else:
+            out.append(chr(kind) + packed)
+    return ''.join(out)
+
+def unpack_value(kind, data, pos):
+    '''
+    Unpack an INFO value to its text, returning it and the position after it
+    '''
+    if kind == FLAG:
+        return None, pos
+    elif kind == STRING:
+        return unpack_string(data, pos)
+    elif kind == INTEGER:
+        n = struct.unpack_from('<I', data, pos)[0]
+        values = np.frombuffer(data, dtype='<i4', count=n, offset=pos + 4).tolist()
+        return ','.join(map(str, values)), pos + 4 + 4 * n
+    elif kind == FLOAT:
+        f = FLOAT_FORMATS[ord(data[pos])]
+        n = struct.unpack_from('<I', data, pos + 1)[0]
+        values = np.frombuffer(data, dtype='<f8', count=n, offset=pos + 5).tolist()
+        return ','.join('.' if v != v else f(v) for v in values), pos + 5 + 8 * n
+    raise IOError('Invalid SVB value kind ' + str(kind))
+
+def skip_value(kind, data, pos):
+    if kind == FLAG:
+        return pos
+    elif kind == STRING:
+        return pos + 4 + struct.unpack_from('<I', data, pos)[0]
+    elif kind == INTEGER:
+        return pos + 4 + 4 * struct.unpack_from('<I', data, pos)[0]
+    elif kind == FLOAT:
+        return pos + 5 + 8 * struct.unpack_from('<I', data, pos + 1)[0]
+    raise IOError('Invalid SVB value kind ' + str(kind))
+
+class PackedInfo(Info):
+    '''
+    An INFO column decoded from SVB. Values are unpacked to text one key at
+    a time as they are looked up, and the encoded column is kept so an
+    unchanged column can be written back without encoding it again.
+    '''
+    __slots__ = ['encoded', 'entries', 'text']
+
+    def __init__(self, encoded):
+        self.encoded = encoded
+        self.entries = None
+        self.text = None
+        self.values = None
+        self.cache = dict()
+        self.modified = False
+
+    def _entries(self):
+        '''
+        The keys of the column in order with the kind and position of their
+        values
+        '''
+        if self.entries is None:
+            data = self.encoded
+            n = struct.unpack_from('<I', data, 0)[0]
+            pos = 4
+            entries = []
+            for _ in xrange(n):
+                key, pos = unpack_string(data, pos)
+                kind = ord(data[pos])
+                entries.append((key, kind, pos + 1))
+                pos = skip_value(kind, data, pos + 1)
+            self.entries = entries
+        return self.entries
+
+    @property
+    def raw(self):
+        if self.text is None:
+            items = []
+            for key, kind, pos in self._entries():
+                value = unpack_value(kind, self.encoded, pos)[0]
+                items.append(key if kind == FLAG else key + '=' + value)
+            self.text = ';'.join(items)
+        return self.text
+
+    def _find(self, key):
+        for k, kind, pos in reversed(self._entries()):
+            if k == key:
+                if kind == FLAG:
+                    return True
+                # like the text, a value is read up to any '=' in it
+                return unpack_value(kind, self.encoded, pos)[0].split('=', 1)[0]
+        raise KeyError(key)
+
+def encode_genotypes(gts_string, num_fields, format_ids):
+    '''
+    Encode the sample columns one FORMAT field at a time. format_ids gives
+    the header line of each field, in the order of the FORMAT column.
+    '''
+    rows = [c.split(':') for c in gts_string.split('\t')] if gts_string != '' else []
+    if len(rows) == 0 or any(len(r) != num_fields for r in rows):
+        return chr(RAW) + pack_string(gts_string)
+    out = [chr(COLUMNS), struct.pack('<II', len(rows), num_fields)]
+    for i, column in enumerate(zip(*rows)):
+        out.append(encode_column(column, format_ids[i]))
+    return ''.join(out)
+
+def encode_column(column, format_id):
+    '''
+    Encode the values of one FORMAT field across samples
+    '''
+    if format_id is not None and format_id.id == 'GT':
+        strings = np.array(column, dtype=str)
+        if strings.dtype.itemsize == 3 and (np.char.str_len(strings) == 3).all():
+            chars = strings.view(np.uint8).reshape(len(column), 3)
+            alleles = chars[:, [0, 2]].astype(np.int8) - ord('0')
+            separators = chars[:, 1]
+            digits = (alleles >= 0) & (alleles <= 9)
+            dots = alleles == ord('.') - ord('0')
+            if ((digits | dots).all() and
+                    ((separators == ord('/')) | (separators == ord('|'))).all()):
+                alleles[dots] = GenotypeMatrix.MISSING
+                return chr(GT) + separators.tostring() + alleles.tostring()
+    elif format_id is not None and format_id.type == 'Integer':
+        try:
+            values = [MISSING_INTEGER if v == '.' else int(v) for v in column]
+            if (all(MISSING_INTEGER < v < 2**31 for v in values if v != MISSING_INTEGER)
+                    and ['.' if v == MISSING_INTEGER else str(v) for v in values] == list(column)):
+                return chr(INTEGER) + np.array(values, dtype='<i4').tostring()
+        except ValueError:
+            pass
+    elif format_id is not None and format_id.type == 'Float':
+        try:
+            values = [float('nan') if v == '.' else float(v) for v in column]
+            i = float_format(values, list(column))
+            if i is not None:
+                return chr(FLOAT) + chr(i) + np.array(values, dtype='<f8').tostring()
+        except ValueError:
+            pass
+    return chr(STRING) + pack_string('\t'.join(column))
+
+class PackedGenotypeMatrix(GenotypeMatrix):
+    '''
+    The sample columns of a record decoded from SVB. GT and numeric fields
+    are read straight from their packed arrays and text is only made for
+    fields asked for as strings, or when the record is written as text.
+    '''
+    def __init__(self, encoded, format_dict, format_types=None):
+        self.encoded = encoded
+        self.format_dict = format_dict
+        self.format_types = format_types or dict()
+        self.cache = dict()
+        self.num_samples, num_fields = struct.unpack_from('<II', encoded, 1)
+        n = self.num_samples
+        self.columns = []
+        pos = 9
+        for _ in xrange(num_fields):
+            kind = ord(encoded[pos])
+            pos += 1
+            if kind == GT:
+                separators = np.frombuffer(encoded, dtype=np.uint8, count=n, offset=pos)
+                alleles = np.frombuffer(encoded, dtype=np.int8, count=2 * n, offset=pos + n).reshape(n, 2)
+                self.columns.append((kind, (separators, alleles)))
+                pos += 3 * n
+            elif kind == INTEGER:
+                self.columns.append((kind, np.frombuffer(encoded, dtype='<i4', count=n, offset=pos)))
+                pos += 4 * n
+            elif kind == FLOAT:
+                f = ord(encoded[pos])
+                self.columns.append((kind, (f, np.frombuffer(encoded, dtype='<f8', count=n, offset=pos + 1))))
+                pos += 1 + 8 * n
+            elif kind == STRING:
+                text, pos = unpack_string(encoded, pos)
+                self.columns.append((kind, text))
+            else:
+                raise IOError('Invalid SVB column kind ' + str(kind))
+
+    def _column(self, field):
+        i = self.format_dict.get(field)
+        if i is None or i >= len(self.columns):
+            return None, None
+        return self.columns[i]
+
+    def _text(self, kind, data):
+        '''
+        The values of a column as a list of strings
+        '''
+        if kind == GT:
+            separators, alleles = data
+            chars = np.empty((self.num_samples, 3), dtype=np.uint8)
+            chars[:, [0, 2]] = np.where(alleles == GenotypeMatrix.MISSING, ord('.'), alleles + ord('0'))
+            chars[:, 1] = separators
+            return chars.view('S3').ravel().tolist()
+        elif kind == INTEGER:
+            return ['.' if v == MISSING_INTEGER else str(v) for v in data.tolist()]
+        elif kind == FLOAT:
+            f = FLOAT_FORMATS[data[0]]
+            return ['.' if v != v else f(v) for v in data[1].tolist()]
+        return data.split('\t')
+
+    def strings(self, field):
+        kind, data = self._column(field)
+        if kind is None:
+            return np.array(['./.' if field == 'GT' else '.'] * self.num_samples, dtype=str)
+        try:
+            return self.cache[('strings', field)]
+        except KeyError:
+            column = self.cache[('strings', field)] = np.array(self._text(kind, data), dtype=str)
+            return column
+
+    def values(self, field, dtype=np.float32):
+        kind, data = self._column(field)
+        if kind not in (INTEGER, FLOAT):
+            return GenotypeMatrix.values(self, field, dtype)
+        try:
+            return self.cache[(field, dtype)]
+        except KeyError:
+            pass
+        if kind == INTEGER:
+            values = data.astype(dtype)
+            values[data == MISSING_INTEGER] = np.nan
+        else:
+            values = data[1].astype(dtype)
+        self.cache[(field, dtype)] = values
+        return values
+
+    def gt(self):
+        kind, data = self._column('GT')
+        if kind != GT:
+            return GenotypeMatrix.gt(self)
+        return data[1]
+
+    def to_string(self):
+        '''
+        The sample columns as text
+        '''
+        columns = [self._text(kind, data) for kind, data in self.columns]
+        return '\t'.join(':'.join(sample) for sample in zip(*columns))
+
+def decode_genotypes(encoded, format_dict, format_types):
+    '''
+    A GenotypeMatrix of the sample columns of a record, or their text if
+    they were kept as text
+    '''
+    if ord(encoded[0]) == RAW:
+        return unpack_string(encoded, 1)[0]
+    return PackedGenotypeMatrix(encoded, format_dict, format_types)
+
+def encode_vcf_fields(fields, info, format_string, genotypes):
+    '''
+    Encode the first seven columns of a VCF record along with its encoded
+    INFO, its FORMAT column and its encoded sample columns. format_string
+    is None for a sites-only record.
+    '''
+    pos = int(fields[1])
+    if str(pos) != fields[1]:
+        raise ValueError('POS ' + fields[1] + ' is not an integer')
+    return ''.join([pack_string(fields[0]),
+        struct.pack('<i', pos),
+        pack_string(fields[2]),
+        pack_string(fields[3]),
+        pack_string(fields[4]),
+        pack_string(fields[5]),
+        pack_string(fields[6]),
+        pack_string(info)] +
+        (['\x00'] if format_string is None else ['\x01', pack_string(format_string), pack_string(genotypes)]))
+
+def format_ids(vcf, format_string):
+    return [vcf.format_ids.get(f) for f in format_string.split(':')]
+
+def encode_vcf_line(line, vcf):
+    '''
+    Encode a VCF line of 8 or more columns
+    '''
+    fields = line.rstrip('\n').split('\t', 9)
+    if len(fields) < 8:
+        raise ValueError('VCF records must have at least 8 columns')
+    if len(fields) == 8:
+        return encode_vcf_fields(fields, encode_info(fields[7], vcf.info_ids), None, None)
+    gts_string = fields[9] if len(fields) > 9 else ''
+    return encode_vcf_fields(fields,
+            encode_info(fields[7], vcf.info_ids),
+            fields[8],
+            encode_genotypes(gts_string, len(fields[8].split(':')), format_ids(vcf, fields[8])))
+
+def encode_variant(var, vcf):
+    '''
+    Encode a Variant as get_var_string(True) would write it. INFO and sample
+    columns read from SVB that haven't been changed are written back as
+    they were read.
+    '''
+    fields = [var.chrom, str(var.pos), var.var_id, var.ref, var.alt, str(var.qual), var.filter]
+    if isinstance(var.info, PackedInfo) and not var.info.modified:
+        info = var.info.encoded
+    else:
+        info = encode_info(var.get_info_string(), vcf.info_ids)
+    format_string = var.get_format_string()
+    if var.gts is None and isinstance(var.matrix, PackedGenotypeMatrix):
+        genotypes = var.matrix.encoded
+    else:
+        genotypes = encode_genotypes(var.get_gt_string(True), len(format_string.split(':')), format_ids(vcf, format_string))
+    return encode_vcf_fields(fields, info, format_string, genotypes)
+
+def decode_vcf_fields(record):
+    '''
+    The first eight columns of a VCF record, with INFO still encoded, along
+    with the FORMAT column and the encoded sample columns, which are None
+    for a sites-only record
+    '''
+    pos = 0
+    fields = []
+    chrom, pos = unpack_string(record, pos)
+    fields.append(chrom)
+    fields.append(str(struct.unpack_from('<i', record, pos)[0]))
+    pos += 4
+    for _ in xrange(6):
+        value, pos = unpack_string(record, pos)
+        fields.append(value)
+    if record[pos] == '\x00':
+        return fields, None, None
+    format_string, pos = unpack_string(record, pos + 1)
+    genotypes, pos = unpack_string(record, pos)
+    return fields, format_string, genotypes
+
+def decode_variant(record, vcf):
+    '''
+    Decode a VCF record to a Variant
+    '''
+    fields, format_string, genotypes = decode_vcf_fields(record)
+    info = PackedInfo(fields[7])
+    if format_string is None:
+        return Variant(fields, vcf, info=info)
+    format_dict = dict((key, index) for index, key in enumerate(format_string.split(':')))
+    format_dict.setdefault('GT', len(format_dict))
+    format_types = dict((f.id, f.type) for f in vcf.format_list)
+    decoded = decode_genotypes(genotypes, format_dict, format_types)
+    if isinstance(decoded, PackedGenotypeMatrix):
+        return Variant(fields + [format_string], vcf, info=info, matrix=decoded)
+    return Variant(fields + [format_string, decoded], vcf, info=info)
+
+def decode_vcf_line(record):
+    '''
+    Decode a VCF record to its text line
+    '''
+    fields, format_string, genotypes = decode_vcf_fields(record)
+    fields[7] = PackedInfo(fields[7]).raw
+    if format_string is None:
+        return '\t'.join(fields) + '\n'
+    decoded = decode_genotypes(genotypes, dict(), None)
+    if isinstance(decoded, PackedGenotypeMatrix):
+        decoded = decoded.to_string()
+    return '\t'.join(fields + [format_string] + ([decoded] if decoded != '' else [])) + '\n'
+
+def encode_bedpe_fields(fields):
+    coordinates = [int(fields[i]) for i in (1, 2, 4, 5)]
+    out = [struct.pack('<4q', *coordinates), struct.pack('<I', len(fields) - 4)]
+    out.extend(pack_string(f) for i, f in enumerate(fields) if i not in (1, 2, 4, 5))
+    return ''.join(out)
+
+def encode_bedpe_line(line):
+    '''
+    Encode a BEDPE line, with the sample columns as one string
+    '''
+    fields = line.rstrip('\n').split('\t', 20)
+    for i in (1, 2, 4, 5):
+        if str(int(fields[i])) != fields[i]:
+            raise ValueError('BEDPE coordinate ' + fields[i] + ' is not an integer')
+    return encode_bedpe_fields(fields)
+
+def encode_bedpe(bedpe):
+    '''
+    Encode a Bedpe as str() would write it
+    '''
+    return encode_bedpe_fields(str(bedpe).split('\t', 20))
+
+def decode_bedpe_fields(record):
+    coordinates = struct.unpack_from('<4q', record, 0)
+    n = struct.unpack_from('<I', record, 32)[0]
+    pos = 36
+    fields = []
+    for _ in xrange(n):
+        value, pos = unpack_string(record, pos)
+        fields.append(value)
+    for i, c in zip((1, 2, 4, 5), coordinates):
+        fields.insert(i, str(c))
+    return fields
+
+def decode_bedpe(record):
+    '''
+    Decode a BEDPE record to a Bedpe
+    '''
+    fields = decode_bedpe_fields(record)
+    return Bedpe(fields[:20] + (fields[20].split('\t') if len(fields) > 20 else []))
+
+def decode_bedpe_line(record):
+    return '\t'.join(decode_bedpe_fields(record)) + '\n'
+
+def is_svb(file_name):
+    '''
+    Check whether a file is SVB by its first bytes
+    '''
+    if file_name in (None, '-', 'stdin') or not os.path.isfile(file_name):
+        return False
+    with open(file_name, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+class PeekedHandle(object):
+    '''
+    A handle whose first bytes were read to tell whether it is SVB. They are
+    handed back ahead of the rest of it, whether it is read or iterated as
+    lines.
+    '''
+    def __init__(self, handle, head):
+        self.handle = handle
+        self.head = head
+
+    def read(self, n=-1):
+        head = self.head
+        if not head:
+            return self.handle.read(n)
+        if n < 0:
+            self.head = ''
+            return head + self.handle.read()
+        self.head = head[n:]
+        if len(head) >= n:
+            return head[:n]
+        return head + self.handle.read(n - len(head))
+
+    def __iter__(self):
+        head, self.head = self.head, ''
+        if head and not head.endswith('\n'):
+            head += self.handle.readline()
+        return chain(head.splitlines(True), self.handle)
+
+    def close(self):
+        self.handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def open_input(file_name, region=None):
+    '''
+    Open the input of a subcommand, a file or stdin. It's opened as a Reader
+    if it is SVB and otherwise as text by tabix.open_region.
+    '''
+    if file_name in (None, '-', 'stdin'):
+        su.InputStream.valid(file_name)
+        handle = PeekedHandle(sys.stdin, sys.stdin.read(len(MAGIC)))
+        if handle.head != MAGIC:
+            return open_region(file_name, region, lambda f: handle)
+    elif is_svb(file_name):
+        handle = open(file_name, 'rb')
+    else:
+        return open_region(file_name, region)
+    if region is not None:
+        sys.stderr.write('\nError: --region needs a bgzipped, indexed file, not SVB\n')
+        sys.exit(1)
+    return Reader(handle)
+
+class Writer(object):
+    '''
+    Write SVB records to a handle, after the header
+    '''
+    def __init__(self, handle, kind, header):
+        '''
+        header is the text header, ending with the #CHROM line
+        '''
+        self.handle = handle
+        self.kind = kind
+        if not header.endswith('\n'):
+            header += '\n'
+        handle.write(MAGIC + kind + pack_string(header))
+
+    @staticmethod
+    def frame(record):
+        '''
+        An encoded record as it's written to the file
+        '''
+        return struct.pack('<I', len(record)) + record
+
+    def write(self, record):
+        self.handle.write(self.frame(record))
+
+class LineWriter(object):
+    '''
+    Write the text of a VCF or BEDPE, written to it in pieces of any size,
+    as SVB. The kind of records is told by the #CHROM line ending the
+    header. It's for subcommands that format their records as text.
+    '''
+    def __init__(self, handle):
+        self.handle = handle
+        self.header = []
+        self.writer = None
+        self.encode = None
+        self.partial = ''
+
+    def write(self, text):
+        if '\n' not in text:
+            self.partial += text
+            return
+        lines = (self.partial + text).split('\n')
+        self.partial = lines.pop()
+        for line in lines:
+            self.write_line(line)
+
+    def write_line(self, line):
+        '''
+        Write a single line, with or without its newline
+        '''
+        if self.writer is not None:
+            self.writer.write(self.encode(line))
+            return
+        if not line.startswith('#'):
+            raise ValueError('the input must have a header ending with a #CHROM line')
+        self.header.append(line.rstrip('\n') + '\n')
+        if line.startswith('##'):
+            return
+        if line.startswith('#CHROM_A'):
+            self.writer = Writer(self.handle, KIND_BEDPE, ''.join(self.header))
+            self.encode = encode_bedpe_line
+        else:
+            vcf = Vcf()
+            vcf.add_header(self.header)
+            self.writer = Writer(self.handle, KIND_VCF, ''.join(self.header))
+            self.encode = lambda line: encode_vcf_line(line, vcf)
+
+    def close(self):
+        '''
+        Write what's left of the text, leaving the handle open
+        '''
+        if self.partial:
+            self.write_line(self.partial)
+            self.partial = ''
+        if self.writer is None:
+            raise ValueError('the input must have a header ending with a #CHROM line')
+
+class Reader(object):
+    '''
+    Read the header and records of an SVB file
+    '''
+    def __init__(self, handle):
+        self.handle = handle
+        start = handle.read(len(MAGIC) + 5)
+        if len(start) < len(MAGIC) + 5 or start[:len(MAGIC)] != MAGIC:
+            raise IOError('Not an SVB file')
+        self.kind = start[len(MAGIC)]
+        n = struct.unpack('<I', start[len(MAGIC) + 1:])[0]
+        self.header = handle.read(n)
+        self.header_lines = self.header.splitlines(True)
+        self.vcf = Vcf()
+        self.vcf.add_header(self.header_lines)
+
+    def records(self):
+        '''
+        Yield the encoded records
+        '''
+        read = self.handle.read
+        while True:
+            size = read(4)
+            if len(size) < 4:
+                if len(size) > 0:
+                    raise IOError('Truncated SVB record')
+                return
+            n = struct.unpack('<I', size)[0]
+            record = read(n)
+            if len(record) < n:
+                raise IOError('Truncated SVB record')
+            yield record
+
+    def decode(self, record):
+        '''
+        Decode a record to a Variant or a Bedpe
+        '''
+        if self.kind == KIND_VCF:
+            return decode_variant(record, self.vcf)
+        return decode_bedpe(record)
+
+    def decode_line(self, record):
+        '''
+        Decode a record to its text line
+        '''
+        if self.kind == KIND_VCF:
+            return decode_vcf_line(record)
+        return decode_bedpe_line(record)
+
+    def __iter__(self):
+        for record in self.records():
+            yield self.decode(record)
+
+    def lines(self):
+        '''
+        Yield the header and the records as text lines, for subcommands
+        that read text
+        '''
+        for line in self.header_lines:
+            yield line
+        for record in self.records():
+            yield self.decode_line(record)
+
+    def close(self):
+        self.handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def to_text(reader, output_handle):
+    output_handle.write(reader.header)
+    for record in reader.records():
+        output_handle.write(reader.decode_line(record))
+
+def to_svb(input_stream, output_handle):
+    writer = LineWriter(output_handle)
+    for line in input_stream:
+        writer.write_line(line)
+    writer.close()
+
+def description():
+    return 'convert VCF or BEDPE to or from SVB, a binary format for passing records between subcommands'
+
+def epilog():
+    return 'SVB input is converted back to text and VCF or BEDPE input, which may be gzipped, to SVB. Subcommands that read SVB tell it by its first bytes.'
+
+def add_arguments_to_parser(parser):
+    parser.add_argument('-i', '--input', metavar='<FILE>', default=None, help='VCF, BEDPE or SVB input (default: stdin)')
+    parser.add_argument('-o', '--output', metavar='<FILE>', type=argparse.FileType('wb'), default=sys.stdout, help='output to write (default: stdout)')
+    parser.set_defaults(entry_point=run_from_args)
+
+def command_parser():
+    parser = argparse.ArgumentParser(description=description(), epilog=epilog())
+    add_arguments_to_parser(parser)
+    return parser
+
+def run_from_args(args):
+    with open_input(args.input) as input_stream:
+        try:
+            if isinstance(input_stream, Reader):
+                to_text(input_stream, args.output)
+            else:
+                to_svb(input_stream, args.output)
+        except ValueError as e:
+            sys.stderr.write('\nError: ' + str(e) + '\n')
+            sys.exit(1)
+    args.output.close()
+
+if __name__ == '__main__':
+    parser = command_parser()
+    args = parser.parse_args()
+    sys.exit(args.entry_point(args))
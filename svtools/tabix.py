@@ -0,0 +1,171 @@
+'''
+Tabix indexes of BGZF compressed VCF, BEDPE and BED files, built and read
+with pysam, for fetching the records overlapping a region without reading
+the whole file.
+'''
+import os
+import re
+import sys
+import pysam
+import svtools.bgzf as bgzf
+import svtools.utils as su
+
+# the columns of each type of file, as arguments to pysam.tabix_index
+PRESETS = {
+        'vcf': dict(preset='vcf'),
+        'bed': dict(preset='bed'),
+        # BEDPE records are indexed by their first breakend
+        'bedpe': dict(seq_col=0, start_col=1, end_col=2, zerobased=True)
+        }
+
+def index_name(file_name):
+    return file_name + '.tbi'
+
+def guess_preset(file_name):
+    '''
+    The preset for a file going by its name, or None
+    '''
+    match = re.search(r'\.(vcf|bedpe|bed)(\.b?gz)?$', file_name)
+    if match is None:
+        return None
+    return match.group(1)
+
+def parse_region(region):
+    '''
+    Parse a region like chr1, chr1:1000 or chr1:1,000-2,000, where the
+    positions are 1-based and inclusive, into a chromosome and a 0-based,
+    half-open interval. Missing ends are None.
+    '''
+    match = re.match(r'^(.+):([0-9,]+)(?:-([0-9,]+))?$', region)
+    if match is None:
+        return region, None, None
+    start = int(match.group(2).replace(',', '')) - 1
+    end = None
+    if match.group(3) is not None:
+        end = int(match.group(3).replace(',', ''))
+    return match.group(1), max(start, 0), end
+
+def build_index(file_name, preset):
+    '''
+    Index a BGZF file sorted by chromosome and start, replacing any index
+    it already has
+    '''
+    try:
+        pysam.tabix_index(file_name, force=True, **PRESETS[preset])
+    except (IOError, OSError):
+        raise ValueError('unable to index ' + file_name + ', it must be sorted by chromosome and start')
+
+class Reader(object):
+    '''
+    Fetch the records overlapping a region from a BGZF compressed file with
+    a tabix index
+    '''
+    def __init__(self, file_name):
+        self.name = file_name
+        self.file = pysam.TabixFile(file_name)
+        self.contigs = set(self.file.contigs)
+
+    def header(self):
+        '''
+        The header lines at the start of the file
+        '''
+        return [line + '\n' for line in self.file.header]
+
+    def fetch(self, chrom, start=None, end=None):
+        '''
+        Yield the lines of the records on chrom overlapping the 0-based,
+        half-open interval [start, end), in file order. Without start and
+        end the whole chromosome is read.
+        '''
+        if chrom not in self.contigs:
+            return
+        if start is not None and end is not None and start >= end:
+            return
+        for line in self.file.fetch(chrom, start, end):
+            yield line + '\n'
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class RegionStream(object):
+    '''
+    The header lines of an indexed file followed by the records
+    overlapping a region, read like an input stream
+    '''
+    def __init__(self, file_name, region):
+        if not os.path.exists(index_name(file_name)):
+            sys.stderr.write('\nError: ' + str(file_name) + ' has no index. Compress it with bgzip and run svtools index\n')
+            sys.exit(1)
+        self.reader = Reader(file_name)
+        self.region = parse_region(region)
+
+    def __iter__(self):
+        for line in self.reader.header():
+            yield line
+        for line in self.reader.fetch(*self.region):
+            yield line
+
+    def close(self):
+        self.reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def open_region(file_name, region=None, opener=su.InputStream):
+    '''
+    Open a file for reading lines, only the header and the records
+    overlapping region if one is given. Without a region the file is
+    opened with opener.
+    '''
+    if region is None:
+        return opener(file_name)
+    if not isinstance(file_name, basestring) or file_name in ('-', 'stdin'):
+        sys.stderr.write('\nError: --region needs an indexed file, not stdin\n')
+        sys.exit(1)
+    return RegionStream(file_name, region)
+
+def description():
+    return 'index a bgzipped VCF, BEDPE or BED file for fetching regions'
+
+def epilog():
+    return 'The file must be compressed with bgzip and sorted by chromosome and start. The index is written next to it with a .tbi extension by tabix, through pysam. BEDPE files are indexed by the first breakend.'
+
+def add_arguments_to_parser(parser):
+    parser.add_argument(metavar='<FILE>', dest='input', help='bgzipped file to index')
+    parser.add_argument('-p', '--preset', choices=sorted(PRESETS), default=None, help='type of the file (default: from its name)')
+    parser.set_defaults(entry_point=run_from_args)
+
+def command_parser():
+    import argparse
+    parser = argparse.ArgumentParser(description=description(), epilog=epilog())
+    add_arguments_to_parser(parser)
+    return parser
+
+def run_from_args(args):
+    preset = args.preset or guess_preset(args.input)
+    if preset is None:
+        sys.stderr.write('\nError: unable to tell the type of ' + args.input + ' from its name, please give it with --preset\n')
+        sys.exit(1)
+    with open(args.input, 'rb') as f:
+        if not bgzf.is_bgzf(f.read(18)):
+            sys.stderr.write('\nError: ' + args.input + ' must be compressed with bgzip to be indexed\n')
+            sys.exit(1)
+    try:
+        build_index(args.input, preset)
+    except ValueError as e:
+        sys.stderr.write('\nError: ' + str(e) + '\n')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    parser = command_parser()
+    args = parser.parse_args()
+    sys.exit(args.entry_point(args))
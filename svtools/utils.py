@@ -1,17 +1,35 @@
 import sys
+import os
+import gzip
+import svtools.bgzf as bgzf
+
+def open_input(file_name, threads=2):
+    '''
+    Open a plain, gzipped or BGZF file for reading lines. Regular files are
+    recognized by their first bytes, anything else (e.g. a pipe) that can
+    only be read once by its extension. BGZF blocks are inflated with the
+    given number of threads.
+    '''
+    if os.path.isfile(file_name):
+        with open(file_name, 'rb') as f:
+            magic = f.read(18)
+        if bgzf.is_bgzf(magic):
+            return bgzf.BgzfReader(file_name, threads)
+        elif magic[:2] == '\x1f\x8b':
+            return gzip.open(file_name, 'rb')
+    elif file_name.endswith('.gz'):
+        return gzip.open(file_name, 'rb')
+    return open(file_name, 'r')
 
 class InputStream(object):
-    '''This class handles opening either stdin or a gzipped or non-gzipped file'''
+    '''This class handles opening either stdin or a plain, gzipped or BGZF file'''
 
     def __init__(self, string):
         '''Create a new wrapper around a stream'''
         if string in (None, '-', 'stdin') and self.valid(string):
             self.handle = sys.stdin
-        elif string.endswith('.gz'):
-            import gzip
-            self.handle = gzip.open(string, 'rb')
         else:
-            self.handle = open(string, 'r')
+            self.handle = open_input(string)
 
     @staticmethod
     def valid(string):
@@ -35,3 +53,40 @@ class InputStream(object):
     def close(self):
         '''Close the underlying handle'''
         return self.handle.close()
+
+def add_output_format_argument(parser, text_format='vcf', svb=False):
+    '''
+    Add --output-format to a subcommand writing text_format, e.g. vcf or
+    bedpe, and SVB if it can
+    '''
+    choices = (text_format, text_format + '.gz', 'bgzf')
+    help = '{0}, or {0}.gz or bgzf for BGZF compressed output that svtools index can index'
+    if svb:
+        choices += ('svb',)
+        help += ', or svb for binary records for another subcommand (see svtools svb)'
+    parser.add_argument('--output-format', metavar='<FORMAT>', choices=choices, default=text_format,
+            help=(help + ' [{0}]').format(text_format))
+
+class OutputStream(object):
+    '''This class wraps an output handle, compressing what is written to it as BGZF if the output format is compressed'''
+
+    def __init__(self, handle, output_format=None, threads=2):
+        '''Create a new wrapper around a handle'''
+        self.compressed = output_format is not None and (output_format == 'bgzf' or output_format.endswith('.gz'))
+        if self.compressed:
+            self.handle = bgzf.BgzfWriter(handle, threads)
+        else:
+            self.handle = handle
+
+    def __enter__(self):
+        '''Support use of with by passing back the handle to write to'''
+        return self.handle
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        '''Support use of with by finishing the compressed output on exit of the context, without the EOF block if it failed'''
+        self.close(eof=exc_type is None)
+
+    def close(self, eof=True):
+        '''End the compressed output, leaving the underlying handle open'''
+        if self.compressed:
+            self.handle.close(eof)
@@ -1,9 +1,13 @@
+import os
 import sys
 import gzip
 from operator import itemgetter
 import argparse
 from svtools.vcf.file import Vcf
 from svtools.bedpe import Bedpe
+from svtools.record_view import open_records, views
+import svtools.tabix as tabix
+import svtools.utils as su
 
 def get_var_string(bedpe, cohort_name):
     if len(bedpe.cohort_vars) > 0:
@@ -20,12 +24,12 @@ def add(a_bedpe, b_bedpe, max_distance):
             or a_bedpe.o2 != b_bedpe.o2):
             return False
 
-        if (a_bedpe.c1 != b_bedpe.c1
+        if (a_bedpe.c1_id != b_bedpe.c1_id
             or a_bedpe.s1 - max_distance > b_bedpe.e1
             or a_bedpe.e1 + max_distance < b_bedpe.s1):
             return False
 
-        if (a_bedpe.c2 != b_bedpe.c2
+        if (a_bedpe.c2_id != b_bedpe.c2_id
             or a_bedpe.s2 - max_distance > b_bedpe.e2
             or a_bedpe.e2 + max_distance < b_bedpe.s2):
             return False
@@ -35,43 +39,61 @@ def add(a_bedpe, b_bedpe, max_distance):
     else:
         return False
 
-def varLookup(aFile, bFile, bedpe_out, max_distance, pass_prefix, cohort_name):
+def read_b_entry(bLine):
+    bentry = Bedpe(bLine)
+    if bentry.af is None:
+        sys.stderr.write('No allele frequency for variant found in -b file. This tool requires allele frequency information to function. Please add with svtools afreq and rerun\n')
+        sys.exit(1)
+    return bentry
+
+def indexed_candidates(reader, a_bedpe, max_distance):
+    '''
+    B records from an indexed file whose first breakend is close enough to
+    that of a_bedpe to match it
+    '''
+    start = max(a_bedpe.s1 - max_distance - 1, 0)
+    return [read_b_entry(l) for l in views(reader.fetch(a_bedpe.c1, start, a_bedpe.e1 + max_distance + 1))]
+
+def varLookup(aFile, bFile, bedpe_out, max_distance, pass_prefix, cohort_name, region=None):
     # FIXME The following code is heavily duplicated with vcftobedpe and bedpetovcf. Harmonize!!!
     bList = list()
     headerObj=Vcf() #co-opt the VCF header object
     if cohort_name is None:
         cohort_name=str(str(bFile).split('/')[-1])
         
+    # with an index only the B records near each A record are read
+    bReader = None
     if bFile == "stdin":
         bData = sys.stdin
+    elif os.path.exists(tabix.index_name(bFile)):
+        bReader = tabix.Reader(bFile)
+        bData = []
     elif bFile.endswith('.gz'):
         bData = gzip.open(bFile, 'rb')
     else:
-        bData = open(bFile, 'r')
-    for bLine in bData:
+        bData = open_records(bFile)
+    for bLine in views(bData):
         if bLine.startswith(pass_prefix):
             continue
-        bentry = Bedpe(bLine.rstrip().split('\t'))
-        if bentry.af is None:
-            sys.stderr.write('No allele frequency for variant found in -b file. This tool requires allele frequency information to function. Please add with svtools afreq and rerun\n')
-            sys.exit(1)
-        bList.append(bentry)
+        bList.append(read_b_entry(bLine))
     
-    if aFile == "stdin":
+    if region is not None:
+        aData = tabix.open_region(aFile, region)
+    elif aFile == "stdin":
         aData = sys.stdin
     elif aFile.endswith('.gz'):
         aData = gzip.open(aFile, 'rb')
     else:
-        aData = open(aFile, 'r')
+        aData = open_records(aFile)
     in_header=True    
     header_lines = []
     sample_list = None
-    for aLine in aData:
+    for aLine in views(aData):
         if pass_prefix is not None and aLine.startswith(pass_prefix):
-            if aLine[0] == '#' and aLine[1] != '#':
-                sample_list = aLine.rstrip().split('\t', 14)[-1]
+            if aLine.startswith('#') and not aLine.startswith('##'):
+                sample_list = str(aLine).split('\t', 14)[-1]
             else:
-                header_lines.append(aLine)
+                header_lines.append(aLine.line())
             continue
         else:
             if in_header == True:
@@ -113,10 +135,12 @@ def varLookup(aFile, bFile, bedpe_out, max_distance, pass_prefix, cohort_name):
                                                'INFO_A','INFO_B']
                                               ) + '\n')
                 in_header=False
-            a = Bedpe(aLine.rstrip().split('\t'))
+            a = Bedpe(aLine)
             if a.af is None:
                 sys.stderr.write('No allele frequency for variant found in -a file. This tool requires allele frequency information to function. Please add with svtools afreq and rerun\n')
                 sys.exit(1)
+            if bReader is not None:
+                bList = indexed_candidates(bReader, a, max_distance)
             for b in bList:
                 add(a,b,max_distance)
             bedpe_out.write(get_var_string(a, cohort_name) + '\n')
@@ -130,6 +154,8 @@ def add_arguments_to_parser(parser):
     parser.add_argument("-b", "--bFile", dest="bFile", metavar='<BEDPE>', help="pruned merged BEDPE (B file) (-b stdin). For pruning use svtools prune")
     parser.add_argument("-c", "--cohort", dest='cohort_name', metavar='<STRING>', default=None, help="cohort name to add information of matching variants (default:bFile)")                    
     parser.add_argument('-o', '--output', type=argparse.FileType('w'), metavar='<BEDPE>', default=sys.stdout, help='output BEDPE to write (default: stdout)')
+    parser.add_argument('--region', metavar='<CHR:START-END>', default=None, help='only read the A records overlapping a region of a bgzipped, indexed A file (see svtools index)')
+    su.add_output_format_argument(parser, 'bedpe')
     parser.set_defaults(entry_point=run_from_args)
 
 def command_parser():
@@ -147,7 +173,8 @@ def run_from_args(args):
             args.aFile = sys.stdin
 
     try:
-        varLookup(args.aFile, args.bFile, args.output, args.max_distance, pass_prefix, args.cohort_name)
+        with su.OutputStream(args.output, getattr(args, 'output_format', None)) as output_handle:
+            varLookup(args.aFile, args.bFile, output_handle, args.max_distance, pass_prefix, args.cohort_name, getattr(args, 'region', None))
     except IOError as err:
         sys.stderr.write("IOError " + str(err) + "\n");
 
@@ -1,5 +1,10 @@
 import re
 import time
+from svtools.contigs import ContigDictionary
+
+# the fields inside the <> of a meta information line, split on commas that
+# aren't in double quotes
+META_FIELDS = re.compile(r'(?:[^,\"]|\"[^\"]*\")+')
 
 class Vcf(object):
     '''
@@ -20,6 +25,14 @@ class Vcf(object):
         self.format_list = []
         self.filter_list = []
         self.alt_list = []
+        # the above indexed by ID, along with the position of each INFO
+        # field in the output order
+        self.info_ids = dict()
+        self.info_order = dict()
+        self.format_ids = dict()
+        self.filter_ids = dict()
+        self.alt_ids = dict()
+        self.contigs = ContigDictionary()
         self.add_format('GT', 1, 'String', 'Genotype')
 
     def parse_meta(self, line):
@@ -28,8 +41,7 @@ class Vcf(object):
         Note that this doesn't handle comment-style lines e.g. ##BLAHBLAH
         '''
         a = line[line.find('<')+1:line.rfind('>')]
-        r = re.compile(r'(?:[^,\"]|\"[^\"]*\")+')
-        return r.findall(a)
+        return META_FIELDS.findall(a)
 
     def add_header(self, header):
         '''
@@ -37,6 +49,7 @@ class Vcf(object):
         '''
         # XXX We could probably simplify the below by making a dict of our supported keys
         # and have the values by method/function references for the action
+        contig_lines = []
         for line in header:
             split_header = line.split('=')
             if split_header[0] == '##fileformat':
@@ -52,11 +65,15 @@ class Vcf(object):
             elif split_header[0] == '##FILTER':
                 self.add_filter(*[b.split('=')[1] for b in self.parse_meta(line)])
             elif split_header[0].startswith('##'):
+                if split_header[0] == '##contig':
+                    contig_lines.append(line)
                 self.other_meta.append(line.rstrip())
             elif line[0] == '#' and line[1] != '#':
                 self.sample_list = line.rstrip().split('\t')[9:]
                 for i in xrange(0, len(self.sample_list)):
                     self.sample_indices[self.sample_list[i]] = i + 9
+        if len(contig_lines) > 0:
+            self.contigs = ContigDictionary.from_header(contig_lines)
 
     # return the VCF header
     def get_header(self, include_samples=True):
@@ -85,9 +102,11 @@ class Vcf(object):
         '''
         Add new meta information about an INFO tag/field
         '''
-        if id not in [i.id for i in self.info_list]:
+        if id not in self.info_ids:
             inf = self.Info(id, number, type, desc)
             self.info_list.append(inf)
+            self.info_ids[inf.id] = inf
+            self.info_order[inf.id] = len(self.info_list) - 1
 
     def add_info_after(self, insert_id, id, number, type, desc):
         '''
@@ -96,43 +115,48 @@ class Vcf(object):
         This matters as the order of tags is used to determine the order of their output
         during string construction.
         '''
-        for i in range(0, len(self.info_list)):
-            if insert_id == self.info_list[i].id and (id not in [j.id for j in self.info_list]):
-                inf = self.Info(id, number, type, desc)
-                self.info_list.insert(i + 1, inf)
-                return
+        if insert_id in self.info_order and id not in self.info_ids:
+            inf = self.Info(id, number, type, desc)
+            self.info_list.insert(self.info_order[insert_id] + 1, inf)
+            self.info_ids[inf.id] = inf
+            # updated in place as Variants hold on to it
+            for i, info in enumerate(self.info_list):
+                self.info_order[info.id] = i
 
     def add_alt(self, id, desc):
         '''
         Add a new symbolic ALTernate allele meta information line
         '''
-        if id not in [a.id for a in self.alt_list]:
+        if id not in self.alt_ids:
             alt = self.Alt(id, desc)
             self.alt_list.append(alt)
+            self.alt_ids[alt.id] = alt
 
     def add_format(self, id, number, type, desc):
         '''
         Add meta info about a FORMAT field/tag
         '''
-        if id not in [f.id for f in self.format_list]:
+        if id not in self.format_ids:
             fmt = self.Format(id, number, type, desc)
             self.format_list.append(fmt)
+            self.format_ids[fmt.id] = fmt
 
     def add_filter(self, id, desc):
         '''
         Add meta info about a FILTER 
         '''
-        if id not in [f.id for f in self.filter_list]:
+        if id not in self.filter_ids:
             flt = self.Filter(id, desc)
             self.filter_list.append(flt)
+            self.filter_ids[flt.id] = flt
 
     def add_sample(self, name):
         '''
         Add a sample to our VCF. We store the index.
         '''
         self.sample_list.append(name)
-        # XXX Probably slow. Optimize if we start adding lots of samples ever
-        self.sample_indices[name] = self.sample_list.index(name) + 9
+        # a repeated name keeps the column of its first occurrence
+        self.sample_indices.setdefault(name, len(self.sample_list) + 8)
 
     def sample_to_col(self, sample):
         '''
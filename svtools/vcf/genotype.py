@@ -4,13 +4,18 @@ class Genotype(object):
     '''
     This class stores information about each sample.
     '''
-    def __init__(self, variant, value_list):
+    def __init__(self, variant, value_list, gt_string=None):
         '''
         Initialize the class. All instances have a GT field, 
         but that is enforced in the Variant class.
+
+        gt_string is the column the values were read from, if any. The
+        Variant writes it back as is until a value is set.
         '''
         self.value_list = value_list
         self.variant = variant
+        self.gt_string = gt_string
+        self.modified = False
 
     def __eq__(self, other):
         return self.get_gt_string() == other.get_gt_string()
@@ -32,6 +37,7 @@ class Genotype(object):
             sys.exit(1)
 
     def _set_value(self, index, value):
+        self.modified = True
         try:
             self.value_list[index] = value
         except IndexError:
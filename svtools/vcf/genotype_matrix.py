@@ -0,0 +1,118 @@
+import numpy as np
+
+class GenotypeMatrix(object):
+    '''
+    Columnar view of the sample columns of a VCF line. The sample columns are
+    split once into a matrix of strings, one row per sample, and FORMAT
+    fields are read out as vectors across all samples without building a
+    Genotype for each one.
+    '''
+    # allele code for a '.' allele in GT
+    MISSING = -1
+    # allele code padding genotypes with fewer alleles than the ploidy
+    NO_ALLELE = -2
+
+    def __init__(self, rows, format_dict, format_types=None):
+        '''
+        rows are the split sample columns in sample order. format_dict maps
+        FORMAT fields to their index in a row and format_types maps them to
+        their header Type.
+        '''
+        self.format_dict = format_dict
+        self.format_types = format_types or dict()
+        self.num_samples = len(rows)
+        width = len(format_dict)
+        gt_index = format_dict.get('GT')
+        if any(len(r) != width for r in rows):
+            # like Genotype.get_format, fields missing from the end of a
+            # sample are '.', or './.' for GT
+            padded = list()
+            for r in rows:
+                if len(r) < width:
+                    r = r + ['./.' if i == gt_index else '.' for i in xrange(len(r), width)]
+                padded.append(r[:width])
+            rows = padded
+        self.matrix = np.array(rows, dtype=str).reshape(self.num_samples, width)
+        self.cache = dict()
+
+    @classmethod
+    def from_string(cls, gts_string, format_dict, format_types=None):
+        '''
+        Make a matrix from the tab separated sample columns of a VCF line
+        '''
+        if gts_string == '':
+            return cls([], format_dict, format_types)
+        return cls([c.split(':') for c in gts_string.split('\t')], format_dict, format_types)
+
+    def strings(self, field):
+        '''
+        The values of a FORMAT field across samples as an array of strings
+        '''
+        try:
+            return self.matrix[:, self.format_dict[field]]
+        except KeyError:
+            return np.array(['./.' if field == 'GT' else '.'] * self.num_samples, dtype=str)
+
+    def values(self, field, dtype=np.float32):
+        '''
+        The values of a single valued numeric FORMAT field, e.g. CN, AB or SQ,
+        across samples as float32, or the given dtype, with NaN where the
+        value is missing
+        '''
+        try:
+            return self.cache[(field, dtype)]
+        except KeyError:
+            column = self.strings(field)
+            missing = column == '.'
+            if missing.any():
+                column = column.copy()
+                column[missing] = 'nan'
+            values = self.cache[(field, dtype)] = column.astype(dtype)
+            return values
+
+    def gt(self):
+        '''
+        GT allele codes across samples as an int8 array with a row per sample
+        and a column per allele. '.' alleles are MISSING and haploid
+        genotypes among diploid ones are padded with NO_ALLELE.
+        '''
+        try:
+            return self.cache['GT']
+        except KeyError:
+            pass
+        column = self.strings('GT')
+        if column.dtype.itemsize == 3 and self.num_samples > 0:
+            # the common case of every genotype being two single digit
+            # alleles, or '.', with a '/' or '|' between them
+            chars = column.view(np.uint8).reshape(self.num_samples, 3)
+            alleles = chars[:, [0, 2]].astype(np.int8) - ord('0')
+            separators = chars[:, 1]
+            digits = (alleles >= 0) & (alleles <= 9)
+            dots = alleles == ord('.') - ord('0')
+            if ((digits | dots).all() and
+                    ((separators == ord('/')) | (separators == ord('|'))).all()):
+                alleles[dots] = self.MISSING
+                self.cache['GT'] = alleles
+                return alleles
+        split = [g.replace('|', '/').split('/') for g in column]
+        ploidy = max([len(g) for g in split] or [2])
+        alleles = np.empty((self.num_samples, ploidy), dtype=np.int8)
+        alleles.fill(self.NO_ALLELE)
+        for i, g in enumerate(split):
+            codes = [self.MISSING if a == '.' else int(a) for a in g]
+            if max(codes) > 127:
+                raise ValueError('GT allele ' + str(max(codes)) + ' does not fit in an int8')
+            alleles[i, :len(g)] = codes
+        self.cache['GT'] = alleles
+        return alleles
+
+    def __getitem__(self, field):
+        '''
+        GT allele codes, numeric fields as float32 and anything else as strings
+        '''
+        if field == 'GT':
+            return self.gt()
+        elif self.format_types.get(field) in ('Integer', 'Float'):
+            return self.values(field)
+        else:
+            return self.strings(field)
@@ -1,18 +1,112 @@
 from svtools.vcf.genotype import Genotype
+from svtools.vcf.genotype_matrix import GenotypeMatrix
+from svtools.record_view import split_columns
 import sys
 
+class Info(object):
+    '''
+    The INFO column of a VCF line. The raw string is kept and keys are
+    decoded the first time they are looked up. Once a key is set or removed
+    the whole column is decoded and the line's INFO is rebuilt on output.
+    '''
+    __slots__ = ['raw', 'values', 'cache', 'modified']
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.values = None
+        self.cache = dict()
+        self.modified = False
+
+    def _find(self, key):
+        '''
+        Decode a single key from the raw string. The last occurrence wins, as
+        it would if the whole column were decoded.
+        '''
+        raw = self.raw
+        end = len(raw)
+        while True:
+            i = raw.rfind(key, 0, end)
+            if i < 0:
+                raise KeyError(key)
+            j = i + len(key)
+            if i == 0 or raw[i - 1] == ';':
+                if j == len(raw) or raw[j] == ';':
+                    return True
+                if raw[j] == '=':
+                    value_end = raw.find(';', j + 1)
+                    if value_end < 0:
+                        value_end = len(raw)
+                    return raw[j + 1:value_end].split('=', 1)[0]
+            end = j - 1
+
+    def _decode(self):
+        if self.values is None:
+            self.values = dict()
+            i_split = [a.split('=') for a in self.raw.split(';')] # temp list of split info column
+            for i in i_split:
+                if len(i) == 1:
+                    i.append(True)
+                self.values[i[0]] = i[1]
+        return self.values
+
+    def __getitem__(self, key):
+        if self.values is not None:
+            return self.values[key]
+        try:
+            return self.cache[key]
+        except KeyError:
+            value = self.cache[key] = self._find(key)
+            return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __setitem__(self, key, value):
+        self._decode()[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self._decode()[key]
+        self.modified = True
+
+    def keys(self):
+        return self._decode().keys()
+
+    def __iter__(self):
+        return iter(self._decode())
+
+    def __len__(self):
+        return len(self._decode())
+
 class Variant(object):
     '''
     Class for storing information stored in a VCF line
     '''
-    def __init__(self, var_list, vcf):
+    def __init__(self, var_list, vcf, info=None, matrix=None):
         '''
         Initialize values.
 
         If fixed_genotypes is True then a string corresponding to the
         genotype portion of the line is cached for printing later.
+
+        A record decoded from a binary format can instead pass its INFO and
+        sample columns already decoded, as an Info and a GenotypeMatrix with
+        a to_string method. The text of the sample columns is then only
+        made if it's needed.
         '''
+        var_list, gts_string = split_columns(var_list, 9)
         self.chrom = var_list[0]
+        self.chrom_id = vcf.contigs.id(self.chrom)
         self.pos = int(var_list[1])
         self.var_id = var_list[2]
         self.ref = var_list[3]
@@ -21,9 +115,10 @@ class Variant(object):
         self.filter = var_list[6]
         self.sample_list = vcf.sample_list
         self.info_list = vcf.info_list
-        self.info = dict()
         self.format_list = vcf.format_list
-        self.format_set = {i.id for i in vcf.format_list}
+        self.info_ids = vcf.info_ids
+        self.info_order = vcf.info_order
+        self.format_set = vcf.format_ids
         self.gts = None
 
         # fill in empty sample genotypes
@@ -35,14 +130,13 @@ class Variant(object):
         self.format_string = var_list[8]
         self.format_dict = { key: index for index, key in enumerate(self.format_string.split(':')) }
         self.format_dict.setdefault('GT', len(self.format_dict)) #add GT if it doesn't exist
-        self.gts_string = '\t'.join(var_list[9:])
+        self.matrix = matrix
+        if matrix is None:
+            self.gts_string = gts_string or ''
+        else:
+            self.gts_string = None
 
-        self.info = dict()
-        i_split = [a.split('=') for a in var_list[7].split(';')] # temp list of split info column
-        for i in i_split:
-            if len(i) == 1:
-                i.append(True)
-            self.info[i[0]] = i[1]
+        self.info = Info(var_list[7]) if info is None else info
 
     def _parse_genotypes(self, genotype_array):
         '''
@@ -52,7 +146,7 @@ class Variant(object):
         for index, sample_string in enumerate(genotype_array):
             sample_name = self.sample_list[index]
             sample_field = sample_string.split(':')
-            g = Genotype(self, sample_field)
+            g = Genotype(self, sample_field, sample_string)
             gts[sample_name] = g
         return gts
 
@@ -61,7 +155,7 @@ class Variant(object):
         Set value of the specified field in the INFO section.
         The INFO field must exist already.
         '''
-        if field in [i.id for i in self.info_list]:
+        if field in self.info_ids:
             self.info[field] = value
         else:
             sys.stderr.write('\nError: invalid INFO field, \"' + field + '\"\n')
@@ -76,15 +170,18 @@ class Variant(object):
     def get_info_string(self):
         '''
         Construct the INFO string for printing. Order is matched to the header.
+        An INFO column that hasn't been changed is passed through as read.
         '''
+        if not self.info.modified:
+            return self.info.raw
         i_list = list()
-        for info_field in self.info_list:
-            if info_field.id in self.info.keys():
-                if info_field.type == 'Flag':
-                    if self.info[info_field.id]:
-                        i_list.append(info_field.id)
-                else:
-                    i_list.append('%s=%s' % (info_field.id, self.info[info_field.id]))
+        present = [k for k in self.info if k in self.info_order]
+        for key in sorted(present, key=self.info_order.__getitem__):
+            if self.info_ids[key].type == 'Flag':
+                if self.info[key]:
+                    i_list.append(key)
+            else:
+                i_list.append('%s=%s' % (key, self.info[key]))
         return ';'.join(i_list)
 
     def get_format_string(self):
@@ -103,18 +200,39 @@ class Variant(object):
         '''
         if self.gts:
             if use_cached_gt_string:
-                return self.gts_string
+                return self._cached_gts_string()
+            elif self.get_format_string() == self.gts_format_string:
+                # the fields are laid out as they were read, so samples that
+                # haven't been changed are written back from their columns
+                width = len(self.format_dict)
+                gt_strings = list()
+                for s in self.sample_list:
+                    g = self.gts[s]
+                    if g.modified or g.gt_string is None or len(g.value_list) != width:
+                        gt_strings.append(g.get_gt_string())
+                    else:
+                        gt_strings.append(g.gt_string)
+                return '\t'.join(gt_strings)
             else:
                 return '\t'.join(self.genotype(s).get_gt_string() for s in self.sample_list)
         else:
-            return self.gts_string
+            return self._cached_gts_string()
+
+    def _cached_gts_string(self):
+        '''
+        The sample columns as they were read
+        '''
+        if self.gts_string is None:
+            self.gts_string = self.matrix.to_string()
+        return self.gts_string
 
     def _uncache_gts(self):
         '''
         Parse genotypes if they are requested
         '''
         if self.gts is None:
-            self.gts = self._parse_genotypes(self.gts_string.split('\t'))
+            self.gts = self._parse_genotypes(self._cached_gts_string().split('\t'))
+            self.gts_format_string = self.format_string
             self.format_string = None
 
     def genotypes(self):
@@ -124,6 +242,19 @@ class Variant(object):
         self._uncache_gts()
         return self.gts.values()
 
+    def genotype_matrix(self):
+        '''
+        Return a GenotypeMatrix holding the FORMAT fields of all samples as
+        columns, without making a Genotype for each sample
+        '''
+        format_types = dict((f.id, f.type) for f in self.format_list)
+        if self.gts is None:
+            if self.matrix is not None:
+                return self.matrix
+            return GenotypeMatrix.from_string(self.gts_string, self.format_dict, format_types)
+        else:
+            return GenotypeMatrix([self.gts[s].value_list for s in self.sample_list], self.format_dict, format_types)
+
     def genotype(self, sample_name):
         '''
         Return the Genotype object for the requested sample
@@ -1,22 +1,176 @@
 import argparse, sys
 import gzip
+import io
+import os
+import tempfile
+from itertools import islice, izip
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+import svtools.bgzf as bgzf
+import svtools.utils as su
 
 MAX_SPLIT = 9
+# about the number of sample columns held in memory at once, which sets how
+# many rows are pasted at a time
+BLOCK_CELLS = 1024 * 1024
+
+def open_vcf(path, buffer_size=io.DEFAULT_BUFFER_SIZE, pool=None):
+    '''
+    Open a VCF to paste, reading it buffer_size bytes at a time. Given a
+    pool of threads, a gzipped VCF is inflated on it ahead of its lines
+    being read, a BGZF one several blocks at once.
+    '''
+    if path.endswith('.gz'):
+        if pool is not None:
+            with open(path, 'rb') as f:
+                magic = f.read(18)
+            if bgzf.is_bgzf(magic):
+                return bgzf.BgzfReader(path, pool=pool, ahead=max(2, buffer_size / bgzf.MAX_BLOCK_DATA))
+            return bgzf.PrefetchReader(gzip.open(path, 'rb'), pool, buffer_size)
+        return io.BufferedReader(gzip.open(path, 'rb'), buffer_size)
+    return open(path, 'r', buffer_size)
+
+def read_samples_header(vcf):
+    '''
+    Skip the ## lines of a VCF and return its #CHROM line split up to the
+    sample columns
+    '''
+    while 1:
+        l = vcf.readline()
+        if not l:
+            return []
+        if l[:2] == '##':
+            continue
+        if l[0] == '#':
+            return l.rstrip().split('\t', MAX_SPLIT)
+
+def count_records(path, buffer_size=io.DEFAULT_BUFFER_SIZE):
+    '''
+    The number of lines after the header of a VCF
+    '''
+    count = 0
+    with open_vcf(path, buffer_size) as vcf:
+        for line in vcf:
+            if line[:2] != '##':
+                break
+        for line in vcf:
+            count += 1
+    return count
+
+def rows_per_block(width):
+    '''
+    The number of rows of the given width to paste at a time
+    '''
+    return max(1, BLOCK_CELLS / width)
+
+def paste_columns(vcf_files, rows, first, quals=None, set_format=True, check_format=False):
+    '''
+    Read the next len(rows) lines of each VCF into rows, preallocated lists
+    of output columns. The FORMAT of the first VCF goes to column first,
+    unless set_format is False, and the sample columns of each VCF after it.
+    With check_format, every other VCF must have the FORMAT in column 8.
+    With quals, the QUAL column of each VCF is appended to it as a list.
+    '''
+    num_rows = len(rows)
+    for j, vcf in enumerate(vcf_files):
+        lines = list(islice(vcf, num_rows))
+        if len(lines) < num_rows:
+            sys.stderr.write('\nERROR: VCF files differ in length\n')
+            exit(1)
+        lines_v = [line.rstrip().split('\t', MAX_SPLIT) for line in lines]
+        if min(map(len, lines_v)) < 10:
+            sys.stderr.write('\nERROR: {0} had less than 10 columns. Only the master may be an 8 column VCF.\n'.format(vcf.name))
+            exit(1)
+        # set FORMAT field as format in first VCF.
+        # cannot extract this from master, since it may have
+        # been altered in the processing of the VCFs.
+        if j == 0 and set_format:
+            for row, line_v in izip(rows, lines_v):
+                row[first] = line_v[8]
+        elif check_format:
+            for row, line_v in izip(rows, lines_v):
+                if line_v[8] != row[8]:
+                    sys.stderr.write('\nERROR: {0} has FORMAT {1} at {2}:{3}, where {4} is expected.\n'.format(vcf.name, line_v[8], line_v[0], line_v[1], row[8]))
+                    exit(1)
+        if quals is not None:
+            quals.append([line_v[5] for line_v in lines_v])
+        column = first + 1 + j
+        for row, line_v in izip(rows, lines_v):
+            row[column] = line_v[9]
+
+def paste_block(vcf_files, output_handle, num_records, check_format=False):
+    '''
+    Paste the sample columns of num_records lines of each VCF into a column
+    block. A block is a VCF whose only fixed column is QUAL, which lists the
+    QUAL of every file in it. With check_format, the VCFs must all have the
+    FORMAT of the first.
+    '''
+    out_v = ['#CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO', 'FORMAT']
+    for vcf in vcf_files:
+        out_v.extend(read_samples_header(vcf)[MAX_SPLIT:])
+    output_handle.write('\t'.join(out_v) + '\n')
+    width = MAX_SPLIT + len(vcf_files)
+    step = rows_per_block(width)
+    for start in xrange(0, num_records, step):
+        rows = [['.', '.', '.', '.', '.', None, '.', '.'] + [None] * (width - 8)
+                for i in xrange(min(step, num_records - start))]
+        quals = []
+        paste_columns(vcf_files, rows, 8, quals, check_format=check_format)
+        for row, row_quals in izip(rows, izip(*quals)):
+            row[5] = ','.join(row_quals)
+        output_handle.writelines(['\t'.join(row) + '\n' for row in rows])
+
+def paste_group(args):
+    '''
+    Pool entry point that pastes a group of VCFs into a column block. A
+    sys.exit is handed back to the parent instead of taking the worker down.
+    '''
+    file_names, path, num_records, buffer_size, decompress_threads, check_format = args
+    vcf_files = []
+    pool = ThreadPool(decompress_threads) if decompress_threads > 0 else None
+    try:
+        for name in file_names:
+            vcf_files.append(open_vcf(name, buffer_size, pool))
+        with open(path, 'w', buffer_size) as output_handle:
+            paste_block(vcf_files, output_handle, num_records, check_format)
+        return 0
+    except SystemExit as e:
+        return e.code
+    finally:
+        for f in vcf_files:
+            f.close()
+        if pool is not None:
+            pool.terminate()
+            pool.join()
 
 class Vcfpaste(object):
-    def __init__(self, vcf_list, master=None, sum_quals=None):
+    def __init__(self, vcf_list, master=None, sum_quals=None, max_open=None, threads=1, tempdir=None, buffer_size=io.DEFAULT_BUFFER_SIZE, block_rows=None, decompress_threads=0, append=None):
         self.vcf_list = vcf_list
         self.master = master
+        self.append = append
         self.sum_quals = sum_quals
+        self.max_open = max_open
+        self.threads = threads
+        self.tempdir = tempdir or tempfile.gettempdir()
+        self.buffer_size = buffer_size
+        self.block_rows = block_rows
+        self.decompress_threads = decompress_threads
+        self.pool = None
+        self.vcf_files = []
 
     def execute(self, output_handle=sys.stdout):
+        blocks = []
         try:
             self.read_filenames()
+            if self.max_open is not None and len(self.vcf_file_names) > self.max_open:
+                blocks = self.paste_blocks()
             self.open_files()
             self.write_header(output_handle)
             self.write_variants(output_handle)
         finally:
             self.close_files()
+            for path in blocks:
+                os.remove(path)
 
     def read_filenames(self):
         self.vcf_file_names = []
@@ -24,18 +178,65 @@ class Vcfpaste(object):
             for line in vcf_list_file:
                 path = line.rstrip()
                 self.vcf_file_names.append(path)
-        if self.master == None:
+        if self.append is not None:
+            # the pasted VCF stands in for the master, keeping its samples
+            self.master = self.append
+        elif self.master == None:
             self.master = self.vcf_file_names[0]
         self.vcf_file_names.insert(0, self.master)
 
+    def temp_path(self):
+        temp_descriptor, path = tempfile.mkstemp(prefix='svtools.paste.', dir=self.tempdir)
+        os.close(temp_descriptor)
+        return path
+
+    def paste_blocks(self):
+        '''
+        Paste the sample files in groups of max_open into column blocks, and
+        those into larger blocks, until the master and the blocks can all be
+        open at once. The sample files are replaced by the last blocks and
+        the paths of the blocks left are returned.
+        '''
+        num_records = count_records(self.vcf_file_names[0], self.buffer_size)
+        paths = self.vcf_file_names[1:]
+        made = set()
+        pool = Pool(self.threads) if self.threads > 1 else None
+        try:
+            while len(paths) >= self.max_open:
+                tasks = [(paths[i:i + self.max_open], self.temp_path(), num_records, self.buffer_size, self.decompress_threads, self.append is not None)
+                        for i in xrange(0, len(paths), self.max_open)]
+                made.update(t[1] for t in tasks)
+                if pool is None:
+                    codes = map(paste_group, tasks)
+                else:
+                    codes = pool.map(paste_group, tasks, 1)
+                for code in codes:
+                    if code:
+                        sys.exit(code)
+                # blocks pasted into larger ones aren't needed anymore
+                for path in paths:
+                    if path in made:
+                        os.remove(path)
+                paths = [t[1] for t in tasks]
+        except BaseException:
+            for path in made:
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+        self.vcf_file_names[1:] = paths
+        return paths if len(made) > 0 else []
+
     def open_files(self):
         self.vcf_files = []
+        if self.decompress_threads > 0:
+            self.pool = ThreadPool(self.decompress_threads)
         # parse the vcf files to paste
         for path in self.vcf_file_names:
-            if path.endswith('.gz'):
-                self.vcf_files.append(gzip.open(path, 'rb'))
-            else:
-                self.vcf_files.append(open(path, 'r'))
+            self.vcf_files.append(open_vcf(path, self.buffer_size, self.pool))
     
     def write_header(self, output_handle=sys.stdout):
         master = self.vcf_files[0]
@@ -46,73 +247,97 @@ class Vcfpaste(object):
             if master_line[:2] != '##':
                 break
             output_handle.write(master_line)
-        out_v = master_line.rstrip().split('\t', MAX_SPLIT)[:(MAX_SPLIT - 1)] + ["FORMAT"]
+        if self.append is not None:
+            out_v = master_line.rstrip().split('\t')
+            if len(out_v) < 10:
+                sys.stderr.write('\nERROR: {0} has no samples to append to.\n'.format(master.name))
+                exit(1)
+        else:
+            out_v = master_line.rstrip().split('\t', MAX_SPLIT)[:(MAX_SPLIT - 1)] + ["FORMAT"]
 
+        names = set(out_v[MAX_SPLIT:])
         for vcf in self.vcf_files[1:]:
-            while 1:
-                l = vcf.readline()
-                if not l:
-                    break
-                if l[:2] == '##':
-                    continue
-                if l[0] == '#':
-                    out_v = out_v + l.rstrip().split('\t', MAX_SPLIT)[MAX_SPLIT:]
-                    break
+            samples = read_samples_header(vcf)[MAX_SPLIT:]
+            if self.append is not None:
+                for sample in samples[0].split('\t') if samples else []:
+                    if sample in names:
+                        sys.stderr.write('\nERROR: sample {0} in {1} is already in {2}.\n'.format(sample, vcf.name, master.name))
+                        exit(1)
+                    names.add(sample)
+            out_v = out_v + samples
         output_handle.write('\t'.join(map(str, out_v)) + '\n')
 
     def write_variants(self, output_handle=sys.stdout):
+        '''
+        Paste the records a block of rows at a time. Each input is read a
+        block at a time, its columns are put in place in the rows and the
+        block is written at once. When appending, the FORMAT and samples of
+        the pasted VCF are kept as they are and its QUAL is added to.
+        '''
+        master = self.vcf_files[0]
+        vcf_files = self.vcf_files[1:]
+        if self.append is not None:
+            fixed = MAX_SPLIT + 1
+            width = fixed + len(vcf_files)
+        else:
+            fixed = 8
+            width = 8 + (len(vcf_files) + 1 if len(vcf_files) > 0 else 0)
+        step = self.block_rows or rows_per_block(width)
         while 1:
-            master_line = self.vcf_files[0].readline()
-            if not master_line:
+            master_lines = list(islice(master, step))
+            if not master_lines:
                 break
-            master_v = master_line.rstrip().split('\t', MAX_SPLIT)
-            if len(master_v) < 8:
-                sys.stderr.write('\nERROR: Master file {0} had less than 8 columns.\n'.format(self.vcf_files[0].name))
-                exit(1)
-            out_v = master_v[:8] # output array of fields
-            qual = 0
-            if out_v[5] != '.':
-                qual = float(out_v[5])
-            format = None # column 9, VCF format field.
-
-            for vcf in self.vcf_files[1:]:
-                line = vcf.readline()
-                if not line:
-                    sys.stderr.write('\nERROR: VCF files differ in length\n')
+            rows = []
+            for master_line in master_lines:
+                master_v = master_line.rstrip().split('\t', MAX_SPLIT)
+                if len(master_v) < fixed:
+                    if self.append is not None:
+                        sys.stderr.write('\nERROR: {0} had less than 10 columns.\n'.format(master.name))
+                    else:
+                        sys.stderr.write('\nERROR: Master file {0} had less than 8 columns.\n'.format(master.name))
                     exit(1)
-                line_v = line.rstrip().split('\t', MAX_SPLIT)
-                if len(line_v) < 10:
-                    sys.stderr.write('\nERROR: {0} had less than 10 columns. Only the master may be an 8 column VCF.\n'.format(vcf.name))
-                    exit(1)
-
-                # set FORMAT field as format in first VCF.
-                # cannot extract this from master, since it may have
-                # been altered in the processing of the VCFs.
-                if format is None:
-                    format = line_v[8]
-                    out_v.append(format)
+                rows.append(master_v[:fixed] + [None] * (width - fixed)) # output array of fields
+            quals = [] if self.sum_quals else None
+            paste_columns(vcf_files, rows, fixed - 1 if self.append is not None else 8, quals, self.append is None, self.append is not None)
 
-                if line_v[5] != '.':
-                    qual += float(line_v[5])
-                out_v = out_v + line_v[9:]
-            if self.sum_quals:
-                out_v[5] = qual
-            output_handle.write( '\t'.join(map(str, out_v)) + '\n')
+            if self.sum_quals and len(vcf_files) > 0:
+                # added up in input order, a column block holding the QUAL
+                # of each of its files
+                for row, row_quals in izip(rows, izip(*quals)):
+                    qual = 0
+                    if row[5] != '.':
+                        qual = float(row[5])
+                    row[5] = str(sum([float(q) for q in ','.join(row_quals).split(',') if q != '.'], qual))
+            elif self.sum_quals:
+                for row in rows:
+                    row[5] = str(float(row[5]) if row[5] != '.' else 0)
+            output_handle.writelines(['\t'.join(row) + '\n' for row in rows])
 
     def close_files(self):
         for f in self.vcf_files:
             f.close()
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
 
 def description():
     return 'paste VCFs from multiple samples'
 
 def epilog():
-    return '''VCF files may be gzipped. If the -m argument is omitted then the first file in the list of files in --vcf-list is treated as the master.'''
+    return '''VCF files may be gzipped. If the -m argument is omitted then the first file in the list of files in --vcf-list is treated as the master. With --append the samples in --vcf-list are added to a VCF pasted before, which takes the place of the master, without reading the samples already in it again. With --max-open the samples are pasted into temporary files in groups, on -t processes, and those are pasted in turn. Each process then has at most --max-open VCFs open.'''
 
 def add_arguments_to_parser(parser):
     parser.add_argument('-f', '--vcf-list', metavar='<FILE>', required=True, help='file containing a line-delimited list of VCF files to paste (required)')
     parser.add_argument('-m', '--master', metavar='<VCF>', default=None, help='VCF file to set first 8 columns of variant info (otherwise first file in --vcf-list)')
     parser.add_argument('-q', '--sum-quals', required=False, action='store_true', help='sum QUAL scores of input VCFs as output QUAL score')
+    parser.add_argument('-a', '--append', metavar='<VCF>', default=None, help='pasted VCF to add the samples to, in place of a master. The samples must have its FORMAT. Use -q only if it was pasted with -q. The QUAL sums then start from its QUAL as it was written, rounded by str(), so they can differ in the last digits from pasting all the samples again')
+    parser.add_argument('--max-open', metavar='<INT>', type=int, default=None, help='paste the VCFs in groups of at most this many through temporary column blocks, so that no process reads more files at once (default: read all at once)')
+    parser.add_argument('-t', '--threads', metavar='<INT>', type=int, default=1, help='number of processes pasting groups in parallel with --max-open [1]')
+    parser.add_argument('-b', '--buffer-size', metavar='<BYTES>', type=int, default=64*1024, help='size of the read buffer of each VCF [65536]')
+    parser.add_argument('-z', '--decompress-threads', metavar='<INT>', type=int, default=0, help='number of threads in each process inflating gzipped VCFs ahead of pasting them (default: inflate as they are read)')
+    parser.add_argument('-T', '--tempdir', metavar='<DIRECTORY_PATH>', default=tempfile.gettempdir(), help='temporary directory for column blocks')
+    su.add_output_format_argument(parser, 'vcf')
     parser.set_defaults(entry_point=run_from_args)
 
 def command_parser():
@@ -121,8 +346,23 @@ def command_parser():
     return parser
 
 def run_from_args(args):
-    paster = Vcfpaste(args.vcf_list, master=args.master, sum_quals=args.sum_quals)
-    paster.execute()
+    max_open = getattr(args, 'max_open', None)
+    if max_open is not None and max_open < 2:
+        sys.stderr.write('\nERROR: --max-open must be at least 2\n')
+        sys.exit(1)
+    append = getattr(args, 'append', None)
+    if append is not None and args.master is not None:
+        sys.stderr.write('\nERROR: --master can\'t be used with --append\n')
+        sys.exit(1)
+    paster = Vcfpaste(args.vcf_list, master=args.master, sum_quals=args.sum_quals,
+            append=append,
+            max_open=max_open,
+            threads=getattr(args, 'threads', 1),
+            tempdir=getattr(args, 'tempdir', None),
+            buffer_size=getattr(args, 'buffer_size', io.DEFAULT_BUFFER_SIZE),
+            decompress_threads=getattr(args, 'decompress_threads', 0))
+    with su.OutputStream(sys.stdout, getattr(args, 'output_format', None)) as output_handle:
+        paster.execute(output_handle)
 
 # initialize the script
 if __name__ == '__main__':
@@ -1,6 +1,10 @@
 import sys
 import argparse
+from tempfile import gettempdir
 from svtools.external_cmd import ExternalCmd
+import svtools.external_sort as external_sort
+from svtools.contigs import ContigDictionary, DEFAULT_CONTIGS
+import svtools.utils as su
 
 class VcfSort(ExternalCmd):
     def __init__(self):
@@ -9,17 +13,31 @@ class VcfSort(ExternalCmd):
 def description():
     return 'sort a VCF file'
 
+def epilog():
+    return '''Records are sorted by chromosome in natural order, so chr2 comes before chr10, unless -c gives the order.
+    Use -m to control the amount of memory used before sorted runs are spilled to temporary files and -t to sort
+    those runs in parallel. --external sorts with the original GNU sort pipeline instead.'''
+
 def add_arguments_to_parser(parser):
     parser.add_argument('input', metavar='<VCF>', nargs='?', help='VCF file to sort (default: stdin)')
     parser.add_argument('output', metavar='<VCF>', nargs='?', help='output file to write to (default: stdout)')
+    parser.add_argument('-c', '--contigs', metavar='<FILE>', help='FASTA index or VCF with ##contig lines giving the chromosome order')
+    parser.add_argument('-m', '--max-memory', metavar='<BYTES>', type=int, default=1024**3, help='approximate memory in bytes used to sort records before spilling them to a temporary file [1073741824]')
+    parser.add_argument('-t', '--threads', metavar='<INT>', type=int, default=1, help='number of processes sorting spilled runs [1]')
+    parser.add_argument('-T', '--tempdir', metavar='<DIRECTORY_PATH>', default=gettempdir(), help='temporary directory')
+    parser.add_argument('--external', action='store_true', help='sort with the GNU sort pipeline in bin/vcfsort instead')
+    su.add_output_format_argument(parser, 'vcf')
     parser.set_defaults(entry_point=run_from_args)
 
 def command_parser():
-    parser = argparse.ArgumentParser(description=description())
+    parser = argparse.ArgumentParser(description=description(), epilog=epilog())
     add_arguments_to_parser(parser)
     return parser
 
-def run_from_args(args):
+def run_external(args):
+    if getattr(args, 'output_format', 'vcf') != 'vcf':
+        sys.stderr.write('\nError: --external only writes plain text output\n')
+        sys.exit(1)
     opts = list()
     if args.input:
         opts.append(args.input)
@@ -29,6 +47,25 @@ def run_from_args(args):
     sort_cmd_runner = VcfSort()
     sort_cmd_runner.run_cmd_with_options(opts)
 
+def run_from_args(args):
+    if getattr(args, 'external', False):
+        return run_external(args)
+
+    contigs = DEFAULT_CONTIGS
+    if getattr(args, 'contigs', None):
+        contigs = ContigDictionary.from_file(args.contigs)
+    sorter = external_sort.ExternalSort(external_sort.VcfKey(contigs),
+            tempdir=getattr(args, 'tempdir', None),
+            max_memory=getattr(args, 'max_memory', 1024**3),
+            threads=getattr(args, 'threads', 1))
+    with su.InputStream(args.input) as input_stream:
+        if args.output:
+            with open(args.output, 'w') as output_handle, su.OutputStream(output_handle, getattr(args, 'output_format', None)) as output_stream:
+                sorter.sort(input_stream, output_stream)
+        else:
+            with su.OutputStream(sys.stdout, getattr(args, 'output_format', None)) as output_stream:
+                sorter.sort(input_stream, output_stream)
+
 if __name__ == "__main__":
     parser = command_parser()
     args = parser.parse_args()
@@ -1,82 +1,104 @@
 import argparse
 import sys
 import time
+from itertools import chain
 
 import svtools.vcf.file
 import svtools.vcf.variant
 import svtools.utils as su
+import svtools.svb as svb
 from svtools.vcftobedpeconverter import VcfToBedpeConverter
 
-def vcfToBedpe(vcf_file, bedpe_out):
+def bedpe_header(header, vcf):
+    '''
+    Read the header lines of a VCF into vcf and return the BEDPE header
+    '''
+    lines = []
+    sample_list = []
+    for line in header:
+        if line[0:2] == '##':
+            if line.split('=')[0] == '##fileformat':
+                line = '##fileformat=' + "BEDPE" + '\n'
+            if line.split('=')[0] == '##fileDate':
+                line = '##fileDate=' + time.strftime('%Y%m%d') + '\n'
+        else:
+            sample_list = line.rstrip().split('\t')[9:]
+        lines.append(line)
+    vcf.add_header(lines)
+    if "SVTYPE" in vcf.info_ids:
+       vcf.add_info_after("SVTYPE", "POS", 1, 'Integer', 'Position of the variant described in this record')
+    header=vcf.get_header()
+    final_header_line = ['#CHROM_A',
+            'START_A',
+            'END_A',
+            'CHROM_B',
+            'START_B',
+            'END_B',
+            'ID',
+            'QUAL',
+            'STRAND_A',
+            'STRAND_B',
+            'TYPE',
+            'FILTER',
+            'NAME_A',
+            'REF_A',
+            'ALT_A',
+            'NAME_B',
+            'REF_B',
+            'ALT_B',
+            'INFO_A',
+            'INFO_B']
+
+    if len(sample_list) > 0:
+        final_header_line += ['FORMAT','\t'.join(map(str,sample_list))]
+    return header[:header.rfind('\n')] + '\n' + '\t'.join(final_header_line) + '\n'
+
+def vcfToBedpe(vcf_file, bedpe_out, binary_output=False):
     converter = VcfToBedpeConverter()
     vcf = svtools.vcf.file.Vcf()
+    if isinstance(vcf_file, svb.Reader):
+        # SVB records are decoded straight to Variants
+        header = vcf_file.header_lines
+        records = vcf_file.records()
+        to_variant = lambda record: svb.decode_variant(record, vcf)
+    else:
+        header = []
+        records = iter(vcf_file)
+        for line in records:
+            if line[0] != '#':
+                records = chain([line], records)
+                break
+            header.append(line)
+        to_variant = lambda line: svtools.vcf.variant.Variant(line.rstrip().split('\t'), vcf)
+    if binary_output:
+        write = lambda bedpe: bedpe_out.write(svb.Writer.frame(svb.encode_bedpe(bedpe)))
+    else:
+        write = lambda bedpe: bedpe_out.write(str(bedpe) + '\n')
     in_header = True
-    header = []
-    sample_list = []
     bnds = dict()
     sec_bnds = dict()
-    v = []
-    for line in vcf_file:
+    for record in records:
         if in_header:
-            if line[0:2] == '##':
-                if line.split('=')[0] == '##fileformat':
-                    line = '##fileformat=' + "BEDPE" + '\n'
-                if line.split('=')[0] == '##fileDate':
-                    line = '##fileDate=' + time.strftime('%Y%m%d') + '\n'
-                header.append(line)
-                continue
-            elif line[0] == '#' and line[1] != '#':    
-                sample_list = line.rstrip().split('\t')[9:]
-                header.append(line)
-                continue
+            # print header
+            in_header = False
+            if binary_output:
+                svb.Writer(bedpe_out, svb.KIND_BEDPE, bedpe_header(header, vcf))
             else:
-                # print header
-                in_header = False
-                vcf.add_header(header)
-                if "SVTYPE" in [info.id for info in vcf.info_list]:
-                   vcf.add_info_after("SVTYPE", "POS", 1, 'Integer', 'Position of the variant described in this record')
-                header=vcf.get_header()
-                bedpe_out.write(header[:header.rfind('\n')] + '\n')                
-                final_header_line = ['#CHROM_A',
-                        'START_A',
-                        'END_A',
-                        'CHROM_B',
-                        'START_B',
-                        'END_B',
-                        'ID',
-                        'QUAL',
-                        'STRAND_A',
-                        'STRAND_B',
-                        'TYPE',
-                        'FILTER',
-                        'NAME_A',
-                        'REF_A',
-                        'ALT_A',
-                        'NAME_B',
-                        'REF_B',
-                        'ALT_B',
-                        'INFO_A',
-                        'INFO_B']
-
-                if len(sample_list) > 0:
-                    bedpe_out.write('\t'.join(final_header_line + ['FORMAT','\t'.join(map(str,sample_list))]) + '\n')
-                else:
-                    bedpe_out.write('\t'.join(final_header_line) + '\n')
+                bedpe_out.write(bedpe_header(header, vcf))
 
-        v = line.rstrip().split('\t')
-        var = svtools.vcf.variant.Variant(v, vcf)
+        var = to_variant(record)
         var.set_info("POS", var.pos)
         unique_name = var.var_id
         if 'EVENT' in var.info:
             unique_name = var.info['EVENT']
         if var.info['SVTYPE'] != 'BND':
-            bedpe_out.write(str(converter.convert(var)) + '\n')
+            write(converter.convert(var))
         else:
             if 'SECONDARY' in var.info:
                 if unique_name in bnds:
                     #primary
                     var1 = bnds[unique_name]
-                    bedpe_out.write(str(converter.convert(var1, var)) + '\n')
+                    write(converter.convert(var1, var))
                     del bnds[unique_name]
                 else:
                     sec_bnds.update({unique_name:var})
@@ -85,17 +107,17 @@ def vcfToBedpe(vcf_file, bedpe_out):
                 continue
     intersected_keys = bnds.viewkeys() & sec_bnds.viewkeys()
     for key in intersected_keys:
-        bedpe_out.write(str(converter.convert(bnds[key], sec_bnds[key])) + '\n')
+        write(converter.convert(bnds[key], sec_bnds[key]))
         del bnds[key] 
         del sec_bnds[key]
     if bnds is not None:
         for bnd in bnds:
             sys.stderr.write('Warning: missing secondary multiline variant at ID:' + bnd + '\n')
-            bedpe_out.write(str(converter.convert(bnds[bnd], None)) + '\n')
+            write(converter.convert(bnds[bnd], None))
     if sec_bnds is not None:
         for bnd in sec_bnds:
             sys.stderr.write('Warning: missing primary multiline variant at ID:' + bnd + '\n')
-            bedpe_out.write(str(converter.convert(None, sec_bnds[bnd])) + '\n')
+            write(converter.convert(None, sec_bnds[bnd]))
             
     # close the files
     bedpe_out.close()
@@ -105,11 +127,13 @@ def description():
     return 'convert a VCF file to a BEDPE file'
 
 def epilog():
-    return 'The input VCF file can be gzipped if it is specified explicitly.'
+    return 'The input VCF file can be gzipped if it is specified explicitly, or SVB from another subcommand.'
 
 def add_arguments_to_parser(parser):
     parser.add_argument('-i', '--input', metavar='<VCF>', default=None, help='VCF input (default: stdin)')
     parser.add_argument('-o', '--output', metavar='<BEDPE>', type=argparse.FileType('w'), default=sys.stdout, help='output BEDPE to write (default: stdout)')
+    parser.add_argument('--region', metavar='<CHR:START-END>', default=None, help='only read the records overlapping a region of a bgzipped, indexed VCF (see svtools index)')
+    su.add_output_format_argument(parser, 'bedpe', svb=True)
     parser.set_defaults(entry_point=run_from_args)
 
 def command_parser():
@@ -118,8 +142,9 @@ def command_parser():
     return parser
 
 def run_from_args(args):
-    with su.InputStream(args.input) as stream:
-        return vcfToBedpe(stream, args.output)
+    output_format = getattr(args, 'output_format', None)
+    with svb.open_input(args.input, getattr(args, 'region', None)) as stream, su.OutputStream(args.output, output_format) as output_handle:
+        return vcfToBedpe(stream, output_handle, output_format == 'svb')
 
 # initialize the script
 if __name__ == '__main__':
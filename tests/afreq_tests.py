@@ -2,12 +2,16 @@ from unittest import TestCase, main
 import os
 import time
 import svtools.afreq
+import svtools.svb
+from StringIO import StringIO
+from svtools.vcf.file import Vcf
+from svtools.vcf.variant import Variant
 import sys
 import tempfile
 import difflib
 
 class IntegrationTest_afreq(TestCase):
-    def run_integration_test(self):
+    def run_integration_test(self, threads=1):
         test_directory = os.path.dirname(os.path.abspath(__file__))
         test_data_dir = os.path.join(test_directory, 'test_data', 'afreq')
         input = os.path.join(test_data_dir, 'input.vcf')
@@ -15,7 +19,7 @@ class IntegrationTest_afreq(TestCase):
         temp_descriptor, temp_output_path = tempfile.mkstemp(suffix='.vcf')
         with open(input, 'r') as input_handle, os.fdopen(temp_descriptor, 'w') as output_handle:
             updater = svtools.afreq.UpdateInfo(input_handle)
-            updater.execute(output_handle)
+            updater.execute(output_handle, threads)
             expected_lines = open(expected_result).readlines()
             # set timestamp for diff
             expected_lines[1] = '##fileDate=' + time.strftime('%Y%m%d') + '\n'
@@ -28,6 +32,27 @@ class IntegrationTest_afreq(TestCase):
                 self.assertFalse(result)
         os.remove(temp_output_path)
 
+    def run_integration_test_threads(self):
+        self.run_integration_test(threads=2)
+
+    def run_integration_test_svb(self):
+        test_directory = os.path.dirname(os.path.abspath(__file__))
+        test_data_dir = os.path.join(test_directory, 'test_data', 'afreq')
+        input = os.path.join(test_data_dir, 'input.vcf')
+        expected_result = os.path.join(test_data_dir, 'expected.vcf')
+        encoded = StringIO()
+        svtools.svb.to_svb(open(input), encoded)
+        output = StringIO()
+        output.close = lambda: None
+        updater = svtools.afreq.UpdateInfo(svtools.svb.Reader(StringIO(encoded.getvalue())))
+        updater.execute(output, 2, binary_output=True)
+        produced = StringIO()
+        svtools.svb.to_text(svtools.svb.Reader(StringIO(output.getvalue())), produced)
+        expected_lines = open(expected_result).readlines()
+        # set timestamp for diff
+        expected_lines[1] = '##fileDate=' + time.strftime('%Y%m%d') + '\n'
+        self.assertEqual(produced.getvalue().splitlines(True), expected_lines)
+
 class AfreqUiTest(TestCase):
     def test_parser(self):
         parser = svtools.afreq.command_parser()
@@ -41,7 +66,24 @@ class TestUpdateInfo(TestCase):
         instance = svtools.afreq.UpdateInfo(None)
         self.assertEqual(instance.numeric_alleles('0/0'), [0, 0])
         self.assertEqual(instance.numeric_alleles('0|1'), [0, 1])
-    
+
+    def test_count_alleles(self):
+        vcf = Vcf()
+        vcf.add_header([
+            '##fileformat=VCFv4.2',
+            '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">',
+            '##FORMAT=<ID=SQ,Number=1,Type=Float,Description="Phred-scaled probability that this site is variant">',
+            '#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tA\tB\tC\tD\tE'])
+        line = '1\t100\t1\tN\t<DEL>,<DUP>\t.\t.\t.\tGT:SQ\t0/1:10.5\t2|2:3\t./1:8\t0/0:0\t1:4'
+        var = Variant(line.split('\t'), vcf)
+        order = svtools.afreq.UpdateInfo.sample_order(vcf.sample_list)
+        alleles, num_samp, sum_sq = svtools.afreq.UpdateInfo.count_alleles(var, 2, order)
+        self.assertEqual(alleles.tolist(), [3, 2, 2])
+        self.assertEqual(num_samp, 3)
+        self.assertEqual(sum_sq, 17.5)
+        with self.assertRaises(SystemExit):
+            svtools.afreq.UpdateInfo.count_alleles(var, 1, order)
+
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,6 @@
 from unittest import TestCase, main
 from svtools.bedpe import Bedpe
+from svtools.record_view import RecordView
 
 class BedpeTests(TestCase):
     def test_parse_score(self):
@@ -75,6 +76,18 @@ class BedpeTests(TestCase):
         b1 = Bedpe(entry1)
         self.assertEqual(str(b1), '\t'.join(entry1))
 
+    def test_misc(self):
+        entry1 = [ '1', '200', '300', '1', '500', '600', '777_1', '57.0', '+', '-', 'DEL', 'PASS', '.', '.', '.', '.', '.', '.', 'SVTYPE=DEL', 'MISSING', 'GT:SU', '0/1:3', '1/1:5' ]
+        line = '\t'.join(entry1)
+        for fields in (entry1, RecordView.from_line(line + '\n')):
+            b1 = Bedpe(fields)
+            self.assertEqual(str(b1), line)
+            self.assertEqual(b1.misc, ['GT:SU', '0/1:3', '1/1:5'])
+            b1.misc.append('0/0:0')
+            self.assertEqual(str(b1), line + '\t0/0:0')
+        b2 = Bedpe(RecordView.from_line('\t'.join(entry1[:20])))
+        self.assertEqual(b2.misc, [])
+        self.assertEqual(str(b2), '\t'.join(entry1[:20]))
 
 if __name__ == "__main__":
     main()
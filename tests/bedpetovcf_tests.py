@@ -1,6 +1,8 @@
 from .file_conversion import FileConversionBase
 from unittest import TestCase
+from StringIO import StringIO
 import svtools.bedpetovcf
+import svtools.svb
 
 class BedpeToVcfTest(TestCase, FileConversionBase):
     @property
@@ -13,3 +15,16 @@ class BedpeToVcfTest(TestCase, FileConversionBase):
     @property
     def test_data_directory_name(self):
         return 'bedpetovcf'
+
+class BedpeToVcfThreadsTest(BedpeToVcfTest):
+    def forward_convert(self, input_file, output_file):
+        return svtools.bedpetovcf.bedpeToVcf(input_file, output_file, threads=2)
+
+class BedpeToVcfSvbTest(BedpeToVcfTest):
+    def forward_convert(self, input_file, output_file):
+        encoded = StringIO()
+        svtools.svb.to_svb(input_file, encoded)
+        output = StringIO()
+        output.close = lambda: None
+        svtools.bedpetovcf.bedpeToVcf(svtools.svb.Reader(StringIO(encoded.getvalue())), output, binary_output=True)
+        svtools.svb.to_text(svtools.svb.Reader(StringIO(output.getvalue())), output_file)
@@ -2,6 +2,7 @@ from unittest import TestCase
 from svtools.bedpetovcfconverter import BedpeToVcfConverter
 from svtools.vcf.file import Vcf
 from svtools.bedpe import Bedpe
+from svtools.record_view import RecordView
 
 class TestBedpeToVcfConverter(TestCase):
 
@@ -29,3 +30,10 @@ class TestBedpeToVcfConverter(TestCase):
     def test_bnd_alt_string(self):
         self.assertEqual(self.converter.bnd_alt_string('+', '-', '2', '22222'), 'N[2:22222[')
         self.assertEqual(self.converter.bnd_alt_string('-', '+', '2', '22222'), ']2:22222]N')
+
+    def test_convert_view(self):
+        entry1 = [ '1', '200', '300', '1', '500', '600', '777_1', '57', '+', '-', 'DEL', 'PASS', '.', 'N', '<DEL>', '.', '.', '.', 'SVTYPE=DEL', 'MISSING', 'GT:SU', '0/1:3', '1/1:5' ]
+        for fields in (entry1, RecordView.from_line('\t'.join(entry1) + '\n')):
+            var = self.converter.convert(Bedpe(fields))[0]
+            self.assertEqual(var.format_string, 'GT:SU')
+            self.assertEqual(var.gts_string, '0/1:3\t1/1:5')
@@ -0,0 +1,164 @@
+from unittest import TestCase, main
+import os
+import sys
+import struct
+import tempfile
+import zlib
+import gzip
+from multiprocessing.pool import ThreadPool
+import svtools.bgzf as bgzf
+import svtools.utils as su
+
+def bgzf_block(data):
+    c = zlib.compressobj(6, zlib.DEFLATED, -15)
+    deflated = c.compress(data) + c.flush()
+    header = '\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00'
+    return header + struct.pack('<H', len(deflated) + 25) + deflated + \
+            struct.pack('<II', zlib.crc32(data) & 0xffffffff, len(data))
+
+class Test_bgzf(TestCase):
+    def setUp(self):
+        self.test_data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_data', 'utils')
+        temp_descriptor, self.temp_path = tempfile.mkstemp()
+        os.close(temp_descriptor)
+
+    def tearDown(self):
+        os.remove(self.temp_path)
+
+    def write_blocks(self, chunks):
+        with open(self.temp_path, 'wb') as f:
+            for chunk in chunks:
+                f.write(bgzf_block(chunk))
+            # EOF marker
+            f.write(bgzf_block(''))
+
+    def test_is_bgzf(self):
+        self.assertTrue(bgzf.is_bgzf(bgzf_block('line\n')))
+        self.assertFalse(bgzf.is_bgzf(open(os.path.join(self.test_data_dir, 'file.txt.gz'), 'rb').read(18)))
+        self.assertFalse(bgzf.is_bgzf('#CHROM\tPOS\tID\tREF\tALT\n'))
+
+    def test_lines_across_blocks(self):
+        self.write_blocks(['ab', 'c\nde', 'f', '\n', 'g\nh\ni'])
+        with bgzf.BgzfReader(self.temp_path, threads=2) as reader:
+            self.assertEqual(reader.readline(), 'abc\n')
+            self.assertEqual(list(reader), ['def\n', 'g\n', 'h\n', 'i'])
+            self.assertEqual(reader.readline(), '')
+        self.assertTrue(reader.closed)
+
+    def test_many_blocks(self):
+        lines = ['%d\tline\n' % i for i in range(2000)]
+        text = ''.join(lines)
+        self.write_blocks([text[i:i + 97] for i in range(0, len(text), 97)])
+        with bgzf.BgzfReader(self.temp_path, threads=3) as reader:
+            self.assertEqual(list(reader), lines)
+
+    def test_bgzip_file(self):
+        expected = open(os.path.join(self.test_data_dir, 'file.txt')).readlines()
+        with bgzf.BgzfReader(os.path.join(self.test_data_dir, 'file.txt.bgz')) as reader:
+            self.assertEqual(list(reader), expected)
+
+    def test_shared_pool(self):
+        lines = ['%d\tline\n' % i for i in range(2000)]
+        text = ''.join(lines)
+        self.write_blocks([text[i:i + 97] for i in range(0, len(text), 97)])
+        pool = ThreadPool(2)
+        try:
+            with bgzf.BgzfReader(self.temp_path, pool=pool, ahead=2) as reader:
+                self.assertEqual(reader.readline(), lines[0])
+                self.assertEqual(list(reader), lines[1:])
+            # the pool is left for the other readers
+            self.assertEqual(pool.apply(len, ('abc',)), 3)
+        finally:
+            pool.terminate()
+
+    def test_prefetch_reader(self):
+        lines = ['%d\tline\n' % i for i in range(5000)]
+        with gzip.open(self.temp_path, 'wb') as f:
+            f.write(''.join(lines) + 'last')
+        pool = ThreadPool(2)
+        try:
+            with bgzf.PrefetchReader(gzip.open(self.temp_path, 'rb'), pool, chunk_size=100, ahead=3) as reader:
+                self.assertEqual(reader.name, self.temp_path)
+                self.assertEqual(reader.readline(), lines[0])
+                self.assertEqual(list(reader), lines[1:] + ['last'])
+                self.assertEqual(reader.readline(), '')
+            self.assertTrue(reader.closed)
+            with open(self.temp_path, 'rb') as f:
+                data = f.read()
+            with open(self.temp_path, 'wb') as f:
+                f.write(data[:-8] + struct.pack('<II', 0, len(data)))
+            with bgzf.PrefetchReader(gzip.open(self.temp_path, 'rb'), pool) as reader:
+                with self.assertRaises(IOError):
+                    list(reader)
+        finally:
+            pool.terminate()
+
+    def test_crc(self):
+        block = bgzf_block('line\n')
+        with open(self.temp_path, 'wb') as f:
+            f.write(block[:-8] + struct.pack('<II', 0, 5))
+        with bgzf.BgzfReader(self.temp_path) as reader:
+            with self.assertRaises(IOError):
+                list(reader)
+
+    def test_deflate_block(self):
+        self.assertEqual(bgzf.deflate_block('line\n'), bgzf_block('line\n'))
+        self.assertEqual(bgzf.deflate_block(''), bgzf.BGZF_EOF)
+
+    def test_writer(self):
+        lines = ['%d\tline\n' % i for i in range(20000)]
+        with open(self.temp_path, 'wb') as f:
+            with bgzf.BgzfWriter(f, threads=3) as writer:
+                writer.write(lines[0])
+                writer.writelines(lines[1:10000])
+                print >> writer, ''.join(lines[10000:]),
+            self.assertFalse(f.closed)
+        data = open(self.temp_path, 'rb').read()
+        self.assertTrue(data.endswith(bgzf.BGZF_EOF))
+        self.assertEqual(gzip.open(self.temp_path).read(), ''.join(lines))
+        with open(self.temp_path, 'rb') as f:
+            sizes = []
+            while True:
+                block = bgzf.read_block(f)
+                if block is None:
+                    break
+                sizes.append(block[2])
+        self.assertTrue(len(sizes) > 3)
+        self.assertTrue(all(s <= bgzf.MAX_BLOCK_DATA for s in sizes))
+        with bgzf.BgzfReader(self.temp_path) as reader:
+            self.assertEqual(list(reader), lines)
+
+    def test_output_stream(self):
+        with open(self.temp_path, 'w') as f:
+            with su.OutputStream(f, 'vcf') as output_handle:
+                self.assertIs(output_handle, f)
+        with open(self.temp_path, 'wb') as f:
+            with su.OutputStream(f, 'vcf.gz') as output_handle:
+                output_handle.write('line\n')
+        self.assertEqual(open(self.temp_path, 'rb').read(), bgzf.deflate_block('line\n') + bgzf.BGZF_EOF)
+
+    def test_failed_output(self):
+        # what was written before a failure is kept, but without the EOF block
+        # the file doesn't look complete
+        with open(self.temp_path, 'wb') as f:
+            with self.assertRaises(ValueError):
+                with bgzf.BgzfWriter(f) as writer:
+                    writer.write('line\n')
+                    raise ValueError('truncated input')
+        self.assertEqual(open(self.temp_path, 'rb').read(), bgzf.deflate_block('line\n'))
+        with open(self.temp_path, 'wb') as f:
+            with self.assertRaises(SystemExit):
+                with su.OutputStream(f, 'bgzf') as output_handle:
+                    output_handle.write('line\n')
+                    sys.exit(1)
+        self.assertEqual(open(self.temp_path, 'rb').read(), bgzf.deflate_block('line\n'))
+
+    def test_open_input(self):
+        expected = open(os.path.join(self.test_data_dir, 'file.txt')).readlines()
+        for name, kind in (('file.txt', file), ('file.txt.gz', gzip.GzipFile), ('file.txt.bgz', bgzf.BgzfReader)):
+            with su.open_input(os.path.join(self.test_data_dir, name)) as f:
+                self.assertIsInstance(f, kind)
+                self.assertEqual(list(f), expected)
+
+if __name__ == "__main__":
+    main()
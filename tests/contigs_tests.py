@@ -0,0 +1,45 @@
+from unittest import TestCase, main
+import os
+import random
+import tempfile
+import svtools.contigs as sc
+
+class Test_contigs(TestCase):
+    def test_version_key(self):
+        names = ['1', '2', '10', 'GL000192.1', 'GL000194.1', 'MT', 'X', 'chr1', 'chr1_random', 'chr2', 'chr10']
+        shuffled = list(names)
+        random.Random(1).shuffle(shuffled)
+        self.assertEqual(sorted(shuffled, key=sc.version_key), names)
+        self.assertTrue(sc.version_key('a~') < sc.version_key('a') < sc.version_key('a1'))
+        self.assertTrue(sc.version_key('') < sc.version_key('.') < sc.version_key('.a') < sc.version_key('a'))
+        # leading zeros don't count, the tie is left to the next key
+        self.assertEqual(sc.version_key('chr007'), sc.version_key('chr7'))
+
+    def test_read_contigs(self):
+        temp_descriptor, temp_path = tempfile.mkstemp()
+        os.close(temp_descriptor)
+        with open(temp_path, 'w') as f:
+            f.write('##fileformat=VCFv4.2\n##contig=<ID=2,length=243199373>\n##contig=<length=249250621,ID=1>\n')
+            f.write('#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n3\t100\t.\tN\t<DEL>\t.\t.\t.\n')
+        self.assertEqual(sc.read_contigs(temp_path), ['2', '1'])
+        with open(temp_path, 'w') as f:
+            f.write('chrX\t155270560\t6\t60\t61\nchr1\t249250621\t7\t60\t61\n')
+        self.assertEqual(sc.read_contigs(temp_path), ['chrX', 'chr1'])
+        os.remove(temp_path)
+
+    def test_dictionary(self):
+        contigs = sc.ContigDictionary.from_header(['##fileformat=VCFv4.2\n', '##contig=<ID=X,length=155270560>\n', '##contig=<ID=1,length=249250621>\n'])
+        self.assertEqual(len(contigs), 2)
+        self.assertEqual(contigs.id('X'), 0)
+        self.assertEqual(contigs.id('1'), 1)
+        # names missing from the header are added as they turn up
+        self.assertEqual(contigs.id('10'), 2)
+        self.assertEqual(contigs.id('2'), 3)
+        self.assertEqual(contigs.id('10'), 2)
+        self.assertEqual(contigs.name(3), '2')
+        self.assertTrue('10' in contigs)
+        # and sort after the header contigs in natural order
+        self.assertEqual(sorted(['10', '2', '1', 'X'], key=contigs.key), ['X', '1', '2', '10'])
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,25 @@ import time
 import sys
 import tempfile
 import difflib
+import shutil
+import gzip
+from StringIO import StringIO
 import svtools.copynumber
 
+# stands in for cnvnator -genotype, logging the regions it is asked for
+FAKE_CNVNATOR = '''#!{0}
+import sys
+root = sys.argv[2]
+log = open(root + '.regions', 'a')
+print 'Assuming male individual!'
+for line in sys.stdin:
+    region = line.strip()
+    if region == 'exit':
+        break
+    log.write(region + '\\n')
+    print 'Genotype %s %s %s 1.0' % (region, root, {{'1:10-20': '1.99', '1:30-40': '0.13', '1:50-60': '5.32', '1:70-80': '2.76'}}[region])
+'''
+
 class IntegrationTest_copynumber(TestCase):
     def run_integration_test(self):
         test_directory = os.path.dirname(os.path.abspath(__file__))
@@ -28,6 +45,80 @@ class IntegrationTest_copynumber(TestCase):
                 self.assertFalse(result)
         os.remove(temp_output_path)
 
+    def run_integration_test_cache_and_batch(self):
+        test_directory = os.path.dirname(os.path.abspath(__file__))
+        test_data_dir = os.path.join(test_directory, 'test_data', 'copynumber')
+        input = os.path.join(test_data_dir, 'input.vcf')
+        expected_lines = open(os.path.join(test_data_dir, 'expected.vcf')).readlines()
+        expected_lines[1] = '##fileDate=' + time.strftime('%Y%m%d') + '\n'
+        temp_dir = tempfile.mkdtemp()
+        cnvnator = os.path.join(temp_dir, 'cnvnator')
+        with open(cnvnator, 'w') as f:
+            f.write(FAKE_CNVNATOR.format(sys.executable))
+        os.chmod(cnvnator, 0755)
+        roots = []
+        for name in ('a.root', 'b.root'):
+            roots.append(os.path.join(temp_dir, name))
+            with open(roots[-1], 'w') as f:
+                f.write('histograms\n')
+        coordinates = ['1:10-20', '1:30-40', '1:50-60', '1:70-80']
+        cache_dir = os.path.join(temp_dir, 'cache')
+
+        cache = svtools.copynumber.CnvnatorCache(cache_dir)
+        self.assertEqual(svtools.copynumber.copynumbers(cnvnator, roots[0], 100, coordinates[:2], cache), [1.99, 0.13])
+        self.assertEqual(open(roots[0] + '.regions').read().split(), coordinates[:2])
+        output_handle = StringIO()
+        output_handle.close = lambda: None
+        svtools.copynumber.sv_readdepth(open(input), 'NA12878', roots[0], 100, output_handle, cnvnator, StringIO('\n'.join(coordinates)), cache)
+        # only the regions not cached are genotyped
+        self.assertEqual(open(roots[0] + '.regions').read().split(), coordinates)
+        self.assertEqual(output_handle.getvalue().splitlines(True), expected_lines)
+
+        # b.root has the same contents, so its copy numbers are all cached
+        outputs = [os.path.join(temp_dir, 'a.vcf'), os.path.join(temp_dir, 'b.vcf.gz')]
+        batch = [('NA12878', roots[0], outputs[0]), ('NA12878', roots[1], outputs[1])]
+        svtools.copynumber.run_batch(input, batch, 100, cnvnator, StringIO('\n'.join(coordinates)), cache_dir=cache_dir, threads=2)
+        self.assertFalse(os.path.exists(roots[1] + '.regions'))
+        self.assertEqual(open(outputs[0]).readlines(), expected_lines)
+        self.assertEqual(gzip.open(outputs[1]).readlines(), expected_lines)
+        shutil.rmtree(temp_dir)
+
+class Test_copynumber(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_read_coordinates(self):
+        regions = svtools.copynumber.read_coordinates(StringIO('1:1-10\n\n2:5-6\nexit\n3:1-2\n'))
+        self.assertEqual(regions, ['1:1-10', '2:5-6'])
+
+    def test_cache(self):
+        root = os.path.join(self.temp_dir, 'sample.root')
+        with open(root, 'w') as f:
+            f.write('histograms\n')
+        cache = svtools.copynumber.CnvnatorCache(os.path.join(self.temp_dir, 'cache'))
+        self.assertEqual(cache.load(root, 100), {})
+        cache.store(root, 100, [('1:1-10', '2.01'), ('1:20-30', '0.5')])
+        self.assertEqual(cache.load(root, 1000), {})
+        # a later run reads what was stored, but not a line cut short
+        with open(cache.path(root, 100), 'a') as f:
+            f.write('1:40-50\t1.')
+        cache = svtools.copynumber.CnvnatorCache(os.path.join(self.temp_dir, 'cache'))
+        self.assertEqual(cache.load(root, 100), {'1:1-10': '2.01', '1:20-30': '0.5'})
+        digest = cache.digest(root)
+        with open(root, 'w') as f:
+            f.write('other histograms\n')
+        os.utime(root, (0, 0))
+        self.assertNotEqual(cache.digest(root), digest)
+
+    def test_read_batch(self):
+        batch = svtools.copynumber.read_batch(StringIO('# sample\troot\tvcf\nA\ta.root\ta.vcf\n\nB\tb.root\tb.vcf.gz\n'))
+        self.assertEqual(batch, [['A', 'a.root', 'a.vcf'], ['B', 'b.root', 'b.vcf.gz']])
+        with self.assertRaises(SystemExit):
+            svtools.copynumber.read_batch(StringIO('A a.root a.vcf\n'))
+
 #class CopynumberUiTest(TestCase):
 #    def test_parser(self):
 #        pass
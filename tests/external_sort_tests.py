@@ -0,0 +1,41 @@
+from unittest import TestCase, main
+import os
+import random
+import tempfile
+from StringIO import StringIO
+import svtools.external_sort as es
+from svtools.contigs import ContigDictionary
+
+class Test_external_sort(TestCase):
+    def test_numeric_key(self):
+        self.assertEqual(es.numeric_key('100'), 100)
+        self.assertEqual(es.numeric_key('-5'), -5)
+        self.assertEqual(es.numeric_key('1.5'), 1.5)
+        self.assertEqual(es.numeric_key('12x'), 12)
+        self.assertEqual(es.numeric_key('abc'), 0)
+        self.assertEqual(es.numeric_key(''), 0)
+
+    def test_bedpe_key(self):
+        key = es.BedpeKey()
+        self.assertTrue(key('2\t10\t20\t10\t5\t6\tid') < key('10\t1\t2\t1\t1\t1\tid'))
+        self.assertTrue(key('1\t10\t20\t2\t5\t6\tid') < key('1\t10\t20\t10\t5\t6\tid'))
+
+    def test_contig_order(self):
+        key = es.VcfKey(ContigDictionary(['chr10', 'chr2']))
+        self.assertTrue(key('chr10\t5') < key('chr2\t1') < key('chr1\t1'))
+
+    def test_spill(self):
+        rng = random.Random(2)
+        lines = ['%s\t%d\t%d\n' % (rng.choice(['1', '2', '10', 'X']), rng.randint(1, 50), i) for i in range(2000)]
+        expected = sorted(lines, key=lambda l: (es.VcfKey()(l), l[:-1]))
+        tempdir = tempfile.mkdtemp()
+        for threads in (1, 2):
+            output = StringIO()
+            sorter = es.ExternalSort(es.VcfKey(), tempdir=tempdir, max_memory=10000, threads=threads, max_open=4)
+            sorter.sort(['#header\n'] + lines, output)
+            self.assertEqual(output.getvalue(), ''.join(['#header\n'] + expected))
+            self.assertEqual(os.listdir(tempdir), [])
+        os.rmdir(tempdir)
+
+if __name__ == "__main__":
+    main()
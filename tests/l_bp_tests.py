@@ -54,6 +54,21 @@ class Test_l_bp(TestCase):
         percent_and_fixed_slop = breakpoint(test_line, percent_slop = 0.2, fixed_slop = 2)
         self.assertEqual(percent_and_fixed_slop.p_l, [1e-100, 1e-100, 0.025, 0.25, 0.45, 0.25, 0.025, 1e-100, 1e-100])
         self.assertEqual(percent_and_fixed_slop.p_r, [1e-100, 1e-100, 0.025, 0.25, 0.45, 0.25, 0.025, 1e-100, 1e-100])
+        self.assertEqual(percent_and_fixed_slop.p_l_array().tolist(), percent_and_fixed_slop.p_l)
+        self.assertEqual(percent_and_fixed_slop.p_r_array().tolist(), percent_and_fixed_slop.p_r)
+
+    def test_breakpoint_overhang(self):
+        test_line = '1	2	2345_1	N	[2:1100[N	0.00	.	SVTYPE=BND;STRANDS=--:7;IMPRECISE;CIPOS=-2,2;CIEND=-2,2;CIPOS95=-1,1;CIEND95=-1,1;MATEID=2345_2;EVENT=2345;SU=7;PE=7;SR=0;PRPOS=0.025,0.25,0.45,0.25,0.025;PREND=0.025,0.25,0.45,0.25,0.025'
+        no_slop = breakpoint(test_line)
+        self.assertEqual(no_slop.start_l, 0)
+
+        # padding that falls before position 0 is chewed off
+        fixed_slop = breakpoint(test_line, fixed_slop = 3)
+        self.assertEqual(fixed_slop.start_l, 0)
+        self.assertEqual(fixed_slop.end_l, 7)
+        self.assertEqual(fixed_slop.p_l, [0.025, 0.25, 0.45, 0.25, 0.025, 1e-100, 1e-100, 1e-100])
+        self.assertEqual(fixed_slop.p_l_array().tolist(), fixed_slop.p_l)
+        self.assertEqual(fixed_slop.p_r_array().tolist(), fixed_slop.p_r)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,75 @@
+from unittest import TestCase, main
+from collections import namedtuple
+import heapq
+import random
+from svtools.l_sweep import largest_intersecting_sets, MaxTree, DepthTree
+
+BP = namedtuple('BP', ['start_l', 'end_l', 'start_r', 'end_r'])
+
+def quadratic_sweep(BP):
+    # the sweep lmerge.merge used before l_sweep
+    BP_i = range(len(BP))
+    C = []
+    while len(BP_i) > 0:
+        h_l = []
+        max_c = []
+        max_c_len = 0
+        for i in BP_i:
+            while (len(h_l) > 0) and (h_l[0][0] < BP[i].start_l):
+                heapq.heappop(h_l)
+            heapq.heappush(h_l, (BP[i].end_l, i))
+            h_r = []
+            h_l_i = [x[1] for x in h_l]
+            h_l_i.sort(key=lambda x:BP[x].start_r)
+            for j in h_l_i:
+                while (len(h_r) > 0) and (h_r[0][0] < BP[j].start_r):
+                    heapq.heappop(h_r)
+                heapq.heappush(h_r, (BP[j].end_r, j))
+                if max_c_len < len(h_r):
+                    max_c_len = len(h_r)
+                    max_c = [y[1] for y in h_r]
+        C.append(max_c)
+        for c in max_c:
+            BP_i.remove(c)
+    return C
+
+def random_breakpoints(n, span, width):
+    bps = []
+    for i in range(n):
+        start_l = random.randint(0, span)
+        start_r = random.randint(0, span)
+        bps.append(BP(start_l, start_l + random.randint(0, width),
+            start_r, start_r + random.randint(0, width)))
+    bps.sort(key=lambda x: x.start_l)
+    return bps
+
+class Test_l_sweep(TestCase):
+    def test_max_tree(self):
+        t = MaxTree([3, 1, 4, 1, 5], -1)
+        self.assertEqual(t.max(), 5)
+        self.assertEqual(t.leftmost_max(), 4)
+        t.update(4, 4)
+        self.assertEqual(t.leftmost_max(), 2)
+        self.assertEqual(t.at_least(4, 3), [0, 2])
+        self.assertEqual(t.at_least(2, 3), [0])
+
+    def test_depth_tree(self):
+        t = DepthTree(5)
+        t.add(0, 2, 1)
+        t.add(2, 4, 1)
+        self.assertEqual(t.max(), 2)
+        t.add(1, 2, -1)
+        self.assertEqual(t.max(), 1)
+
+    def test_empty(self):
+        self.assertEqual(largest_intersecting_sets([]), [])
+
+    def test_matches_quadratic_sweep(self):
+        random.seed(1)
+        for trial in range(200):
+            bps = random_breakpoints(random.randint(1, 60), random.choice([5, 20, 100]), random.choice([0, 3, 10, 30]))
+            self.assertEqual(largest_intersecting_sets(bps, snapshot_every=4), quadratic_sweep(bps))
+            self.assertEqual(largest_intersecting_sets(bps), quadratic_sweep(bps))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+from unittest import TestCase, main
+import os
+import sys
+import tempfile
+import time
+import difflib
+from StringIO import StringIO
+import numpy as np
+import svtools.lmerge
+import svtools.svb
+
+class IntegrationTest_lmerge(TestCase):
+    def run_lmerge(self, expected_name, input_name='input.vcf', **kwargs):
+        test_directory = os.path.dirname(os.path.abspath(__file__))
+        test_data_dir = os.path.join(test_directory, 'test_data', 'lmerge')
+        input = os.path.join(test_data_dir, input_name)
+        expected_result = os.path.join(test_data_dir, expected_name)
+        temp_descriptor, temp_output_path = tempfile.mkstemp(suffix='.vcf')
+        with os.fdopen(temp_descriptor, 'w') as output_handle:
+            stdout = sys.stdout
+            sys.stdout = output_handle
+            try:
+                svtools.lmerge.l_cluster_by_line(input, **kwargs)
+            finally:
+                sys.stdout = stdout
+        expected_lines = open(expected_result).readlines()
+        produced_lines = open(temp_output_path).readlines()
+        diff = difflib.unified_diff(produced_lines, expected_lines, fromfile=temp_output_path, tofile=expected_result)
+        result = ''.join(diff)
+        if result != '':
+            for line in result:
+                sys.stdout.write(line)
+            self.assertFalse(result)
+        os.remove(temp_output_path)
+
+    def run_integration_test_sum(self):
+        self.run_lmerge('expected.vcf', fixed_slop=20)
+
+    def run_integration_test_product(self):
+        self.run_lmerge('expected.product.vcf', percent_slop=0.05, fixed_slop=10, use_product=True)
+
+    def run_integration_test_bgzf(self):
+        self.run_lmerge('expected.vcf', input_name='input.vcf.gz', fixed_slop=20)
+
+    def run_integration_test_bnd_partners(self):
+        self.run_lmerge('expected.bnd_partners.vcf', input_name='input.bnd_partners.vcf', fixed_slop=20)
+
+    def run_integration_test_svb(self):
+        test_directory = os.path.dirname(os.path.abspath(__file__))
+        test_data_dir = os.path.join(test_directory, 'test_data', 'lmerge')
+        temp_descriptor, temp_input_path = tempfile.mkstemp(suffix='.svb')
+        with os.fdopen(temp_descriptor, 'wb') as input_handle:
+            svtools.svb.to_svb(open(os.path.join(test_data_dir, 'input.vcf')), input_handle)
+        output = StringIO()
+        writer = svtools.svb.LineWriter(output)
+        svtools.lmerge.l_cluster_by_line(temp_input_path, fixed_slop=20, output_handle=writer)
+        writer.close()
+        os.remove(temp_input_path)
+        produced = StringIO()
+        svtools.svb.to_text(svtools.svb.Reader(StringIO(output.getvalue())), produced)
+        self.assertEqual(produced.getvalue(), open(os.path.join(test_data_dir, 'expected.vcf')).read())
+
+    def run_integration_test_threads(self):
+        self.run_lmerge('expected.vcf', fixed_slop=20, threads=2, batch_size=5)
+        self.run_lmerge('expected.product.vcf', percent_slop=0.05, fixed_slop=10, use_product=True, threads=3, batch_size=1)
+
+    def run_integration_test_threads_error(self):
+        # a record without PRPOS in the third batch fails in its worker. The
+        # slow writer lets the batches after it be read ahead up to the limit,
+        # and the pool has to stop rather than wait on them forever
+        test_directory = os.path.dirname(os.path.abspath(__file__))
+        input = os.path.join(test_directory, 'test_data', 'lmerge', 'input.vcf')
+        temp_descriptor, temp_input_path = tempfile.mkstemp(suffix='.vcf')
+        with os.fdopen(temp_descriptor, 'w') as input_handle:
+            record = 0
+            for line in open(input):
+                if not line.startswith('#'):
+                    record += 1
+                    if record == 14:
+                        line = line.replace('PRPOS=', 'XPRPOS=')
+                input_handle.write(line)
+        class SlowOutput(StringIO):
+            def write(self, text):
+                if not text.startswith('#'):
+                    time.sleep(0.02)
+                StringIO.write(self, text)
+        with self.assertRaises(KeyError):
+            svtools.lmerge.l_cluster_by_line(temp_input_path, fixed_slop=20, threads=2, batch_size=1, output_handle=SlowOutput())
+        os.remove(temp_input_path)
+
+class Test_lmerge(TestCase):
+    def test_shard_records(self):
+        records = ['1\t10\t1\tN\t<DEL>\t.\t.\tSVTYPE=DEL\n',
+                '1\t20\t2\tN\t<DEL>\t.\t.\tSVTYPE=DEL\n',
+                '1\t30\t3\tN\t<DUP>\t.\t.\tSVTYPE=DUP\n',
+                '2\t10\t4\tN\t<DUP>\t.\t.\tSVTYPE=DUP\n']
+        self.assertEqual(list(svtools.lmerge.shard_records(records, 1)),
+                [records[:2], records[2:3], records[3:]])
+        self.assertEqual(list(svtools.lmerge.shard_records(records, 3)),
+                [records[:3], records[3:]])
+
+    def test_trim_pdf(self):
+        clip_start, p = svtools.lmerge.trim_pdf(np.array([0.0, 0.0, 1.0, 2.0, 1.0, 0.0]))
+        self.assertEqual(clip_start, 2)
+        self.assertEqual(p.tolist(), [0.25, 0.5, 0.25])
+
+    def test_ci95(self):
+        p = np.array([0.01, 0.02, 0.9, 0.05, 0.02])
+        self.assertEqual(svtools.lmerge.ci95(p, 2), '-1,1')
+        self.assertEqual(svtools.lmerge.ci95(np.array([0.5, 0.5]), 0), '0,1')
+        self.assertEqual(svtools.lmerge.ci95(np.array([1.0]), 0), '0,0')
+        p = np.array([0.025, 0.025, 0.4375, 0.5, 0.0125])
+        self.assertEqual(svtools.lmerge.ci95(p, 3), '-1,1')
+        # each window is summed left to right. Its sum falls short of 0.95
+        # here, though the difference of the cumulative sums reaches it
+        clip_start, p = svtools.lmerge.trim_pdf(np.array([0.05, 0.2, 0.2, 0.4, 0.05, 0.1]))
+        self.assertEqual(svtools.lmerge.ci95(p, 3), '-3,2')
+
+    def test_combine_pdfs_sum(self):
+        a_L = np.array([[0.5, 0.5, 0.0], [0.0, 0.5, 0.5]])
+        a_R = np.array([[1.0, 0.0], [0.0, 1.0]])
+        ALG, p_L, p_R = svtools.lmerge.combine_pdfs(a_L, a_R, False)
+        self.assertEqual(ALG, 'SUM')
+        self.assertEqual(p_L.tolist(), [0.25, 0.5, 0.25])
+        self.assertEqual(p_R.tolist(), [0.5, 0.5])
+
+    def test_combine_pdfs_product(self):
+        a_L = np.array([[0.5, 0.5, 0.0], [0.0, 0.5, 0.5]])
+        a_R = np.array([[0.5, 0.5], [0.5, 0.5]])
+        ALG, p_L, p_R = svtools.lmerge.combine_pdfs(a_L, a_R, True)
+        self.assertEqual(ALG, 'PROD')
+        self.assertEqual(p_L.tolist(), [0.0, 1.0, 0.0])
+
+        # fall back to the sum if a breakpoint doesn't support the peak
+        a_R = np.array([[1.0, 0.0], [0.0, 1.0]])
+        ALG, p_L, p_R = svtools.lmerge.combine_pdfs(a_L, a_R, True)
+        self.assertEqual(ALG, 'SUM')
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
 from unittest import TestCase, main
 from tempfile import gettempdir
+import os
+import sys
+import tempfile
+import difflib
 import svtools.lsort as lsort
 
 class Test_lsort(TestCase):
@@ -9,12 +13,16 @@ class Test_lsort(TestCase):
         args = parser.parse_args('file1 file2 file3'.split())
         self.assertEqual(args.vcf_files, ['file1', 'file2', 'file3'])
         self.assertEqual(args.batchsize, 200)
+        self.assertEqual(args.max_memory, 1024**3)
         self.assertEqual(args.tempdir, gettempdir())
 
         args2 = parser.parse_args('-b 2 -t temp file1 file2'.split())
         self.assertEqual(args2.batchsize, 2)
         self.assertEqual(args2.tempdir, 'temp')
         self.assertEqual(args2.vcf_files, ['file1', 'file2'])
+
+        args3 = parser.parse_args('-m 1000 file1'.split())
+        self.assertEqual(args3.max_memory, 1000)
     
     def test_lsort_init_defaults(self):
         file_list = ['file1', 'file2']
@@ -30,5 +38,65 @@ class Test_lsort(TestCase):
         self.assertEqual(lsort_class.batchsize, 5)
         self.assertEqual(lsort_class.tempdir, 'tempydir')
 
+    def test_merge_ties(self):
+        run1 = [lsort.Keyed((1,), 'a'), lsort.Keyed((2,), 'z')]
+        run2 = [lsort.Keyed((2,), 'b'), lsort.Keyed((3,), 'c')]
+        self.assertEqual([r.obj for r in lsort.merge(run1, run2)], ['a', 'z', 'b', 'c'])
+        self.assertEqual([r.obj for r in lsort.merge(run2, run1)], ['a', 'b', 'z', 'c'])
+
+    def test_temp_run(self):
+        temp_descriptor, temp_path = tempfile.mkstemp()
+        os.close(temp_descriptor)
+        records = [lsort.Keyed(('DEL', '1', '1', '+-', 10, 20, 100, 110), 'line1\n'),
+                lsort.Keyed(('DEL', '1', '1', '+-', 15, 20, 100, 110), 'line2\n')]
+        run = lsort.TempRun(temp_path, records)
+        self.assertEqual(list(run), records)
+        self.assertEqual(list(run), records)
+        run.remove()
+        self.assertFalse(os.path.exists(temp_path))
+
+class IntegrationTest_lsort(TestCase):
+    def run_lsort(self, input_names=('NA12878.vcf', 'NA12891.sorted.vcf', 'NA12892.vcf'), **kwargs):
+        test_directory = os.path.dirname(os.path.abspath(__file__))
+        test_data_dir = os.path.join(test_directory, 'test_data', 'lsort')
+        inputs = [os.path.join(test_data_dir, f) for f in input_names]
+        expected_result = os.path.join(test_data_dir, 'expected.vcf')
+        temp_dir = tempfile.mkdtemp()
+        temp_descriptor, temp_output_path = tempfile.mkstemp(suffix='.vcf')
+        with os.fdopen(temp_descriptor, 'w') as output_handle:
+            stdout = sys.stdout
+            sys.stdout = output_handle
+            try:
+                lsort.Lsort(inputs, tempdir=temp_dir, **kwargs).execute()
+            finally:
+                sys.stdout = stdout
+        self.assertEqual(os.listdir(temp_dir), [])
+        os.rmdir(temp_dir)
+        expected_lines = open(expected_result).readlines()
+        produced_lines = open(temp_output_path).readlines()
+        diff = difflib.unified_diff(produced_lines, expected_lines, fromfile=temp_output_path, tofile=expected_result)
+        result = ''.join(diff)
+        if result != '':
+            for line in result:
+                sys.stdout.write(line)
+            self.assertFalse(result)
+        os.remove(temp_output_path)
+
+    def run_integration_test_in_memory(self):
+        self.run_lsort()
+
+    def run_integration_test_max_memory(self):
+        self.run_lsort(max_memory=2000)
+
+    def run_integration_test_max_open(self):
+        self.run_lsort(max_memory=2000, max_open=2)
+
+    def run_integration_test_batchsize(self):
+        self.run_lsort(batchsize=0)
+
+    def run_integration_test_compressed(self):
+        # NA12878.vcf.gz is gzipped, NA12892.vcf.gz is BGZF
+        self.run_lsort(input_names=('NA12878.vcf.gz', 'NA12891.sorted.vcf', 'NA12892.vcf.gz'), max_memory=2000)
+
 if __name__ == "__main__":
     main()
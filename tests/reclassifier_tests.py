@@ -93,8 +93,20 @@ class IntegrationTest_sv_classify(TestCase):
         os.remove(temp_output_path)
         os.remove(diags_file)
 
-
+class Test_annotation_intersect(TestCase):
+    class Var(object):
+        def __init__(self, pos, end):
+            self.chrom = '1'
+            self.pos = pos
+            self.info = {'END': str(end)}
+
+    def test_annotations_unchanged(self):
+        ae_dict = {'1': [[100, 1000, 'LINE'], [960, 2000, 'LINE']]}
+        self.assertEqual(svtools.sv_classifier.annotation_intersect(self.Var(100, 2000), ae_dict, 0.9), 'LINE')
+        # merging the two features for the first variant must not stretch
+        # the first one for the next
+        self.assertEqual(ae_dict['1'], [[100, 1000, 'LINE'], [960, 2000, 'LINE']])
+        self.assertEqual(svtools.sv_classifier.annotation_intersect(self.Var(100, 950), ae_dict, 0.9), 'LINE')
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,47 @@
+from unittest import TestCase, main
+import sys
+from StringIO import StringIO
+from svtools.record_pipeline import RecordPipeline, blocks, map_in_order
+
+def double(line):
+    return line.rstrip() + '\t' + str(2 * int(line.split('\t')[0])) + '\n'
+
+def fail_on_13(line):
+    if line.startswith('13\t'):
+        sys.exit(3)
+    return line
+
+class Test_record_pipeline(TestCase):
+    def setUp(self):
+        self.lines = ['%d\tx\n' % i for i in range(500)]
+
+    def test_blocks(self):
+        grouped = list(blocks(self.lines[:10], 12))
+        self.assertEqual([len(b) for b in grouped], [3, 3, 3, 1])
+        self.assertEqual(sum(grouped, []), self.lines[:10])
+
+    def test_order(self):
+        expected = ''.join([double(l) for l in self.lines])
+        for threads in (1, 3):
+            output = StringIO()
+            RecordPipeline(double, threads, block_bytes=64).run(iter(self.lines), output)
+            self.assertEqual(output.getvalue(), expected)
+
+    def test_exit(self):
+        for threads in (1, 2):
+            with self.assertRaises(SystemExit) as cm:
+                RecordPipeline(fail_on_13, threads, block_bytes=64).run(iter(self.lines), StringIO())
+            self.assertEqual(cm.exception.code, 3)
+
+    def test_map_in_order_consume_error(self):
+        results = []
+        def consume(block):
+            if len(results) == 2:
+                raise IOError('write failed')
+            results.append(block)
+        with self.assertRaises(IOError):
+            map_in_order(len, blocks(self.lines, 16), 2, consume)
+        self.assertEqual(results, [4, 4])
+
+if __name__ == "__main__":
+    main()
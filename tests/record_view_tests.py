@@ -0,0 +1,54 @@
+from unittest import TestCase, main
+import os
+import tempfile
+from svtools.record_view import RecordView, MappedFile, open_records, split_columns, views
+
+class Test_record_view(TestCase):
+    def test_fields(self):
+        line = 'a\tbb\t\tdddd\tee  \n'
+        view = RecordView.from_line(line)
+        expected = line.rstrip().split('\t')
+        self.assertEqual([view[i] for i in range(len(expected))], expected)
+        self.assertEqual(len(view), len(expected))
+        self.assertEqual(view[-1], 'ee')
+        self.assertEqual(view[1:3], ['bb', ''])
+        self.assertEqual(view[3:], ['dddd', 'ee'])
+        self.assertEqual(list(view), expected)
+        with self.assertRaises(IndexError):
+            view[5]
+        with self.assertRaises(IndexError):
+            view[-6]
+        self.assertEqual(view.tail(2), '\tdddd\tee')
+        self.assertEqual(view.tail(5), None)
+        self.assertEqual(str(view), line.rstrip())
+        self.assertEqual(view.line(), line)
+        self.assertTrue(view.startswith('a\tb'))
+
+    def test_split_columns(self):
+        fields = ['1', '2', '3', '4']
+        self.assertEqual(split_columns(fields, 2), (fields, '3\t4'))
+        self.assertEqual(split_columns(fields, 4), (fields, None))
+        view = RecordView.from_line('\t'.join(fields))
+        head, tail = split_columns(view, 2)
+        self.assertEqual(head[:2], ['1', '2'])
+        self.assertEqual(tail, '3\t4')
+        self.assertEqual(split_columns(view, 4)[1], None)
+
+    def test_mapped_file(self):
+        lines = ['#header\n', '1\t2\t3\n', '\n', '4\t5\t6']
+        descriptor, path = tempfile.mkstemp()
+        with os.fdopen(descriptor, 'w') as f:
+            f.write(''.join(lines))
+        with open_records(path) as records:
+            self.assertTrue(isinstance(records, MappedFile))
+            read = list(views(records))
+            self.assertEqual([r.line() for r in read], lines)
+            self.assertEqual([r[1] for r in read[1::2]], ['2', '5'])
+            self.assertEqual(str(read[2]), '')
+        open(path, 'w').close()
+        with open_records(path) as records:
+            self.assertEqual(list(records), [])
+        os.remove(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+from unittest import TestCase, main
+import os
+import sys
+from StringIO import StringIO
+import numpy as np
+import svtools.svb as svb
+from svtools.vcf.file import Vcf
+from svtools.vcf.variant import Variant
+from svtools.vcf.genotype_matrix import GenotypeMatrix
+from svtools.bedpe import Bedpe
+
+class Test_svb(TestCase):
+    def setUp(self):
+        test_directory = os.path.dirname(os.path.abspath(__file__))
+        self.vcf_path = os.path.join(test_directory, 'test_data', 'afreq', 'input.vcf')
+        self.bedpe_path = os.path.join(test_directory, 'test_data', 'prune', 'input.bed')
+        self.sites_path = os.path.join(test_directory, 'test_data', 'lmerge', 'expected.vcf')
+        self.vcf = Vcf()
+        self.vcf.add_header([
+            '##fileformat=VCFv4.2',
+            '##INFO=<ID=SVTYPE,Number=1,Type=String,Description="Type of structural variant">',
+            '##INFO=<ID=SU,Number=.,Type=Integer,Description="Number of pieces of evidence supporting the variant">',
+            '##INFO=<ID=IMPRECISE,Number=0,Type=Flag,Description="Imprecise structural variation">',
+            '##INFO=<ID=PRPOS,Number=.,Type=String,Description="Breakpoint probability dist">',
+            '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">',
+            '##FORMAT=<ID=SU,Number=1,Type=Integer,Description="Number of pieces of evidence supporting the variant">',
+            '##FORMAT=<ID=SQ,Number=1,Type=Float,Description="Phred-scaled probability that this site is variant">',
+            '##FORMAT=<ID=CN,Number=1,Type=String,Description="Copy number">',
+            '#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tA\tB\tC'])
+        self.line = '1\t100\t1\tN\t<DEL>\t.\t.\tSVTYPE=DEL;SU=4;IMPRECISE;PRPOS=0.25,5e-05,0.7499\tGT:SU:SQ:CN\t0/1:3:10.50:x\t./.:.:.:y\t1|1:1:3.00:z\n'
+
+    def round_trip(self, path):
+        text = StringIO()
+        encoded = StringIO()
+        svb.to_svb(open(path), encoded)
+        svb.to_text(svb.Reader(StringIO(encoded.getvalue())), text)
+        self.assertEqual(text.getvalue(), open(path).read())
+
+    def test_vcf_round_trip(self):
+        self.round_trip(self.vcf_path)
+        self.assertEqual(svb.decode_vcf_line(svb.encode_vcf_line(self.line, self.vcf)), self.line)
+
+    def test_bedpe_round_trip(self):
+        self.round_trip(self.bedpe_path)
+
+    def test_sites_only(self):
+        self.round_trip(self.sites_path)
+        line = '\t'.join(self.line.split('\t')[:8]) + '\n'
+        self.assertEqual(svb.decode_vcf_line(svb.encode_vcf_line(line, self.vcf)), line)
+        with self.assertRaises(ValueError):
+            svb.encode_vcf_line('1\t100\t1\tN\t<DEL>\t.\t.\n', self.vcf)
+
+    def test_line_writer(self):
+        text = open(self.sites_path).read()
+        encoded = StringIO()
+        svb.to_svb(open(self.sites_path), encoded)
+        written = StringIO()
+        writer = svb.LineWriter(written)
+        for i in xrange(0, len(text), 7):
+            writer.write(text[i:i + 7])
+        writer.close()
+        self.assertEqual(written.getvalue(), encoded.getvalue())
+        with self.assertRaises(ValueError):
+            svb.LineWriter(StringIO()).close()
+
+    def test_open_input_stdin(self):
+        encoded = StringIO()
+        svb.to_svb(open(self.vcf_path), encoded)
+        stdin = sys.stdin
+        try:
+            sys.stdin = StringIO(encoded.getvalue())
+            reader = svb.open_input(None)
+            self.assertIsInstance(reader, svb.Reader)
+            self.assertEqual(''.join(reader.lines()), open(self.vcf_path).read())
+            sys.stdin = StringIO(open(self.vcf_path).read())
+            self.assertEqual(''.join(svb.open_input('-')), open(self.vcf_path).read())
+            sys.stdin = StringIO('#\n')
+            self.assertEqual(list(svb.open_input('-')), ['#\n'])
+        finally:
+            sys.stdin = stdin
+
+    def test_packed_info(self):
+        var = svb.decode_variant(svb.encode_vcf_line(self.line, self.vcf), self.vcf)
+        self.assertIsInstance(var.info, svb.PackedInfo)
+        self.assertEqual(var.get_info('SU'), '4')
+        self.assertEqual(var.get_info('PRPOS'), '0.25,5e-05,0.7499')
+        self.assertTrue(var.get_info('IMPRECISE'))
+        self.assertNotIn('END', var.info)
+        var.set_info('SU', '5')
+        self.assertEqual(var.get_info('SU'), '5')
+        self.assertEqual(var.get_var_string().split('\t')[7], 'SVTYPE=DEL;SU=5;IMPRECISE;PRPOS=0.25,5e-05,0.7499')
+
+    def test_packed_genotypes(self):
+        fields = self.line.rstrip('\n').split('\t')
+        var = svb.decode_variant(svb.encode_vcf_line(self.line, self.vcf), self.vcf)
+        matrix = var.genotype_matrix()
+        self.assertIsInstance(matrix, svb.PackedGenotypeMatrix)
+        expected = GenotypeMatrix.from_string('\t'.join(fields[9:]), dict((f, i) for i, f in enumerate(fields[8].split(':'))))
+        self.assertEqual(matrix.gt().tolist(), expected.gt().tolist())
+        for field in ('SU', 'SQ'):
+            np.testing.assert_array_equal(matrix.values(field), expected.values(field))
+        self.assertEqual(matrix.strings('CN').tolist(), ['x', 'y', 'z'])
+        self.assertEqual(var.get_var_string(), self.line.rstrip('\n'))
+
+    def test_unchanged_variant(self):
+        record = svb.encode_vcf_line(self.line, self.vcf)
+        var = svb.decode_variant(record, self.vcf)
+        self.assertEqual(svb.encode_variant(var, self.vcf), record)
+        var = Variant(self.line.rstrip('\n').split('\t'), self.vcf)
+        self.assertEqual(svb.encode_variant(var, self.vcf), record)
+
+    def test_bedpe(self):
+        line = [l for l in open(self.bedpe_path) if not l.startswith('#')][0]
+        bedpe = svb.decode_bedpe(svb.encode_bedpe_line(line))
+        self.assertIsInstance(bedpe, Bedpe)
+        self.assertEqual(str(bedpe), str(Bedpe(line.rstrip('\n').split('\t'))))
+
+    def test_reader(self):
+        encoded = StringIO()
+        svb.to_svb(open(self.vcf_path), encoded)
+        with svb.Reader(StringIO(encoded.getvalue())) as reader:
+            self.assertEqual(reader.kind, svb.KIND_VCF)
+            self.assertEqual(reader.header, ''.join(l for l in open(self.vcf_path) if l.startswith('#')))
+            variants = list(reader)
+        lines = [l.rstrip('\n') for l in open(self.vcf_path) if not l.startswith('#')]
+        self.assertEqual([v.get_var_string() for v in variants], lines)
+        with self.assertRaises(IOError):
+            list(svb.Reader(StringIO(encoded.getvalue()[:-1])).records())
+        with self.assertRaises(IOError):
+            svb.Reader(StringIO('##fileformat=VCFv4.2\n'))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+from unittest import TestCase, main
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import difflib
+import svtools.bgzf as bgzf
+import svtools.tabix as tabix
+import svtools.varlookup
+import svtools.vcfsort
+
+def write_bgzf(path, text, block_size=300):
+    with open(path, 'wb') as f:
+        for i in xrange(0, len(text), block_size):
+            f.write(bgzf.deflate_block(text[i:i + block_size]))
+        f.write(bgzf.BGZF_EOF)
+
+class Test_tabix(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        random.seed(1)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def make_bed(self):
+        lines = ['#chrom\tstart\tend\tname\n']
+        for chrom in ('1', '2', 'X'):
+            start = 0
+            for i in xrange(400):
+                start += random.randint(0, 3000)
+                end = start + random.choice([1, 50, 1000, 20000, 200000])
+                lines.append('%s\t%d\t%d\tf%d\n' % (chrom, start, end, len(lines)))
+        path = os.path.join(self.temp_dir, 'features.bed.gz')
+        write_bgzf(path, ''.join(lines))
+        return path, lines
+
+    def test_parse_region(self):
+        self.assertEqual(tabix.parse_region('1'), ('1', None, None))
+        self.assertEqual(tabix.parse_region('chr1:1,001-2,000'), ('chr1', 1000, 2000))
+        self.assertEqual(tabix.parse_region('HLA-A*01:01:1-10'), ('HLA-A*01:01', 0, 10))
+        self.assertEqual(tabix.parse_region('1:500'), ('1', 499, None))
+
+    def test_fetch(self):
+        path, lines = self.make_bed()
+        tabix.build_index(path, 'bed')
+        with tabix.Reader(path) as reader:
+            self.assertEqual(reader.header(), lines[:1])
+            self.assertEqual(list(reader.fetch('Y', 0, 100)), [])
+            self.assertEqual(list(reader.fetch('1', 100, 100)), [])
+            self.assertEqual(list(reader.fetch('2')), [l for l in lines[1:] if l.startswith('2\t')])
+            for _ in xrange(200):
+                chrom = random.choice(['1', '2', 'X'])
+                start = random.randint(0, 700000)
+                end = start + random.randint(1, 50000)
+                expected = [l for l in lines[1:] if l.split('\t')[0] == chrom
+                        and int(l.split('\t')[1]) < end and int(l.split('\t')[2]) > start]
+                self.assertEqual(list(reader.fetch(chrom, start, end)), expected)
+
+    def test_unsorted(self):
+        path = os.path.join(self.temp_dir, 'unsorted.bed.gz')
+        write_bgzf(path, '1\t500\t600\ta\n1\t100\t200\tb\n')
+        with self.assertRaises(ValueError):
+            tabix.build_index(path, 'bed')
+        write_bgzf(path, '1\t100\t200\ta\n2\t100\t200\tb\n1\t300\t400\tc\n')
+        with self.assertRaises(ValueError):
+            tabix.build_index(path, 'bed')
+
+    def test_vcf_region(self):
+        header = ['##fileformat=VCFv4.2\n', '#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n']
+        records = ['1\t100\ta\tN\t<DEL>\t.\t.\tSVTYPE=DEL;END=5000\n',
+                '1\t1000\tb\tN\t<DEL>\t.\t.\tSVTYPE=DEL;END=1200\n',
+                '1\t3000\tc\tN\t<BND>\t.\t.\tSVTYPE=BND\n',
+                '2\t10\td\tN\t<DEL>\t.\t.\tSVTYPE=DEL;END=20\n']
+        path = os.path.join(self.temp_dir, 'calls.vcf.gz')
+        write_bgzf(path, ''.join(header + records), 50)
+
+        class Args(object):
+            input = path
+            preset = None
+        tabix.run_from_args(Args())
+        with tabix.open_region(path, '1:1100-2000') as stream:
+            self.assertEqual(list(stream), header + records[:2])
+        with tabix.open_region(path, '1:3000') as stream:
+            self.assertEqual(list(stream), header + records[:1] + records[2:3])
+
+class IntegrationTest_tabix(TestCase):
+    def run_integration_test_sorted_output(self):
+        test_directory = os.path.dirname(os.path.abspath(__file__))
+        input = os.path.join(test_directory, 'test_data', 'vcfsort', 'input.vcf')
+        temp_dir = tempfile.mkdtemp()
+        output = os.path.join(temp_dir, 'output.vcf.gz')
+
+        class Args(object):
+            pass
+        args = Args()
+        args.input = input
+        args.output = output
+        args.output_format = 'bgzf'
+        svtools.vcfsort.run_from_args(args)
+        args.input = output
+        args.preset = None
+        tabix.run_from_args(args)
+        records = [l for l in open(input) if not l.startswith('#')]
+        with tabix.Reader(output) as reader:
+            for chrom in set(l.split('\t')[0] for l in records):
+                self.assertEqual(sorted(reader.fetch(chrom)), sorted(l for l in records if l.split('\t')[0] == chrom))
+        shutil.rmtree(temp_dir)
+
+    def run_integration_test_varlookup(self):
+        test_directory = os.path.dirname(os.path.abspath(__file__))
+        test_data_dir = os.path.join(test_directory, 'test_data', 'varlookup')
+        input_a = os.path.join(test_data_dir, 'input_a.bed')
+        expected_result = os.path.join(test_data_dir, 'expected.bed')
+        temp_dir = tempfile.mkdtemp()
+        # the B file sorted, compressed and indexed under its original name
+        lines = open(os.path.join(test_data_dir, 'input_b.bed')).readlines()
+        header = [l for l in lines if l.startswith('#')]
+        records = [l for l in lines if not l.startswith('#')]
+        chroms = []
+        for l in records:
+            if l.split('\t')[0] not in chroms:
+                chroms.append(l.split('\t')[0])
+        records.sort(key=lambda l: (chroms.index(l.split('\t')[0]), int(l.split('\t')[1])))
+        input_b = os.path.join(temp_dir, 'input_b.bed')
+        write_bgzf(input_b, ''.join(header + records), 0xff00)
+        tabix.build_index(input_b, 'bedpe')
+        temp_output_path = os.path.join(temp_dir, 'output.bed')
+        with open(temp_output_path, 'w') as output_handle:
+            svtools.varlookup.varLookup(input_a, input_b, output_handle, 50, '#', 'TEST')
+        expected_lines = open(expected_result).readlines()
+        # set timestamp for diff
+        expected_lines[1] = '##fileDate=' + time.strftime('%Y%m%d') + '\n'
+        produced_lines = open(temp_output_path).readlines()
+        diff = difflib.unified_diff(produced_lines, expected_lines, fromfile=temp_output_path, tofile=expected_result)
+        result = ''.join(diff)
+        if result != '':
+            for line in result:
+                sys.stdout.write(line)
+            self.assertFalse(result)
+        shutil.rmtree(temp_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+#!/usr/bin/bash
+
+# input.vcf is svtools lsort output for three small synthetic LUMPY VCFs
+# (DEL, DUP, INV and BND calls, including a same-chromosome BND that lsort
+# converts to an INV)
+svtools lsort NA12878.vcf NA12891.vcf NA12892.vcf > input.vcf
+bgzip -c input.vcf > input.vcf.gz
+svtools lmerge -i input.vcf -f 20 > expected.vcf
+svtools lmerge -i input.vcf --product -p 0.05 -f 10 > expected.product.vcf
+
+# input.bnd_partners.vcf holds BNDs from three samples on chr19 whose
+# partners alternate between chr2 and chr10, so that clusters are split
+# and numbered by their right side
+svtools lmerge -i input.bnd_partners.vcf -f 20 > expected.bnd_partners.vcf
@@ -0,0 +1,9 @@
+#!/usr/bin/bash
+
+# Three small synthetic LUMPY VCFs. NA12891.sorted.vcf has its records
+# already in lsort order so it is streamed rather than sorted in memory.
+svtools lsort NA12878.vcf NA12891.sorted.vcf NA12892.vcf > expected.vcf
+
+# compressed copies of the inputs, one gzip and one BGZF
+gzip -c NA12878.vcf > NA12878.vcf.gz
+bgzip -c NA12892.vcf > NA12892.vcf.gz
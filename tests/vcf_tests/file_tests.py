@@ -113,6 +113,26 @@ class TestVcf(TestCase):
         expected_lines2[1] = '##fileDate=' + time.strftime('%Y%m%d')
         self.assertEqual(v2.get_header(), '\n'.join(expected_lines2))
 
+    def test_ids(self):
+        v = Vcf()
+        v.add_info('DP', 1, 'Integer', 'Total Depth')
+        v.add_info('AF', 'A', 'Float', 'Allele Frequency')
+        v.add_info_after('DP', 'DB', 0, 'Flag', 'dbSNP membership, build 129')
+        v.add_info('DP', 1, 'Integer', 'Total Depth')
+        v.add_filter('q10', 'Quality below 10')
+        v.add_alt('DEL', 'Deletion')
+        self.assertEqual([i.id for i in v.info_list], ['DP', 'DB', 'AF'])
+        self.assertEqual(v.info_order, {'DP': 0, 'DB': 1, 'AF': 2})
+        self.assertEqual(v.info_ids['DB'].type, 'Flag')
+        self.assertEqual(v.format_ids.keys(), ['GT'])
+        self.assertEqual(v.filter_ids['q10'].desc, 'Quality below 10')
+        self.assertEqual(v.alt_ids['DEL'].desc, 'Deletion')
+        v.add_sample('A')
+        v.add_sample('B')
+        v.add_sample('A')
+        self.assertEqual(v.sample_to_col('A'), 9)
+        self.assertEqual(v.sample_to_col('B'), 10)
+
     def test_parse_meta(self):
         line = '##FILTER=<ID=MSQ_20,Description="Variant without read-depth support with MSQ > 20">'
         expected_fields = ['ID=MSQ_20', 'Description="Variant without read-depth support with MSQ > 20"']
@@ -0,0 +1,57 @@
+from unittest import TestCase, main
+import numpy as np
+from svtools.vcf.file import Vcf
+from svtools.vcf.variant import Variant
+from svtools.vcf.genotype_matrix import GenotypeMatrix
+
+class TestGenotypeMatrix(TestCase):
+    def setUp(self):
+        header_lines = [
+                '##fileformat=VCFv4.2',
+                '##INFO=<ID=SVTYPE,Number=1,Type=String,Description="Type of structural variant">',
+                '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">',
+                '##FORMAT=<ID=CN,Number=1,Type=Float,Description="Copy number">',
+                '##FORMAT=<ID=SU,Number=1,Type=Integer,Description="Number of pieces of evidence supporting the variant">',
+                '##FORMAT=<ID=FT,Number=1,Type=String,Description="Sample filter">',
+                '#CHROM	POS	ID	REF	ALT	QUAL	FILTER	INFO	FORMAT	S1	S2	S3	S4' ]
+        self.vcf = Vcf()
+        self.vcf.add_header(header_lines)
+
+    def variant(self, format_string, samples):
+        line = '1\t100\t1\tN\t<DEL>\t.\t.\tSVTYPE=DEL\t' + format_string + '\t' + '\t'.join(samples)
+        return Variant(line.split('\t'), self.vcf)
+
+    def test_columns(self):
+        m = self.variant('GT:CN:SU:FT', ['0/0:2.1:0:PASS', '0/1:1.02:5:LowQual', './.:.:.:.', '1|1:0:12:PASS']).genotype_matrix()
+        self.assertEqual(m.num_samples, 4)
+        self.assertEqual(m.strings('GT').tolist(), ['0/0', '0/1', './.', '1|1'])
+        np.testing.assert_array_equal(m.gt(), np.array([[0, 0], [0, 1], [-1, -1], [1, 1]], dtype=np.int8))
+        self.assertEqual(m.gt().dtype, np.int8)
+        cn = m['CN']
+        self.assertEqual(cn.dtype, np.float32)
+        np.testing.assert_array_equal(cn[[0, 1, 3]], np.array([2.1, 1.02, 0], dtype=np.float32))
+        self.assertTrue(np.isnan(cn[2]))
+        self.assertEqual(m['SU'][3], 12)
+        self.assertEqual(m['FT'].tolist(), ['PASS', 'LowQual', '.', 'PASS'])
+
+    def test_ragged(self):
+        # trailing fields can be dropped and GT is added if there isn't one
+        m = self.variant('CN:SU', ['2:1', '1', '3:4', '.']).genotype_matrix()
+        self.assertEqual(m.strings('SU').tolist(), ['1', '.', '4', '.'])
+        self.assertEqual(m.strings('GT').tolist(), ['./.'] * 4)
+        self.assertEqual(m.strings('FT').tolist(), ['.'] * 4)
+
+    def test_gt_fallback(self):
+        m = GenotypeMatrix.from_string('0/1\t1\t0/12\t.|1', {'GT': 0})
+        np.testing.assert_array_equal(m.gt(), np.array([[0, 1], [1, -2], [0, 12], [-1, 1]], dtype=np.int8))
+
+    def test_parsed_genotypes(self):
+        variant = self.variant('GT:CN', ['0/0:2', '0/1:1', '1/1:0', '0/0:2'])
+        variant.genotype('S2').set_format('GT', '1/1')
+        variant.genotype('S3').set_format('SU', 7)
+        m = variant.genotype_matrix()
+        self.assertEqual(m.strings('GT').tolist(), ['0/0', '1/1', '1/1', '0/0'])
+        self.assertEqual(m.strings('SU').tolist(), ['.', '.', '7', '.'])
+
+if __name__ == "__main__":
+    main()
@@ -49,12 +49,44 @@ class TestVariant(TestCase):
         self.variant.set_info('IMAFLAG', False)
         self.assertEqual(self.variant.get_info_string(), 'SVTYPE=BND;STRANDS=-+:9')
 
+    def test_lazy_info(self):
+        info = self.variant.info
+        self.assertEqual(info.values, None)
+        self.assertEqual(info['STRANDS'], '-+:9')
+        self.assertTrue('IMAFLAG' in info)
+        self.assertFalse('STRAND' in info)
+        self.assertFalse('SV' in info)
+        self.assertEqual(info.get('END'), None)
+        # looking keys up leaves the rest of the column alone
+        self.assertEqual(info.values, None)
+        self.assertFalse(info.modified)
+
+    def test_info_pass_through(self):
+        line = self.variant_line.replace('SVTYPE=BND;STRANDS=-+:9;IMAFLAG', 'STRANDS=-+:9;OTHER=1;SVTYPE=BND;SVTYPE=DEL')
+        variant = Variant(line.split('\t'), self.vcf)
+        self.assertEqual(variant.info['SVTYPE'], 'DEL')
+        self.assertEqual(variant.get_info_string(), 'STRANDS=-+:9;OTHER=1;SVTYPE=BND;SVTYPE=DEL')
+        del variant.info['OTHER']
+        self.assertEqual(variant.get_info_string(), 'SVTYPE=DEL;STRANDS=-+:9')
+
     def test_get_format_string(self):
         self.assertEqual(self.variant.get_format_string(), 'GT:SU') 
 
     def test_get_gt_string(self):
         self.assertEqual(self.variant.get_gt_string(), '0/0:9	1/1:15')
 
+    def test_gt_string_pass_through(self):
+        line = self.variant_line.replace('0/0:9\t1/1:15', '0/0:09\t1/1:15')
+        variant = Variant(line.split('\t'), self.vcf)
+        variant.genotype('NA0001').set_format('SU', 16)
+        self.assertFalse(variant.genotype('NA12878').modified)
+        self.assertTrue(variant.genotype('NA0001').modified)
+        self.assertEqual(variant.get_gt_string(), '0/0:09\t1/1:16')
+        # a new field changes every sample
+        variant.genotype('NA0001').set_format('INACTIVE', 2)
+        self.assertEqual(variant.get_format_string(), 'GT:SU:INACTIVE')
+        self.assertEqual(variant.get_gt_string(), '0/0:09:.\t1/1:16:2')
+
     def test_genotype(self):
         self.assertEqual(self.variant.genotype('NA12878').get_gt_string(), '0/0:9')
 
@@ -4,6 +4,8 @@ import svtools.vcfpaste
 import sys
 import tempfile
 import difflib
+import shutil
+from StringIO import StringIO
 
 class IntegrationTest_vcfpaste(TestCase):
     # FIXME We really don't need to have this stuff run with every test. Run once...
@@ -90,6 +92,100 @@ class IntegrationTest_vcfpaste(TestCase):
             self.assertFalse(result)
         os.remove(temp_output_path)
 
+    def run_integration_test_block_rows(self):
+        expected_lines = open(os.path.join(self.test_data_dir, 'expected_master.vcf')).readlines()
+        for block_rows in (1, 7):
+            output_handle = StringIO()
+            paster = svtools.vcfpaste.Vcfpaste(self.list_of_vcfs, master=self.master, sum_quals=True, block_rows=block_rows)
+            paster.execute(output_handle)
+            self.assertEqual(output_handle.getvalue().splitlines(True), expected_lines)
+
+    def run_integration_test_max_open(self):
+        expected_result = os.path.join(self.test_data_dir, 'expected_no_master.vcf')
+        temp_descriptor, temp_output_path = tempfile.mkstemp(suffix='.vcf')
+        output_handle = os.fdopen(temp_descriptor, 'w')
+        temp_dir = tempfile.mkdtemp()
+        try:
+            paster = svtools.vcfpaste.Vcfpaste(self.list_of_gz_vcfs, master=None, sum_quals=True, max_open=2, threads=2, tempdir=temp_dir)
+            paster.execute(output_handle)
+        finally:
+            output_handle.close()
+        self.assertEqual(os.listdir(temp_dir), [])
+        os.rmdir(temp_dir)
+        expected_lines = open(expected_result).readlines()
+        produced_lines = open(temp_output_path).readlines()
+        diff = difflib.unified_diff(produced_lines, expected_lines, fromfile=temp_output_path, tofile=expected_result)
+        result = '\n'.join(diff)
+        if result != '':
+            for line in result:
+                sys.stdout.write(line)
+            self.assertFalse(result)
+        os.remove(temp_output_path)
+
+    def run_integration_test_max_open_with_truncated_vcf(self):
+        temp_descriptor, temp_output_path = tempfile.mkstemp(suffix='.vcf')
+        output_handle = os.fdopen(temp_descriptor, 'w')
+        temp_dir = tempfile.mkdtemp()
+        paster = svtools.vcfpaste.Vcfpaste(self.list_of_vcfs_with_truncated, master=None, sum_quals=True, max_open=2, threads=2, tempdir=temp_dir)
+        with self.assertRaises(SystemExit) as cm:
+            paster.execute(output_handle)
+        self.assertEqual(cm.exception.code, 1)
+        output_handle.close()
+        self.assertEqual(os.listdir(temp_dir), [])
+        os.rmdir(temp_dir)
+        os.remove(temp_output_path)
+
+    def run_integration_test_decompress_threads(self):
+        expected_lines = open(os.path.join(self.test_data_dir, 'expected_no_master.vcf')).readlines()
+        for max_open in (None, 2):
+            output_handle = StringIO()
+            paster = svtools.vcfpaste.Vcfpaste(self.list_of_gz_vcfs, master=None, sum_quals=True, max_open=max_open, decompress_threads=2, buffer_size=256)
+            paster.execute(output_handle)
+            self.assertEqual(output_handle.getvalue().splitlines(True), expected_lines)
+
+    def run_integration_test_append(self):
+        temp_dir = tempfile.mkdtemp()
+        vcfs = [os.path.join(self.test_data_dir, '{0}.vcf'.format(s)) for s in ('NA12878', 'NA12891', 'NA12892')]
+        # samples with the FORMAT of the first one pasted, under new names
+        copies = []
+        for name in ('COPY1', 'COPY2'):
+            copy = os.path.join(temp_dir, name + '.vcf')
+            with open(copy, 'w') as f:
+                for line in open(vcfs[0]):
+                    if line.startswith('#CHROM'):
+                        line = line.rsplit('\t', 1)[0] + '\t' + name + '\n'
+                    f.write(line)
+            copies.append(copy)
+        def write_list(name, files):
+            path = os.path.join(temp_dir, name)
+            with open(path, 'w') as f:
+                f.write('\n'.join(files) + '\n')
+            return path
+        first_list = write_list('first', vcfs[:2])
+        pasted = os.path.join(temp_dir, 'pasted.vcf')
+        with open(pasted, 'w') as output_handle:
+            svtools.vcfpaste.Vcfpaste(first_list, sum_quals=True).execute(output_handle)
+        expected = StringIO()
+        svtools.vcfpaste.Vcfpaste(write_list('all', vcfs[:2] + copies), sum_quals=True).execute(expected)
+        second_list = write_list('second', copies)
+        for max_open in (None, 2):
+            output_handle = StringIO()
+            paster = svtools.vcfpaste.Vcfpaste(second_list, sum_quals=True, append=pasted, max_open=max_open, tempdir=temp_dir)
+            paster.execute(output_handle)
+            self.assertEqual(output_handle.getvalue(), expected.getvalue())
+        # the samples can't be added twice
+        paster = svtools.vcfpaste.Vcfpaste(first_list, sum_quals=True, append=pasted)
+        with self.assertRaises(SystemExit):
+            paster.execute(StringIO())
+        # nor with a FORMAT other than the pasted VCF's, as NA12892 has at
+        # 1:826136, on their own or in a group
+        for files, max_open in ((vcfs[2:], None), (copies[:1] + vcfs[2:], 2)):
+            paster = svtools.vcfpaste.Vcfpaste(write_list('mismatched', files), sum_quals=True, append=pasted, max_open=max_open, tempdir=temp_dir)
+            with self.assertRaises(SystemExit) as cm:
+                paster.execute(StringIO())
+            self.assertEqual(cm.exception.code, 1)
+        shutil.rmtree(temp_dir)
+
     def run_integration_test_with_master(self):
         master_file = os.path.join(self.test_data_dir, 'master.vcf')
         expected_result = os.path.join(self.test_data_dir, 'expected_master.vcf')
@@ -170,6 +266,8 @@ class Test_vcfpaste(TestCase):
         self.assertEqual(paster.vcf_list, 'a_file_o_vcf_filenames')
         self.assertIsNone(paster.master)
         self.assertIsNone(paster.sum_quals)
+        self.assertIsNone(paster.max_open)
+        self.assertEqual(paster.threads, 1)
 
     def test_init_w_specified(self):
         paster = svtools.vcfpaste.Vcfpaste('some_file', 'master_blaster', True)
@@ -177,6 +275,27 @@ class Test_vcfpaste(TestCase):
         self.assertEqual(paster.master, 'master_blaster')
         self.assertTrue(paster.sum_quals)
 
+    def test_paste_columns(self):
+        vcf_files = [StringIO('1\t10\ta\tN\t<DEL>\t5\t.\t.\tGT\t0/1\n2\t20\tb\tN\t<DEL>\t.\t.\t.\tGT:SU\t1/1:3\n'),
+                StringIO('1\t10\ta\tN\t<DEL>\t2,3\t.\t.\tGT\t0/0\t0/1\n2\t20\tb\tN\t<DEL>\t1\t.\t.\tGT\t./.\t1/1\n')]
+        rows = [[None] * 4, [None] * 4]
+        quals = []
+        svtools.vcfpaste.paste_columns(vcf_files, rows, 1, quals)
+        self.assertEqual(rows, [[None, 'GT', '0/1', '0/0\t0/1'], [None, 'GT:SU', '1/1:3', './.\t1/1']])
+        self.assertEqual(quals, [['5', '.'], ['2,3', '1']])
+        with self.assertRaises(SystemExit):
+            svtools.vcfpaste.paste_columns(vcf_files, [[None] * 4], 1)
+
+    def test_paste_columns_check_format(self):
+        line = '1\t10\ta\tN\t<DEL>\t5\t.\t.\t{0}\t0/1\n'
+        rows = [['.'] * 8 + ['GT', '1/1', None]]
+        svtools.vcfpaste.paste_columns([StringIO(line.format('GT'))], rows, 9, set_format=False, check_format=True)
+        self.assertEqual(rows, [['.'] * 8 + ['GT', '1/1', '0/1']])
+        mismatched = StringIO(line.format('GT:SU'))
+        mismatched.name = 'mismatched.vcf'
+        with self.assertRaises(SystemExit):
+            svtools.vcfpaste.paste_columns([mismatched], rows, 9, set_format=False, check_format=True)
+
 class Test_vcfpaste_ui(TestCase):
 
     def test_add_arguments(self):
@@ -190,6 +309,13 @@ class Test_vcfpaste_ui(TestCase):
         self.assertEqual(args2.vcf_list, 'some_list')
         self.assertTrue(args2.sum_quals)
         self.assertEqual(args2.master, 'some_master')
+        self.assertIsNone(args2.max_open)
+        self.assertIsNone(args2.append)
+
+        args3 = parser.parse_args(['-f', 'some_list', '--max-open', '100', '-t', '4', '-b', '1048576'])
+        self.assertEqual(args3.max_open, 100)
+        self.assertEqual(args3.threads, 4)
+        self.assertEqual(args3.buffer_size, 1048576)
         
 
 if __name__ == "__main__":
@@ -6,20 +6,21 @@ import difflib
 import svtools.vcfsort
 
 class FakeArgs(object):
-    def __init__(self, input, output):
+    def __init__(self, input, output, **kwargs):
         self.input = input
         self.output = output
+        self.__dict__.update(kwargs)
 
 
 class IntegrationTest_vcfsort(TestCase):
-    def run_integration_test(self):
+    def check_sort(self, **kwargs):
         test_directory = os.path.dirname(os.path.abspath(__file__))
         test_data_dir = os.path.join(test_directory, 'test_data', 'vcfsort')
         input = os.path.join(test_data_dir, 'input.vcf')
         expected_result = os.path.join(test_data_dir, 'expected.vcf')
         temp_descriptor, temp_output_path = tempfile.mkstemp(suffix='.vcf')
         os.close(temp_descriptor)
-        svtools.vcfsort.run_from_args(FakeArgs(input, temp_output_path))
+        svtools.vcfsort.run_from_args(FakeArgs(input, temp_output_path, **kwargs))
 
         expected_lines = open(expected_result).readlines()
         produced_lines = open(temp_output_path).readlines()
@@ -31,6 +32,18 @@ class IntegrationTest_vcfsort(TestCase):
             self.assertFalse(result)
         os.remove(temp_output_path)
 
+    def run_integration_test(self):
+        self.check_sort()
+
+    def run_integration_test_spill(self):
+        self.check_sort(max_memory=2000, threads=1)
+
+    def run_integration_test_threads(self):
+        self.check_sort(max_memory=2000, threads=2)
+
+    def run_integration_test_external(self):
+        self.check_sort(external=True)
+
 if __name__ == "__main__":
     main()
 